@@ -0,0 +1,146 @@
+import argparse
+import sys
+from typing import Dict, FrozenSet, List, Optional, Sequence
+from tenk import rng
+from tenk.ai.single import SingleAi, SingleAiBatchPlayer, SingleAiPlayer
+from tenk.ai.split import DiceAi, RollAi, SplitAiBatchPlayer, SplitAiPlayer
+from tenk.evaluate import evaluate
+from tenk.game import play
+from tenk.scoring import DICES, KEEPS, encode, on_rules
+
+SORTED = "sorted"
+SCORING = "scoring"
+DICE_MODES = (SORTED, SCORING)
+
+# dice code -> faces of the dices that are part of any valid keep of the roll
+_SCORING_FACES = {}
+on_rules(_SCORING_FACES.clear)
+
+
+def scoring_faces(dices: Sequence[int]) -> FrozenSet[int]:
+    """Return the faces of `dices` that can score by the rules in use."""
+    code = encode(dices)
+    faces = _SCORING_FACES.get(code)
+    if faces is None:
+        faces = _SCORING_FACES[code] = frozenset(
+            face for keep in KEEPS[code] for face in DICES[keep]
+        )
+    return faces
+
+
+class StateAbstraction(object):
+    """
+    Maps the turn score and dices of a `BaseTenkAi` state to coarser keys.
+
+    Scores are rounded down to multiples of `bucket` and all scores from `cap`
+    on are the same state. Dices are encoded as the sorted dices (`sorted`) or
+    with every dice masked whose face is in no valid keep of the roll by the
+    scoring rules in use (`scoring`, see `scoring_faces`). Masked dices keep
+    their position, so the dice indexes of the actions mean the same dices in
+    all rolls of a state.
+    """
+
+    def __init__(self, bucket: int = 1, cap: Optional[int] = None, dices=SORTED):
+        if dices not in DICE_MODES:
+            raise ValueError("unknown dice mode: %s" % dices)
+        self.BUCKET = bucket
+        self.CAP = cap
+        self.DICES = dices
+
+    def __str__(self):
+        parts = [self.DICES]
+        if self.BUCKET > 1:
+            parts.append("bucket%i" % self.BUCKET)
+        if self.CAP is not None:
+            parts.append("cap%i" % self.CAP)
+        return "_".join(parts)
+
+    def score(self, score: int) -> int:
+        if self.CAP is not None and score > self.CAP:
+            score = self.CAP
+        return score - score % self.BUCKET
+
+    def dices(self, dices: Sequence[int]) -> str:
+        if self.DICES == SCORING:
+            faces = scoring_faces(dices)
+            return "".join([str(dice) if dice in faces else "x" for dice in dices])
+        return "".join([str(dice) for dice in dices])
+
+
+# abstractions compared by `report`
+ABSTRACTIONS = {
+    "raw": None,
+    "scoring": StateAbstraction(dices=SCORING),
+    "bucket100": StateAbstraction(bucket=100),
+    "cap2000": StateAbstraction(cap=2000),
+    "compact": StateAbstraction(bucket=100, cap=2000, dices=SCORING),
+}
+
+
+def report(
+    names: Optional[List[str]] = None,
+    games: int = 200000,
+    alpha: float = 0.05,
+    gamma: float = 0.6,
+    exp: float = 0.1,
+    seed: int = 0,
+    min_reach: float = 1e-9,
+) -> Dict[str, Dict[str, any]]:
+    """
+    Train a `SingleAi` and a `DiceAi`/`RollAi` pair for `games` games with each
+    abstraction and return their Q table sizes and the exact expected turn
+    scores of their greedy policies (see `tenk.evaluate`).
+    """
+    results = {}
+    for name in names if names else ABSTRACTIONS:
+        abstraction = ABSTRACTIONS[name]
+        rng.seed(seed)
+        single = SingleAi(alpha, gamma, exp, abstraction=abstraction)
+        play(SingleAiPlayer(single, exit=games, progress=games))
+        rng.seed(seed)
+        diceai = DiceAi(alpha, gamma, exp, abstraction=abstraction)
+        rollai = RollAi(alpha, gamma, exp, abstraction=abstraction)
+        play(SplitAiPlayer(diceai=diceai, rollai=rollai, exit=games, progress=games))
+        results[name] = {
+            "single_states": len(single.Q),
+            "single_score": evaluate(
+                SingleAiBatchPlayer(single), min_reach=min_reach
+            ).value,
+            "split_states": len(diceai.Q) + len(rollai.Q),
+            "split_score": evaluate(
+                SplitAiBatchPlayer(diceai, rollai), min_reach=min_reach
+            ).value,
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare state abstractions")
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only", nargs="*", choices=list(ABSTRACTIONS), help="abstractions to run"
+    )
+    args = parser.parse_args(argv)
+
+    results = report(args.only, games=args.games, seed=args.seed)
+    print(
+        "%-12s %14s %12s %14s %12s"
+        % ("abstraction", "single states", "single", "split states", "split")
+    )
+    for name, result in results.items():
+        print(
+            "%-12s %14i %12.2f %14i %12.2f"
+            % (
+                name,
+                result["single_states"],
+                result["single_score"],
+                result["split_states"],
+                result["split_score"],
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from tenk.ai import checkpoint
+from tenk.ai.base import BaseAi
+from tenk.ai.replay import ReplayBuffer
+from tenk.scoring import MAX_DICES
+
+# keep index lists of all bit masks over the dice indexes
+KEEP_INDEXES = [
+    [i for i in range(MAX_DICES) if mask >> i & 1] for mask in range(1 << MAX_DICES)
+]
+
+
+def keep_mask(keep: Iterable[int]) -> int:
+    """Encode dice indexes to keep as bit mask."""
+    mask = 0
+    for i in keep:
+        mask |= 1 << i
+    return mask
+
+
+def keep_indexes(mask: int) -> List[int]:
+    """Decode a bit mask of dice indexes to keep."""
+    return list(KEEP_INDEXES[mask])
+
+
+class ArrayQ(object):
+    """
+    Q table for integer actions. States are mapped to rows of a preallocated
+    value array (grown by half its size when full) with a mask of visited
+    actions. The best action and value of each row are cached so lookups do
+    not scan rows. Values are float64 like the dictionary ais, a smaller
+    `dtype` rounds them (and the pickles saved from them).
+
+    Read access mimics the dictionary of dictionaries of `BaseAi.Q`; it builds
+    a dictionary per state, lookups of the ais use `best` and `value`.
+    """
+
+    def __init__(self, actions: int, capacity: int = 4096, dtype=np.float64):
+        self.ACTIONS = actions
+        self.rows = {}
+        self.EXACT = np.dtype(dtype) == np.float64
+        self.values = np.zeros((capacity, actions), dtype=dtype)
+        self.visited = np.zeros((capacity, actions), dtype=bool)
+        self.bestActions = []
+        self.bestValues = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, state: any) -> bool:
+        return state in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, state: any) -> Dict[int, float]:
+        return self.rewards(self.rows[state])
+
+    def get(self, state: any, default=None) -> Dict[int, float]:
+        row = self.rows.get(state)
+        return default if row is None else self.rewards(row)
+
+    def items(self):
+        return ((state, self.rewards(row)) for state, row in self.rows.items())
+
+    def rewards(self, row: int) -> Dict[int, float]:
+        """Return the visited actions of a row and their values."""
+        actions = np.flatnonzero(self.visited[row])
+        return dict(zip(actions.tolist(), self.values[row, actions].tolist()))
+
+    def row(self, state: any) -> int:
+        """Return the row of a state, allocating it if needed."""
+        row = self.rows.get(state)
+        if row is None:
+            row = len(self.rows)
+            if row == len(self.values):
+                grow = (len(self.values) + 1) // 2
+                self.values = np.concatenate(
+                    [self.values, np.zeros((grow, self.ACTIONS), self.values.dtype)]
+                )
+                self.visited = np.concatenate(
+                    [self.visited, np.zeros((grow, self.ACTIONS), dtype=bool)]
+                )
+            self.rows[state] = row
+            self.bestActions.append(None)
+            self.bestValues.append(0.0)
+        return row
+
+    def best(self, state: any) -> Tuple[int, float]:
+        """Return best action and value of a state, `(None, 0.0)` if unvisited."""
+        row = self.rows.get(state)
+        if row is None:
+            return None, 0.0
+        return self.bestActions[row], self.bestValues[row]
+
+    def value(self, row: int, action: int) -> float:
+        return self.values.item(row, action)
+
+    def set(self, row: int, action: int, value: float) -> None:
+        """Set the value of an action and keep the cached best action up to date."""
+        self.values[row, action] = value
+        self.visited[row, action] = True
+        if not self.EXACT:
+            value = self.values.item(row, action)  # as stored
+        best = self.bestActions[row]
+        if best is None or value > self.bestValues[row]:
+            self.bestActions[row] = action
+            self.bestValues[row] = value
+        elif best == action:
+            # the best action got worse, search the row again
+            values = np.where(self.visited[row], self.values[row], -np.inf)
+            best = int(values.argmax())
+            self.bestActions[row] = best
+            self.bestValues[row] = values.item(best)
+
+    def bestValuesOf(self, rows: np.ndarray) -> np.ndarray:
+        """Return the cached best values of rows (0 for unvisited rows)."""
+        bestValues = self.bestValues
+        return np.array([bestValues[row] for row in rows.tolist()])
+
+    def add(self, rows: np.ndarray, actions: np.ndarray, deltas: np.ndarray) -> None:
+        """
+        Add `deltas` to the values of row/action pairs (deltas of repeated pairs
+        add up) and update the cached best actions of the rows.
+        """
+        np.add.at(self.values, (rows, actions), deltas)
+        self.visited[rows, actions] = True
+        rows = np.unique(rows)
+        values = np.where(self.visited[rows], self.values[rows], -np.inf)
+        best = values.argmax(axis=1)
+        for row, action, value in zip(
+            rows.tolist(), best.tolist(), values[np.arange(len(rows)), best].tolist()
+        ):
+            self.bestActions[row] = action
+            self.bestValues[row] = value
+
+
+class ArrayQAi(BaseAi):
+    """
+    Q-learning ai storing Q in an `ArrayQ` instead of dictionaries.
+
+    Subclasses encode states as hashable integers and actions as integers
+    below `ACTIONS`, and convert both from/to the string names of the
+    dictionary based ais so pickles stay interchangeable between both.
+    Place it after `BaseTenkAi` in the bases (e.g. `class X(SingleAi, ArrayQAi)`).
+    """
+
+    ACTIONS = 0
+
+    def __init__(self, alpha: float, gamma: float, rewardFkn=None):
+        super().__init__(alpha, gamma, rewardFkn=rewardFkn)
+        self.Q = ArrayQ(self.ACTIONS)
+        self.defaultReward = self.REWARD_FKN is BaseAi.DEFAULT_REWARD_FKN
+        self.replay = None
+
+    def setReplay(
+        self,
+        replay: Optional[ReplayBuffer],
+        every: int = 256,
+        batch: int = 256,
+        batches: int = 1,
+        sample: bool = False,
+    ) -> None:
+        """
+        Learn from a `ReplayBuffer` instead of updating Q with every step: after
+        every `every` transitions `batches` batched TD updates of `batch`
+        transitions each are made, from the most recent transitions or, with
+        `sample`, sampled from the buffer. Rows of Q are used as state codes,
+        so the buffer belongs to the current Q table. `None` turns it off.
+        Visits and convergence are not tracked in replay mode. A buffer without
+        a generator is seeded from the dice stream of the ai with the first
+        batch (the stream of the player once it is playing).
+        """
+        if replay is not None and not self.defaultReward:
+            raise ValueError("replay needs the default reward function")
+        if replay is not None and getattr(self, "LAMBDA", 0.0):
+            raise ValueError("replay can not be combined with traces")
+        self.replay = replay
+        self.REPLAY_EVERY = every
+        self.REPLAY_BATCH = batch
+        self.REPLAY_BATCHES = batches
+        self.REPLAY_SAMPLE = sample
+
+    def learn(self) -> None:
+        """Make the batched TD updates from the replay buffer."""
+        Q = self.Q
+        if self.replay.rng is None:
+            self.replay.seed(self.rng.seedSequence.spawn(1)[0])
+        for _ in range(self.REPLAY_BATCHES):
+            if self.REPLAY_SAMPLE:
+                indexes = self.replay.sample(self.REPLAY_BATCH)
+            else:
+                indexes = self.replay.recent(self.REPLAY_BATCH)
+            rows, actions, rewards, nextRows, terminals = self.replay.batch(indexes)
+            future = np.where(terminals, 0.0, Q.bestValuesOf(nextRows))
+            td = rewards + self.GAMMA * future - Q.values[rows, actions]
+            # one update per pair: the mean of the TD errors of its transitions
+            pairs, inverse, counts = np.unique(
+                rows * self.ACTIONS + actions, return_inverse=True, return_counts=True
+            )
+            deltas = np.bincount(inverse, weights=td) / counts
+            Q.add(pairs // self.ACTIONS, pairs % self.ACTIONS, self.ALPHA * deltas)
+            self.replay.updatePriorities(indexes, td)
+
+    def stateName(self, state: any) -> str:
+        """Return the string key of a state as used by the dictionary ais."""
+        raise NotImplementedError
+
+    def stateFromName(self, name: str) -> any:
+        raise NotImplementedError
+
+    def actionName(self, action: int) -> any:
+        """Return the action key as used by the dictionary ais."""
+        raise NotImplementedError
+
+    def actionFromName(self, name: any) -> int:
+        raise NotImplementedError
+
+    def load(self, filename: str) -> None:
+        """Load a pickeled Q dictionary or a `.tenkq` checkpoint."""
+        Q = checkpoint.load_all(filename)
+        self.Q = ArrayQ(self.ACTIONS, capacity=max(len(Q), 1))
+        for name, rewards in Q.items():
+            rewards = {
+                self.actionFromName(action): value
+                for action, value in rewards.items()
+                if action is not None  # initial pseudo states
+            }
+            if rewards:
+                self.setRewards(self.stateFromName(name), rewards)
+
+    def save(self, filename: str, base: Optional[str] = None) -> None:
+        """Save Q in the format of the dictionary ais."""
+        checkpoint.save(
+            {
+                self.stateName(state): {
+                    self.actionName(action): value for action, value in rewards.items()
+                }
+                for state, rewards in self.Q.items()
+            },
+            filename,
+            base=base,
+        )
+
+    def compress(self, single_value=True):
+        Q = self.Q
+        self.Q = ArrayQ(self.ACTIONS, capacity=max(len(Q), 1))
+        for state, rewards in Q.items():
+            if single_value:
+                self.setRewards(state, {max(rewards, key=rewards.get): 1})
+            else:
+                rewards = {a: v for a, v in rewards.items() if v != 0}
+                if rewards:
+                    self.setRewards(state, rewards)
+
+    def boundQ(self, max_states: int, policy: str = "lfu") -> None:
+        raise TypeError("ArrayQ tables have a fixed size")
+
+    def getRewards(self, state: any) -> Dict[int, float]:
+        return self.Q.get(state, {})
+
+    def setRewards(self, state: any, rewards: Dict[int, float]) -> None:
+        row = self.Q.row(state)
+        for action, value in rewards.items():
+            self.Q.set(row, action, value)
+
+    def reward(self, state: any, action: int) -> float:
+        if state not in self.Q:
+            return 0.0
+        return self.Q.value(self.Q.row(state), action)
+
+    def addReward(self, state: any, action: int, delta: float) -> None:
+        row = self.Q.row(state)
+        self.Q.set(row, action, self.Q.value(row, action) + delta)
+
+    def bestAction(self, state: any) -> Tuple[int, float]:
+        return self.Q.best(state)
+
+    def greedyAction(self, state: any) -> Tuple[int, float]:
+        return self.Q.best(state)
+
+    def estimateReward(self, state: any) -> float:
+        if self.defaultReward:
+            return self.Q.best(state)[1]
+        return self.REWARD_FKN(self.getRewards(state))
+
+    def updateReward(
+        self,
+        cur_state: any,
+        prev_state: any,
+        prev_action: any,
+        reward: float,
+        terminal: bool = False,
+    ) -> None:
+        if prev_action is None or self.READ_ONLY:
+            return  # initial pseudo state of a turn or read-only, nothing to learn
+        row = self.Q.row(prev_state)
+        if self.replay is not None:
+            nextRow = -1 if terminal else self.Q.row(cur_state)
+            self.replay.add(row, prev_action, reward, nextRow, terminal)
+            if self.replay.count % self.REPLAY_EVERY == 0:
+                self.learn()
+            return
+        value = self.Q.value(row, prev_action)
+        target = reward
+        if not terminal:
+            target += self.GAMMA * self.estimateReward(cur_state)
+        if self.convergence is not None:
+            best = self.Q.best(prev_state)[0]
+        self.Q.set(row, prev_action, (1 - self.ALPHA) * value + self.ALPHA * target)
+        if self.convergence is not None:
+            changed = best is not None and best != self.Q.best(prev_state)[0]
+            self.convergence.add(target - value, changed)
+        if self.visits is not None:
+            visits = self.visits.setdefault(prev_state, {})
+            visits[prev_action] = visits.get(prev_action, 0) + 1
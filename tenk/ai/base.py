@@ -1,7 +1,14 @@
-import pickle
+import os
+from tenk.ai import checkpoint
+from tenk.ai.boundedq import BoundedQ
+from tenk.ai.convergence import Convergence, EarlyStopping
+from tenk.ai.saver import BackgroundSaver
+from tenk.evaluate import Evaluation, evaluate
 from tenk.game import Player
-from statistics import mean
-from typing import Dict, List, Optional
+from tenk.instrument import Instrument
+from tenk.rng import STREAM, DiceStream
+from tenk.stats import MetricsSink, TurnStats, memory
+from typing import Dict, List, Optional, Tuple
 import time
 
 
@@ -14,19 +21,23 @@ class BaseAi(object):
 
     def __init__(self, alpha: float, gamma: float, rewardFkn=None):
         self.Q = {}
+        self.visits = None
+        self.convergence = None
+        self.READ_ONLY = False
         self.ALPHA = alpha
         self.GAMMA = gamma
         self.REWARD_FKN = rewardFkn if rewardFkn else BaseAi.DEFAULT_REWARD_FKN
 
     def load(self, filename: str) -> None:
-        """Load a pickeled Q dictionary."""
-        with open(filename, "rb") as file:
-            self.Q = pickle.load(file)
+        """Load a pickeled Q dictionary or a `.tenkq` checkpoint (lazily)."""
+        self.Q = checkpoint.load(filename)
 
-    def save(self, filename: str) -> None:
-        """Save a pickeled Q dicktionary."""
-        with open(filename, "wb") as file:
-            pickle.dump(self.Q, file)
+    def save(self, filename: str, base: Optional[str] = None) -> None:
+        """
+        Save a pickeled Q dicktionary or a `.tenkq` checkpoint, with `base` as
+        delta to a previous checkpoint.
+        """
+        checkpoint.save(self.Q, filename, base=base)
 
     def compress(self, single_value=True):
         """
@@ -44,25 +55,106 @@ class BaseAi(object):
                         compressed_Q.setdefault(q_key, {})[v_key] = self.Q[q_key][v_key]
         self.Q = compressed_Q
 
+    def setReadOnly(self, readOnly: bool = True) -> None:
+        """
+        In read-only mode Q is never changed: unknown states are not inserted
+        and rewards are not updated (e.g. for evaluating trained ais).
+        """
+        self.READ_ONLY = readOnly
+
+    def boundQ(self, max_states: int, policy: str = "lfu") -> None:
+        """Keep at most `max_states` states in Q (see `BoundedQ`)."""
+        self.Q = BoundedQ(max_states, policy, items=self.Q.items())
+
+    def trackVisits(self) -> None:
+        """Start counting updates per state and action in `visits`."""
+        self.visits = {}
+
+    def trackConvergence(self) -> None:
+        """Start tracking TD errors, greedy changes and new states (`Convergence`)."""
+        self.convergence = Convergence(len(self.Q))
+
+    def popVisits(self) -> Dict[any, Dict[any, int]]:
+        """Return the visits counted since the last call and reset them."""
+        visits = self.visits
+        self.visits = {}
+        return visits
+
     def estimateReward(self, state: any) -> float:
         """Estimate the reward for a state based on the defined reward function."""
         return self.REWARD_FKN(self.getRewards(state))
 
     def getRewards(self, state: any) -> Dict[any, float]:
         """Return all rewards for a state"""
+        if self.READ_ONLY:
+            return self.Q.get(state, {})
         return self.Q.setdefault(state, {})
 
+    def setRewards(self, state: any, rewards: Dict[any, float]) -> None:
+        """Overwrite the rewards of some actions of a state."""
+        self.Q.setdefault(state, {}).update(rewards)
+
+    def reward(self, state: any, action: any) -> float:
+        """Return the reward of an action of a state (0 if unknown)."""
+        return self.getRewards(state).get(action, 0.0)
+
+    def addReward(self, state: any, action: any, delta: float) -> None:
+        """Add `delta` to the reward of an action of a state."""
+        rewards = self.getRewards(state)
+        rewards[action] = rewards.get(action, 0) + delta
+        self.Q[state] = rewards
+
+    def bestAction(self, state: any) -> Tuple[any, float]:
+        """
+        Return the action with the highest reward for a state and its reward,
+        `(None, 0.0)` if there are no rewards.
+        """
+        rewards = self.getRewards(state)
+        if not rewards:
+            return None, 0.0
+        action = max(rewards, key=rewards.get)
+        return action, rewards[action]
+
+    def greedyAction(self, state: any) -> Tuple[any, float]:
+        """Like `bestAction` but never inserts the state (for evaluation)."""
+        rewards = self.Q.get(state)
+        if not rewards:
+            return None, 0.0
+        action = max(rewards, key=rewards.get)
+        return action, rewards[action]
+
     def updateReward(
-        self, cur_state: any, prev_state: any, prev_action: any, reward: float
+        self,
+        cur_state: any,
+        prev_state: any,
+        prev_action: any,
+        reward: float,
+        terminal: bool = False,
     ) -> None:
         """
         Updates rewards of _previous state_ based on _current state_ values and reward.
+        Terminal updates do not look at _current state_.
         """
+        if self.READ_ONLY:
+            return
         prevRewards = self.getRewards(prev_state)
-        prevRewards[prev_action] = (1 - self.ALPHA) * prevRewards.setdefault(
-            prev_action, 0
-        ) + self.ALPHA * (reward + self.GAMMA * self.estimateReward(cur_state))
+        # the initial pseudo state is not tracked, like by the array ais, and
+        # greedy changes are among the actions taken before
+        track = self.convergence is not None and prev_action is not None
+        if track:
+            best = max(prevRewards, key=prevRewards.get) if prevRewards else None
+        value = prevRewards.setdefault(prev_action, 0)
+        target = reward
+        if not terminal:
+            target += self.GAMMA * self.estimateReward(cur_state)
+        prevRewards[prev_action] = (1 - self.ALPHA) * value + self.ALPHA * target
         self.Q[prev_state] = prevRewards
+        if track:
+            changed = best is not None and best != max(prevRewards, key=prevRewards.get)
+            self.convergence.add(target - value, changed)
+        if self.visits is not None:
+            visits = self.visits.setdefault(prev_state, {})
+            visits[prev_action] = visits.get(prev_action, 0) + 1
 
 
 class BaseTenkAi(BaseAi):
@@ -70,9 +162,28 @@ class BaseTenkAi(BaseAi):
     Base implementation of a ai playing TenK.
     """
 
-    def __init__(self, alpha: float, gamma: float, randomness: float, rewardFkn=None):
+    # name of the checkpoints, shared by the Q backends of an ai (default:
+    # the class name)
+    NAME = None
+
+    def __init__(
+        self,
+        alpha: float,
+        gamma: float,
+        randomness: float,
+        rewardFkn=None,
+        abstraction=None,
+    ):
+        """
+        States of the dictionary ais are encoded with the `abstraction` (a
+        `tenk.ai.abstraction.StateAbstraction`, default: raw scores and dices).
+        """
         super().__init__(alpha, gamma, rewardFkn=rewardFkn)
         self.RANDOMNESS = randomness
+        self.LAMBDA = 0.0
+        self.abstraction = abstraction
+        # random source for exploration, the stream of the player once added
+        self.rng = STREAM
         self.init()
 
     def init(self) -> None:
@@ -85,11 +196,38 @@ class BaseTenkAi(BaseAi):
         self.score = 0
         self.state = "is"
         self.args = None
+        self.trace = []
+
+    def setTraces(self, lam: float) -> None:
+        """
+        Learn with Watkins Q(λ) instead of one-step Q-learning: the TD error of
+        every step also updates the earlier state/action pairs of the turn by
+        their eligibility `(gamma * lam)^k` after `k` further steps. Turns are
+        short, so the traces are kept exactly until the turn ends or an
+        exploratory (not greedy) action cuts them. `lam=0` turns it off.
+        """
+        if not 0 <= lam <= 1:
+            raise ValueError("lambda has to be between 0 and 1")
+        if lam and getattr(self, "replay", None) is not None:
+            raise ValueError("traces can not be combined with replay")
+        self.LAMBDA = lam
 
     def encodeState(self) -> any:
         """Encode current state for storing in Q"""
         raise NotImplementedError
 
+    def abstractScore(self, score: int) -> str:
+        """Return the state key of a turn score."""
+        if self.abstraction is None:
+            return str(score)
+        return str(self.abstraction.score(score))
+
+    def abstractDices(self, dices: List[int]) -> str:
+        """Return the state key of sorted dices."""
+        if self.abstraction is None:
+            return "".join([str(dice) for dice in dices])
+        return self.abstraction.dices(dices)
+
     def encodeAction(self) -> any:
         """Encode action for storing in Q"""
         raise NotImplementedError
@@ -100,18 +238,54 @@ class BaseTenkAi(BaseAi):
 
     def selectAction(self, state: any) -> any:
         """Selects the action to take for a state stored in Q"""
-        rewards = self.getRewards(state)
-        # print("Choose %s: %s -> %s" % (state, str(rewards), str(max(rewards, key=rewards.get) if rewards else None)))
-        return max(rewards, key=rewards.get) if rewards else None
+        return self.bestAction(state)[0]
 
-    def updateReward(self) -> None:
+    def updateReward(self, terminal: bool = False) -> None:
         """Update reward from current ai values"""
+        if self.LAMBDA and not self.READ_ONLY:
+            self.updateTraces(terminal)
+            return
         # _start_reward = dict(self.getRewards(self.lastState))
         super().updateReward(
-            self.state, self.lastState, self.lastAction, self.calculateReward()
+            self.state,
+            self.lastState,
+            self.lastAction,
+            self.calculateReward(),
+            terminal=terminal,
         )
         # print("    %s %s[%s]>%i: %.2f -> %.2f | %.2f" % (self.__class__.__name__, self.lastState,  self.lastAction,self.score, _start_reward[self.lastAction], self.getRewards(self.lastState)[self.lastAction], self.GAMMA * self.estimateReward(self.state)))
 
+    def updateTraces(self, terminal: bool = False) -> None:
+        """Update the rewards of the pairs in the trace by the last TD error."""
+        if self.lastAction is None:
+            return  # initial pseudo state of a turn, nothing to learn
+        value = self.reward(self.lastState, self.lastAction)
+        target = self.calculateReward()
+        if not terminal:
+            target += self.GAMMA * self.estimateReward(self.state)
+        if self.convergence is not None:
+            best = self.bestAction(self.lastState)[0]
+        delta = self.ALPHA * (target - value)
+        decay = self.GAMMA * self.LAMBDA
+        for state, action in reversed(self.trace):
+            self.addReward(state, action, delta)
+            delta *= decay
+            if self.visits is not None:  # every traced pair is updated
+                visits = self.visits.setdefault(state, {})
+                visits[action] = visits.get(action, 0) + 1
+        if self.convergence is not None:
+            changed = best is not None and best != self.bestAction(self.lastState)[0]
+            self.convergence.add(target - value, changed)
+
+    def extendTrace(self) -> None:
+        """
+        Add the last action to the trace, cut it before exploratory actions:
+        actions valued below the best action (ties are greedy).
+        """
+        if self.reward(self.state, self.lastAction) < self.bestAction(self.state)[1]:
+            self.trace = []
+        self.trace.append((self.state, self.lastAction))
+
     def processGameState(self, dices: List[int], score: int, args: any = None) -> None:
         """
         Process a TenK game state while still playing the round. Not a final state
@@ -125,6 +299,8 @@ class BaseTenkAi(BaseAi):
 
         self.updateReward()
         self.lastAction = self.act()
+        if self.LAMBDA and not self.READ_ONLY:
+            self.extendTrace()
 
         self.lastArgs = args
         self.lastDices = dices
@@ -136,10 +312,7 @@ class BaseTenkAi(BaseAi):
         Process a final TenK game state ending the players turn.
         """
         self.score = score
-        gamma = self.GAMMA
-        self.GAMMA = 0
-        self.updateReward()
-        self.GAMMA = gamma
+        self.updateReward(terminal=True)
 
     def act(self) -> any:
         """
@@ -153,8 +326,29 @@ class BaseTenkPlayer(Player):
     Base ai TenK player implementation.
     """
 
-    def filename(self, ai: BaseTenkAi) -> str:
-        return "./Q/%s_%s_%i.pickle" % (ai.__class__.__name__, self.TAG, self.games)
+    FORMATS = ("pickle", "tenkq")
+
+    def filename(
+        self,
+        ai: BaseTenkAi,
+        fileformat: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> str:
+        """
+        Checkpoint filename of an ai, named by `ai.NAME` so the dictionary and
+        array ais read the checkpoints of each other.
+        """
+        if not name:
+            name = ai.NAME if ai.NAME else ai.__class__.__name__
+        return "./Q/%s_%s_%i.%s" % (
+            name,
+            self.TAG,
+            self.games,
+            fileformat if fileformat else self.FORMAT,
+        )
+
+    def rngFilename(self) -> str:
+        return "./Q/%s_%i.rng" % (self.TAG, self.games)
 
     def __init__(
         self,
@@ -164,26 +358,163 @@ class BaseTenkPlayer(Player):
         save: Optional[int] = None,
         exit: Optional[int] = None,
         progress: int = 100000,
+        fileformat: str = "pickle",
+        delta: Optional[int] = None,
+        instrument: Optional[Instrument] = None,
+        dice: Optional[DiceStream] = None,
+        metrics: Optional[str] = None,
+        convergence: bool = False,
+        stopping: Optional[EarlyStopping] = None,
+        background: int = 0,
     ):
+        """
+        Checkpoints are saved as `fileformat` ("pickle" or "tenkq"). With `delta`
+        "tenkq" checkpoints only store the states changed since the previous save
+        and a full checkpoint is written every `delta` saves.
+        With an `instrument` the game loop and the ais are timed and a breakdown
+        is printed with every progress line.
+        Dices and the exploration of the ais are drawn from `dice` (default:
+        `tenk.rng.STREAM`), its state is saved with the checkpoints and restored
+        on `load` (into a stream of its own if no `dice` is given).
+        With `metrics` (a `.jsonl` or `.csv` filename) the statistics of every
+        progress interval are appended to a time series (see `tenk.stats`).
+        With `convergence` (implied by `stopping`) TD errors, greedy action
+        changes and new states of the ais are reported with every progress line.
+        Training ends early if `stopping` (see `EarlyStopping`) decides so and
+        a final checkpoint is saved.
+        With `background` checkpoints are saved from copy-on-write snapshots in
+        forked processes, with at most `background` saves in flight (see
+        `BackgroundSaver`).
+        Bounded Q tables (see `BoundedQ`) can not be saved as delta checkpoints,
+        evicted states would be kept alive in the base checkpoint.
+        """
+        if delta and any(isinstance(ai.Q, BoundedQ) for ai in ais):
+            raise ValueError("bounded Q tables can not be saved as delta checkpoints")
         self.SAVE = save
         self.TAG = tag
         self.EXIT = exit
         self.PROGRESS = progress
+        self.FORMAT = fileformat
+        self.DELTA = delta
+        self.saves = 0
+        self.lastFiles = {}
+        self.saver = BackgroundSaver(background) if background else None
 
         self.end = False
         self.games = load if load else 0
 
-        self.scores = []
-        self.maxscore = 0
+        self.stats = TurnStats()
         self.old_mean = 1
-        self.rolls = []
         self.cur_rolls = 0
         self.start_time = time.time()
+        self.metrics = MetricsSink(metrics) if metrics else None
 
         self.ais = ais
+        self.dice = dice if dice else STREAM
+        if load and os.path.exists(self.rngFilename()):
+            # loading must not replace the default stream of the process
+            self.dice = dice if dice else DiceStream()
+            self.dice.load(self.rngFilename())
+        for ai in ais:
+            ai.rng = self.dice
+        self.instrument = instrument
+        if instrument is not None:
+            for ai in ais:
+                instrument.attach(ai)
         if load:
             for ai in ais:
-                ai.load(self.filename(ai))
+                # fall back to checkpoints saved in the other format and to
+                # checkpoints named by the class (saved by older versions)
+                filenames = [self.filename(ai, f) for f in self.FORMATS]
+                filenames += [
+                    self.filename(ai, f, ai.__class__.__name__) for f in self.FORMATS
+                ]
+                filenames.insert(0, self.filename(ai))
+                ai.load(next((f for f in filenames if os.path.exists(f)), filenames[0]))
+        self.stopping = stopping
+        self.signals = {}
+        if convergence or stopping is not None:
+            for ai in ais:
+                ai.trackConvergence()
+
+    def setReadOnly(self, readOnly: bool = True) -> None:
+        """Set all ais read-only (see `BaseAi.setReadOnly`)."""
+        for ai in self.ais:
+            ai.setReadOnly(readOnly)
+
+    def saveAis(self) -> None:
+        """
+        Save checkpoints of all ais (delta checkpoints if configured), in the
+        background if configured.
+        """
+        delta = self.DELTA and self.saves % self.DELTA != 0
+        files = []
+        for i, ai in enumerate(self.ais):
+            print("Saving %s" % self.filename(ai))
+            # evictions are not recorded in deltas, bounded tables are saved fully
+            base = None
+            if delta and not isinstance(ai.Q, BoundedQ):
+                base = self.lastFiles.get(i)
+            files.append((ai, self.filename(ai), base))
+            self.lastFiles[i] = self.filename(ai)
+        rngFilename = self.rngFilename()
+
+        def save():
+            for ai, filename, base in files:
+                ai.save(filename, base=base)
+            self.dice.save(rngFilename)
+
+        if self.saver is None:
+            save()
+        else:
+            if delta:
+                self.saver.wait()  # delta checkpoints read their base checkpoint
+            self.saver.save(save)
+        self.saves += 1
+
+    def writeMetrics(self, elapsed: float) -> None:
+        """Append the statistics since the last progress line to the metrics."""
+        record = {"games": self.games, "time": time.time()}
+        record.update(self.stats.summary())
+        record["games_per_sec"] = self.stats.scores.count / elapsed if elapsed else 0.0
+        for ai in self.ais:
+            record["q_%s" % ai.__class__.__name__] = len(ai.Q)
+            if isinstance(ai.Q, BoundedQ):
+                record["evicted_%s" % ai.__class__.__name__] = ai.Q.evictions
+        for name, signals in self.signals.items():
+            for key, value in signals.items():
+                record["%s_%s" % (key, name)] = value
+        record["memory"] = memory()
+        self.metrics.write(record)
+
+    def popConvergence(self, games: int) -> None:
+        """Collect and print the convergence signals of the last `games` games."""
+        self.signals = {}
+        for ai in self.ais:
+            if ai.convergence is None:
+                continue
+            name = ai.__class__.__name__
+            signals = self.signals[name] = ai.convergence.pop(len(ai.Q), games)
+            print(
+                "  %s: td %.3f - greedy changes %.2f%% - new states %.3f/game"
+                % (
+                    name,
+                    signals["td_error"],
+                    signals["greedy_changes"] * 100,
+                    signals["new_states"],
+                )
+            )
+
+    def batchPlayer(self):
+        """Return a greedy `tenk.batch.BatchPlayer` of the ais (for evaluation)."""
+        raise NotImplementedError
+
+    def evaluate(self, min_reach: float = 0.0) -> Evaluation:
+        """Evaluate the greedy policy of the ais exactly (see `tenk.evaluate`)."""
+        result = evaluate(self.batchPlayer(), min_reach=min_reach)
+        for ai in self.ais:
+            ai.init()  # the batch player sets the states of the ais
+        return result
 
     def choose(self, score: int, dices: List[int]) -> List[int]:
         raise NotImplementedError
@@ -193,33 +524,50 @@ class BaseTenkPlayer(Player):
 
     def write(self, score):
         self.games += 1
-        self.scores.append(score)
-        self.rolls.append(self.cur_rolls)
+        self.stats.add(score, self.cur_rolls)
         self.cur_rolls = 0
-        if score > self.maxscore:
-            self.maxscore = score
-        if self.games % self.PROGRESS == 0:
-            mymean = round(mean(self.scores))
+        progress = self.games % self.PROGRESS == 0
+        save = self.SAVE and self.games % self.SAVE == 0
+        paused = self.instrument is not None and (progress or save)
+        if paused:
+            # progress lines, metrics and checkpoints are not timed
+            self.instrument.pause()
+        if progress:
+            stats = self.stats
+            mymean = round(stats.scores.mean)
+            elapsed = time.time() - self.start_time
             print(
                 "%3i[%3i] - %2i/%.2f - %4i - %s | %.2f"
                 % (
                     mymean,
                     mymean - self.old_mean,
-                    max(self.rolls),
-                    mean(self.rolls),
-                    self.maxscore,
+                    stats.rolls.max,
+                    stats.rolls.mean,
+                    stats.scores.max,
                     str("/".join([str(len(ai.Q)) for ai in self.ais])),
-                    time.time() - self.start_time,
+                    elapsed,
                 )
             )
-            self.old_mean = round(mean(self.scores))
-            self.scores = []
-            self.rolls = []
-            self.maxscore = 0
+            if self.instrument is not None:
+                print(self.instrument.progress(stats.scores.count, self.games))
+            self.popConvergence(stats.scores.count)
+            if self.metrics is not None:
+                self.writeMetrics(elapsed)
+            if self.stopping is not None and self.stopping.update(
+                self, stats.scores.mean
+            ):
+                print("Stopping: %s" % self.stopping.reason)
+                self.end = True
+                if self.SAVE and not save:
+                    self.saveAis()
+            self.old_mean = mymean
+            self.stats = TurnStats()
             self.start_time = time.time()
-        if self.SAVE and (self.games % self.SAVE == 0):
-            for ai in self.ais:
-                print("Saving %s" % self.filename(ai))
-                ai.save(self.filename(ai))
+        if save:
+            self.saveAis()
         if self.EXIT and self.games >= self.EXIT:
             self.end = True
+        if self.end and self.saver is not None:
+            self.saver.wait()
+        if paused:
+            self.instrument.resume()
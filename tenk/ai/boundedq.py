@@ -0,0 +1,96 @@
+import heapq
+from typing import Dict, Iterable, Optional, Tuple
+
+LFU = "lfu"
+LRU = "lru"
+VALUE = "value"
+POLICIES = (LFU, LRU, VALUE)
+
+
+class BoundedQ(dict):
+    """
+    Q dictionary of `BaseAi` with a memory budget of `max_states` states.
+
+    Updates (`__setitem__`) are counted per state and every access through
+    `setdefault` (as done by `BaseAi.getRewards`) marks a state as recently
+    used. When the table exceeds `max_states` the `fraction` of states with
+    the fewest updates (`lfu`), the least recently used states (`lru`) or the
+    states with the lowest best reward (`value`) are evicted in one batch.
+    The number of evicted states is counted in `evictions`.
+    """
+
+    def __init__(
+        self,
+        max_states: int,
+        policy: str = LFU,
+        fraction: float = 0.1,
+        items: Optional[Iterable[Tuple[any, Dict[any, float]]]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError("unknown eviction policy: %s" % policy)
+        super().__init__()
+        self.MAX_STATES = max_states
+        self.POLICY = policy
+        self.KEEP = max(int(max_states * (1 - fraction)), 1)
+        self.counts = {}
+        self.ticks = {}
+        self.tick = 0
+        self.evictions = 0
+        for state, rewards in items if items is not None else ():
+            self[state] = dict(rewards)
+
+    def __setitem__(self, state: any, rewards: Dict[any, float]) -> None:
+        self.tick += 1
+        self.ticks[state] = self.tick
+        self.counts[state] = self.counts.get(state, 0) + 1
+        new = state not in self
+        super().__setitem__(state, rewards)
+        if new and len(self) > self.MAX_STATES:
+            self.evict(state)
+
+    def __delitem__(self, state: any) -> None:
+        super().__delitem__(state)
+        self.counts.pop(state, None)
+        self.ticks.pop(state, None)
+
+    def setdefault(self, state: any, default: Dict[any, float] = None) -> Dict:
+        self.tick += 1
+        self.ticks[state] = self.tick
+        if state in self:
+            return self[state]
+        self.counts[state] = 0
+        super().__setitem__(state, default)
+        if len(self) > self.MAX_STATES:
+            self.evict(state)
+        return default
+
+    def priority(self, state: any) -> any:
+        """Return the eviction priority of a state, lowest is evicted first."""
+        if self.POLICY == LFU:
+            return self.counts[state], self.ticks[state]
+        if self.POLICY == LRU:
+            return self.ticks[state]
+        rewards = self[state]
+        return max(rewards.values()) if rewards else 0.0, self.ticks[state]
+
+    def evict(self, keep: any = None) -> int:
+        """
+        Evict states down to `(1 - fraction) * max_states` (never the state
+        `keep`, just inserted) and return the number of evicted states.
+        """
+        count = len(self) - self.KEEP
+        if count <= 0:
+            return 0
+        candidates = (state for state in self if state != keep)
+        for state in heapq.nsmallest(count, candidates, key=self.priority):
+            del self[state]
+        self.evictions += count
+        return count
+
+    def report(self) -> Dict[str, any]:
+        return {
+            "states": len(self),
+            "max_states": self.MAX_STATES,
+            "policy": self.POLICY,
+            "evictions": self.evictions,
+        }
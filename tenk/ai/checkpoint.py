@@ -0,0 +1,456 @@
+import mmap
+import os
+import pickle
+import struct
+import numpy as np
+from itertools import chain, islice
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Mapping, Optional
+
+# Binary Q checkpoint (`.tenkq`), all numbers little endian:
+#
+#   header: magic, version, flags, states, actions, total states (incl. base),
+#           length of the key table
+#   base:   u16 length + utf-8 path of the base checkpoint (delta checkpoints)
+#   (8 byte aligned from here)
+#   state keys:   states x u64, sorted
+#   action index: states + 1 x u64, range of actions of each state
+#   action keys:  actions x u32 (u64 with `FLAG_WIDE`)
+#   values:       actions x f32
+#   key table:    pickled list of the keys that can not be packed
+#
+# Keys are packed into integers (see `pack_key`), so states are found by binary
+# search on the memory mapped file without reading the whole table and full
+# loads decode the arrays in bulk. Values are stored as float32.
+MAGIC = b"TENKQ\0\0\0"
+VERSION = 2
+FLAG_DELTA = 1
+FLAG_WIDE = 2
+HEADER = struct.Struct("<8sHHQQQQ")
+EXTENSION = ".tenkq"
+
+# key tags in the lowest two bits of a packed key
+TAG_NONE = 0
+TAG_INT = 1
+TAG_STR = 2
+TAG_TABLE = 3
+# characters of string keys (dices, masked dices, scores and the pseudo states
+# "il"/"is" of `BaseTenkAi`), four bits each with 0 as padding
+ALPHABET = "0123456789_xils"
+MAX_CHARS = 15
+_CODES = np.zeros(256, dtype=np.uint64)
+_CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(
+    1, len(ALPHABET) + 1, dtype=np.uint64
+)
+_CHARS = np.frombuffer(b"\0" + ALPHABET.encode(), dtype="S1")
+
+
+def pack_key(key: any, table: Optional[Dict[any, int]] = None) -> Optional[int]:
+    """
+    Pack a state or action key into an unsigned 64 bit integer: `None`,
+    integers below 2^62 and strings of up to `MAX_CHARS` characters of the
+    `ALPHABET`. Other keys are packed as their index in the key `table` if
+    they are in it, `None` is returned otherwise.
+    """
+    if key is None:
+        return TAG_NONE
+    if isinstance(key, str) and len(key) <= MAX_CHARS:
+        payload = 0
+        for i, char in enumerate(key):
+            code = ALPHABET.find(char) + 1
+            if not code:
+                break
+            payload |= code << (4 * i)
+        else:
+            return payload << 2 | TAG_STR
+    elif isinstance(key, (int, np.integer)) and not isinstance(key, bool):
+        if 0 <= key < 1 << 62:
+            return int(key) << 2 | TAG_INT
+    if table is not None and key in table:
+        return table[key] << 2 | TAG_TABLE
+    return None
+
+
+def unpack_key(packed: int, table: Optional[List[any]] = None) -> any:
+    tag = packed & 3
+    payload = packed >> 2
+    if tag == TAG_INT:
+        return payload
+    if tag == TAG_TABLE:
+        return table[payload]
+    if tag == TAG_STR:
+        chars = []
+        while payload:
+            chars.append(ALPHABET[(payload & 15) - 1])
+            payload >>= 4
+        return "".join(chars)
+    return None
+
+
+def pack_keys(keys: List[any], table: Dict[any, int]) -> np.ndarray:
+    """
+    Pack keys (see `pack_key`), strings vectorized. Keys that can not be
+    packed are added to the key `table`.
+    """
+    if keys and set(map(type, keys)) == {str}:
+        lengths = np.fromiter(map(len, keys), dtype=np.intp, count=len(keys))
+        if lengths.max() <= MAX_CHARS and all(map(str.isascii, keys)):
+            chars = np.array(keys, dtype="S%i" % MAX_CHARS).view(np.uint8)
+            codes = _CODES[chars].reshape(len(keys), MAX_CHARS)
+            inside = np.arange(MAX_CHARS) < lengths[:, None]
+            if ((codes > 0) == inside).all():
+                shifts = np.arange(MAX_CHARS, dtype=np.uint64) * np.uint64(4)
+                payload = np.bitwise_or.reduce(codes << shifts, axis=1)
+                return payload << np.uint64(2) | np.uint64(TAG_STR)
+    packed = np.zeros(len(keys), dtype=np.uint64)
+    codes = {}
+    for i, key in enumerate(keys):
+        code = codes.get(key)
+        if code is None:
+            code = pack_key(key, table)
+            if code is None:
+                table[key] = len(table)
+                code = pack_key(key, table)
+            codes[key] = code
+        packed[i] = code
+    return packed
+
+
+def unpack_keys(packed: np.ndarray, table: Optional[List[any]] = None) -> List[any]:
+    """Unpack keys (see `unpack_key`), strings vectorized."""
+    packed = np.asarray(packed, dtype=np.uint64)
+    if len(packed) and (packed & np.uint64(3) == TAG_STR).all():
+        payload = packed >> np.uint64(2)
+        shifts = np.arange(MAX_CHARS, dtype=np.uint64) * np.uint64(4)
+        codes = (payload[:, None] >> shifts) & np.uint64(15)
+        chars = _CHARS[codes.astype(np.intp)].view("S%i" % MAX_CHARS).ravel()
+        return chars.astype("U%i" % MAX_CHARS).tolist()
+    keys = {}
+    return [
+        keys[code] if code in keys else keys.setdefault(code, unpack_key(code, table))
+        for code in packed.tolist()
+    ]
+
+
+def _align(position: int) -> int:
+    return position + (-position % 8)
+
+
+def write(Q: Mapping, filename: str, base: Optional["Checkpoint"] = None) -> None:
+    """
+    Write Q (state -> action -> value) as checkpoint. With a `base` checkpoint
+    only states that differ from it are written (a delta checkpoint), states
+    removed since the base are not recorded. Values are rounded to float32.
+    The file is written to a temporary name and renamed when complete.
+    """
+    items = Q.items()
+    if isinstance(Q, LazyQ) and base is not None:
+        if Q.checkpoint.FILENAME == base.FILENAME:
+            items = Q.overlay.items()  # only states read from base can differ
+    items = list(items)
+    states, rewards = zip(*items) if items else ((), ())
+    states = list(states)
+    actions = list(chain.from_iterable(rewards))
+    values = np.fromiter(
+        chain.from_iterable(map(dict.values, rewards)), dtype="<f4", count=len(actions)
+    )
+    index = np.zeros(len(states) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, rewards), np.int64, len(states)), out=index[1:])
+    if base is not None:
+        # look few states up, decode the base in bulk otherwise
+        known = base if len(states) * 8 < len(base) else base.toDict()
+        stored = values.tolist()
+        changed = [
+            i
+            for i, state in enumerate(states)
+            if known.get(state)
+            != dict(
+                zip(actions[index[i] : index[i + 1]], stored[index[i] : index[i + 1]])
+            )
+        ]
+    else:
+        changed = None
+
+    table = {}
+    state_keys = pack_keys(states, table)
+    order = np.argsort(state_keys, kind="stable")
+    if changed is not None:
+        order = order[np.isin(order, changed)]
+    counts = (index[1:] - index[:-1])[order]
+    action_index = np.zeros(len(order) + 1, dtype="<u8")
+    action_index[1:] = np.cumsum(counts)
+    flat = np.arange(int(action_index[-1]), dtype=np.int64) + np.repeat(
+        index[:-1][order] - action_index[:-1].astype(np.int64), counts
+    )
+    # few distinct actions, pack each once
+    positions = {action: i for i, action in enumerate(dict.fromkeys(actions))}
+    action_keys = pack_keys(list(positions), table)[
+        np.fromiter(map(positions.__getitem__, actions), np.intp, len(actions))[flat]
+    ]
+    wide = bool(len(action_keys)) and int(action_keys.max()) >= 1 << 32
+
+    base_path = b""
+    if base is not None:
+        base_path = os.path.relpath(
+            base.FILENAME, os.path.dirname(os.path.abspath(filename))
+        ).encode()
+    table = pickle.dumps(sorted(table, key=table.get)) if table else b""
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        (FLAG_DELTA if base is not None else 0) | (FLAG_WIDE if wide else 0),
+        len(order),
+        len(flat),
+        len(Q),
+        len(table),
+    ) + struct.pack("<H", len(base_path))
+    header += base_path
+    header += b"\0" * (_align(len(header)) - len(header))
+
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as file:
+        file.write(header)
+        file.write(state_keys[order].astype("<u8").tobytes())
+        file.write(action_index.tobytes())
+        file.write(action_keys.astype("<u8" if wide else "<u4").tobytes())
+        file.write(values[flat].tobytes())
+        file.write(table)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, filename)
+
+
+class Checkpoint(Mapping):
+    """
+    Read-only, memory mapped view of a checkpoint. States are looked up lazily,
+    pages are shared between processes opening the same file. Delta checkpoints
+    open their base checkpoint and fall back to it. `close` (or leaving a
+    `with` block) releases the memory maps.
+    """
+
+    def __init__(self, filename: str):
+        self.FILENAME = os.path.abspath(filename)
+        with open(filename, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self.mm)
+        magic, version, flags, states, actions, total, table = header
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError("not a version %i checkpoint: %s" % (VERSION, filename))
+        self.total = total
+        (length,) = struct.unpack_from("<H", self.mm, HEADER.size)
+        position = HEADER.size + 2
+        base_path = self.mm[position : position + length].decode()
+        position = _align(position + length)
+
+        def array(count: int, dtype: str) -> np.ndarray:
+            nonlocal position
+            result = np.frombuffer(self.mm, dtype=dtype, count=count, offset=position)
+            position += result.nbytes
+            return result
+
+        self.stateKeys = array(states, "<u8")
+        self.actionIndex = array(states + 1, "<u8")
+        self.actionKeys = array(actions, "<u8" if flags & FLAG_WIDE else "<u4")
+        self.values = array(actions, "<f4")
+        self.states = states
+        self.table = pickle.loads(self.mm[position : position + table]) if table else []
+        self.tableIndex = {key: i for i, key in enumerate(self.table)}
+        self.actions = {}
+
+        self.base = None
+        if flags & FLAG_DELTA:
+            self.base = Checkpoint(
+                os.path.join(os.path.dirname(self.FILENAME), base_path)
+            )
+
+    def close(self) -> None:
+        """Release the memory maps (also of the base checkpoints)."""
+        if self.mm is None:
+            return
+        # the arrays export the buffer of the map, drop them first
+        self.stateKeys = self.actionIndex = self.actionKeys = self.values = None
+        self.mm.close()
+        self.mm = None
+        if self.base is not None:
+            self.base.close()
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _find(self, state: any) -> int:
+        key = pack_key(state, self.tableIndex)
+        if key is None:
+            return -1
+        i = int(np.searchsorted(self.stateKeys, np.uint64(key)))
+        return i if i < self.states and self.stateKeys.item(i) == key else -1
+
+    def _action(self, key: int) -> any:
+        if key not in self.actions:
+            self.actions[key] = unpack_key(key, self.table)
+        return self.actions[key]
+
+    def _rewards(self, i: int) -> Dict[any, float]:
+        start, end = self.actionIndex.item(i), self.actionIndex.item(i + 1)
+        keys = [self._action(key) for key in self.actionKeys[start:end].tolist()]
+        return dict(zip(keys, self.values[start:end].tolist()))
+
+    def __getitem__(self, state: any) -> Dict[any, float]:
+        i = self._find(state)
+        if i >= 0:
+            return self._rewards(i)
+        if self.base is not None:
+            return self.base[state]
+        raise KeyError(state)
+
+    def __contains__(self, state: any) -> bool:
+        if self._find(state) >= 0:
+            return True
+        return self.base is not None and state in self.base
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __iter__(self):
+        yield from unpack_keys(self.stateKeys, self.table)
+        if self.base is not None:
+            for state in self.base:
+                if self._find(state) < 0:
+                    yield state
+
+    def toDict(self) -> Dict[any, Dict[any, float]]:
+        """Return all states and rewards, the arrays are decoded in bulk."""
+        Q = self.base.toDict() if self.base is not None else {}
+        keys, inverse = np.unique(self.actionKeys, return_inverse=True)
+        keys = unpack_keys(keys, self.table)
+        actions = iter([keys[i] for i in inverse.tolist()])
+        values = iter(self.values.tolist())
+        counts = np.diff(self.actionIndex).tolist()
+        for state, count in zip(unpack_keys(self.stateKeys, self.table), counts):
+            Q[state] = dict(zip(islice(actions, count), islice(values, count)))
+        return Q
+
+    def items(self):
+        return self.toDict().items()
+
+
+class LazyQ(MutableMapping):
+    """
+    Q dictionary backed by a `Checkpoint`. States are read from the checkpoint
+    on first access and kept (and changed) in memory from then on, so an ai can
+    use it in place of its Q dictionary without loading the whole table.
+    """
+
+    def __init__(self, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+        self.overlay = {}
+        self.deleted = set()
+        self.added = 0
+
+    def close(self) -> None:
+        """Release the checkpoint, states not read yet are lost."""
+        self.checkpoint.close()
+
+    def __enter__(self) -> "LazyQ":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __getitem__(self, state: any) -> Dict[any, float]:
+        rewards = self.overlay.get(state)
+        if rewards is None:
+            if state in self.deleted:
+                raise KeyError(state)
+            rewards = self.overlay[state] = self.checkpoint[state]
+        return rewards
+
+    def __setitem__(self, state: any, rewards: Dict[any, float]) -> None:
+        if state not in self.overlay and (
+            state in self.deleted or state not in self.checkpoint
+        ):
+            self.added += 1
+            self.deleted.discard(state)
+        self.overlay[state] = rewards
+
+    def __delitem__(self, state: any) -> None:
+        self[state]  # raises KeyError for unknown states
+        del self.overlay[state]
+        if state in self.checkpoint:
+            self.deleted.add(state)
+        else:
+            self.added -= 1
+
+    def __contains__(self, state: any) -> bool:
+        if state in self.overlay:
+            return True
+        return state not in self.deleted and state in self.checkpoint
+
+    def __len__(self) -> int:
+        return len(self.checkpoint) - len(self.deleted) + self.added
+
+    def __iter__(self):
+        yield from self.overlay
+        for state in self.checkpoint:
+            if state not in self.overlay and state not in self.deleted:
+                yield state
+
+    def items(self) -> Iterable:
+        """All states and rewards, unread states in bulk from the checkpoint."""
+        yield from self.overlay.items()
+        for state, rewards in self.checkpoint.items():
+            if state not in self.overlay and state not in self.deleted:
+                yield state, rewards
+
+
+def save(Q: Mapping, filename: str, base: Optional[str] = None) -> None:
+    """
+    Save Q as pickle or, for `.tenkq` files, as binary checkpoint (as delta to
+    the checkpoint file `base` if given). Files are replaced atomically.
+    """
+    if filename.endswith(EXTENSION):
+        if base:
+            with Checkpoint(base) as checkpoint:
+                write(Q, filename, base=checkpoint)
+        else:
+            write(Q, filename)
+    else:
+        tmp = filename + ".tmp"
+        with open(tmp, "wb") as file:
+            pickle.dump(Q if type(Q) is dict else dict(Q.items()), file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, filename)
+
+
+def load(filename: str) -> MutableMapping:
+    """
+    Load Q from a pickle or a `.tenkq` checkpoint (lazily, `close` the `LazyQ`
+    when done to release the file).
+    """
+    if filename.endswith(EXTENSION):
+        return LazyQ(Checkpoint(filename))
+    with open(filename, "rb") as file:
+        return pickle.load(file)
+
+
+def load_all(filename: str) -> Dict[any, Dict[any, float]]:
+    """Load the whole Q dictionary from a pickle or a `.tenkq` checkpoint."""
+    if filename.endswith(EXTENSION):
+        with Checkpoint(filename) as loaded:
+            return loaded.toDict()
+    return load(filename)
+
+
+def convert(source: str, target: str) -> None:
+    """Convert between pickle and `.tenkq` checkpoint files."""
+    save(load_all(source), target)
+
+
+if __name__ == "__main__":
+    import sys
+
+    convert(sys.argv[1], sys.argv[2])
@@ -0,0 +1,83 @@
+from typing import Dict, Optional
+
+
+class Convergence(object):
+    """
+    Convergence signals of an ai since the last `pop`: the mean absolute TD
+    error and the rate of greedy action changes per update, and the number of
+    new states per game.
+    """
+
+    def __init__(self, states: int = 0):
+        self.updates = 0
+        self.tdSum = 0.0
+        self.changes = 0
+        self.states = states
+
+    def add(self, td: float, changed: bool) -> None:
+        self.updates += 1
+        self.tdSum += abs(td)
+        if changed:
+            self.changes += 1
+
+    def pop(self, states: int, games: int) -> Dict[str, float]:
+        """Return the signals for the Q size `states` after `games` and reset."""
+        updates = max(self.updates, 1)
+        result = {
+            "td_error": self.tdSum / updates,
+            "greedy_changes": self.changes / updates,
+            # evictions of bounded tables do not count
+            "new_states": max(states - self.states, 0) / max(games, 1),
+        }
+        self.__init__(states)
+        return result
+
+
+class EarlyStopping(object):
+    """
+    Stopping criterion of a training run, checked with every progress line.
+
+    Training plateaus when the best mean score of the last `window` progress
+    intervals is not better than the best mean before by more than
+    `min_delta`. With a `target` the greedy policy is evaluated exactly (see
+    `tenk.evaluate`) every `every` intervals and training stops once it scores
+    at least `target`.
+    """
+
+    def __init__(
+        self,
+        window: int = 5,
+        min_delta: float = 1.0,
+        target: Optional[float] = None,
+        every: int = 1,
+        min_reach: float = 1e-6,
+    ):
+        self.WINDOW = window
+        self.MIN_DELTA = min_delta
+        self.TARGET = target
+        self.EVERY = every
+        self.MIN_REACH = min_reach
+        self.means = []
+        self.scores = []
+        self.reason = None
+
+    def update(self, player, mean: float) -> bool:
+        """
+        Add the mean score of a progress interval of `player` (a
+        `BaseTenkPlayer`) and return whether to stop training.
+        """
+        self.means.append(mean)
+        if self.TARGET is not None and len(self.means) % self.EVERY == 0:
+            score = player.evaluate(min_reach=self.MIN_REACH).value
+            self.scores.append(score)
+            print("  evaluated: %.2f" % score)
+            if score >= self.TARGET:
+                self.reason = "target %.2f reached (%.2f)" % (self.TARGET, score)
+                return True
+        if self.WINDOW and len(self.means) > self.WINDOW:
+            best = max(self.means[: -self.WINDOW])
+            recent = max(self.means[-self.WINDOW :])
+            if recent <= best + self.MIN_DELTA:
+                self.reason = "plateau at %.2f over %i intervals" % (best, self.WINDOW)
+                return True
+        return False
@@ -0,0 +1,228 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+from tenk.ai.arrayq import ArrayQAi
+from tenk.ai.base import BaseAi
+from tenk.batch import SIZE_TABLE, BatchPlayer, random_keeps
+from tenk.game import PolicyPlayer
+from tenk.scoring import (
+    CODE_SPACE,
+    DICES,
+    KEEPS,
+    MAX_DICES,
+    SCORES,
+    encode,
+)
+
+SINGLE = "single"
+SPLIT = "split"
+# single policies store keep code and finish in one action
+FINISH_BIT = CODE_SPACE
+
+
+def _greedy(ai: BaseAi) -> Dict[any, any]:
+    """
+    Return state name -> best action name of all states of an ai with a
+    positive best reward (names as used by the dictionary based ais).
+    """
+    if getattr(ai, "abstraction", None) is not None:
+        raise ValueError("policies of abstracted states can not be frozen")
+    names = isinstance(ai, ArrayQAi)
+    policy = {}
+    for state, rewards in ai.Q.items():
+        rewards = {a: v for a, v in rewards.items() if a is not None}
+        if not rewards or max(rewards.values()) <= 0:
+            continue  # played randomly by the ais
+        action = max(rewards, key=rewards.get)
+        if names:
+            state, action = ai.stateName(state), ai.actionName(action)
+        policy[state] = action
+    return policy
+
+
+def _table(entries: Dict[int, int], dtype) -> Tuple[np.ndarray, np.ndarray]:
+    keys = np.array(sorted(entries), dtype=np.int64)
+    values = np.array([entries[key] for key in keys.tolist()], dtype=dtype)
+    return keys, values
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query: np.ndarray, missing: int):
+    if not len(keys):
+        return np.full(len(query), missing, dtype=values.dtype)
+    index = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    return np.where(keys[index] == query, values[index], missing)
+
+
+class FrozenPolicy(BatchPlayer):
+    """
+    Inference only greedy policy of trained ais: one action per state in
+    sorted key/value arrays, looked up by binary search for whole batches.
+
+    `single` policies (from a `SingleAi`) map `score * CODE_SPACE + dice code`
+    to the keep code (with `FINISH_BIT` set to finish). `split` policies (from
+    a `DiceAi` and a `RollAi`) map dice codes to keep codes and
+    `score * (MAX_DICES + 1) + dices left` to the finish decision.
+    States the ais have not learned are played randomly like the ais do.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        keepKeys: np.ndarray,
+        keeps: np.ndarray,
+        finishKeys: Optional[np.ndarray] = None,
+        finishes: Optional[np.ndarray] = None,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        if kind not in (SINGLE, SPLIT):
+            raise ValueError("unknown policy kind: %s" % kind)
+        self.KIND = kind
+        self.keepKeys = keepKeys
+        self.keeps = keeps
+        self.finishKeys = finishKeys
+        self.finishes = finishes
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.lastFinishes = None
+
+    def __len__(self) -> int:
+        return len(self.keepKeys) + (len(self.finishKeys) if self.KIND == SPLIT else 0)
+
+    def save(self, filename: str) -> None:
+        """Save the policy as compressed `.npz` file."""
+        arrays = {"kind": np.array(self.KIND), "keepKeys": self.keepKeys}
+        arrays["keeps"] = self.keeps
+        if self.KIND == SPLIT:
+            arrays["finishKeys"] = self.finishKeys
+            arrays["finishes"] = self.finishes
+        with open(filename, "wb") as file:
+            np.savez_compressed(file, **arrays)
+
+    @staticmethod
+    def load(
+        filename: str, rng: Optional[np.random.Generator] = None
+    ) -> "FrozenPolicy":
+        with np.load(filename) as data:
+            return FrozenPolicy(
+                str(data["kind"]),
+                data["keepKeys"],
+                data["keeps"],
+                data["finishKeys"] if "finishKeys" in data else None,
+                data["finishes"] if "finishes" in data else None,
+                rng=rng,
+            )
+
+    def choose_batch(self, codes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        Return the keep codes for rolled dice codes at the turn scores before
+        the roll (see `BatchPlayer.choose`).
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        if self.KIND == SINGLE:
+            query = np.asarray(scores, dtype=np.int64) * CODE_SPACE + codes
+        else:
+            query = codes
+        actions = _lookup(self.keepKeys, self.keeps, query, 0)
+        keep = (actions & (FINISH_BIT - 1)).astype(np.int32)
+        unseen = keep == 0
+        keep[unseen] = random_keeps(codes[unseen], self.rng)
+        if self.KIND == SINGLE:
+            finish = actions >= FINISH_BIT
+            finish[unseen] = self.rng.random(int(unseen.sum())) < 0.5
+            self.lastFinishes = finish
+        return keep
+
+    def finish_batch(self, codes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        Return the finish decisions for the dice codes left after the keeps of
+        the last `choose_batch` and the turn scores including the keeps.
+        """
+        if self.KIND == SINGLE:
+            return self.lastFinishes
+        query = np.asarray(scores, dtype=np.int64) * (MAX_DICES + 1) + SIZE_TABLE[codes]
+        finish = _lookup(self.finishKeys, self.finishes, query, -1)
+        unseen = finish < 0
+        finish = finish > 0
+        finish[unseen] = self.rng.random(int(unseen.sum())) < 0.5
+        return finish
+
+    def choose(self, codes, scores):
+        return self.choose_batch(codes, scores)
+
+    def finish(self, codes, scores):
+        return self.finish_batch(codes, scores)
+
+    def moves(self, code, score):
+        if self.KIND == SINGLE:
+            key = score * CODE_SPACE + code
+            action = int(_lookup(self.keepKeys, self.keeps, np.array([key]), 0)[0])
+            if action:
+                keep = action & (FINISH_BIT - 1)
+                return [(1.0, keep, float(action >= FINISH_BIT))], []
+            return [(1 / len(KEEPS[code]), k, 0.5) for k in KEEPS[code]], [key]
+
+        unseen = []
+        keep = int(_lookup(self.keepKeys, self.keeps, np.array([code]), 0)[0])
+        keeps = [(1.0, keep)]
+        if not keep:
+            keeps = [(1 / len(KEEPS[code]), k) for k in KEEPS[code]]
+            unseen.append(("dices", code))
+        moves = []
+        for weight, keep in keeps:
+            finish = 0.0
+            if keep in KEEPS[code]:
+                key = (score + SCORES[keep]) * (MAX_DICES + 1) + len(DICES[code - keep])
+                finish = int(
+                    _lookup(self.finishKeys, self.finishes, np.array([key]), -1)[0]
+                )
+                if finish < 0:
+                    finish = 0.5
+                    unseen.append(("roll", key))
+            moves.append((weight, keep, float(finish)))
+        return moves, unseen
+
+
+def freeze_single(
+    ai: BaseAi, rng: Optional[np.random.Generator] = None
+) -> FrozenPolicy:
+    """Freeze the greedy policy of a (trained) `SingleAi` or `ArraySingleAi`."""
+    entries = {}
+    for state, action in _greedy(ai).items():
+        dices, score = state.split("_")
+        dices = [int(dice) for dice in dices]
+        finish, keep = int(action[0]), [int(i) for i in action[1:]]
+        entries[int(score) * CODE_SPACE + encode(dices)] = encode(
+            [dices[i] for i in keep]
+        ) | (FINISH_BIT if finish else 0)
+    keys, keeps = _table(entries, np.int32)
+    return FrozenPolicy(SINGLE, keys, keeps, rng=rng)
+
+
+def freeze_split(
+    diceai: BaseAi, rollai: BaseAi, rng: Optional[np.random.Generator] = None
+) -> FrozenPolicy:
+    """Freeze the greedy policies of a (trained) `DiceAi` and `RollAi`."""
+    keeps = {}
+    for state, action in _greedy(diceai).items():
+        dices = [int(dice) for dice in state]
+        keeps[encode(dices)] = encode([dices[int(i)] for i in action])
+    finishes = {}
+    for state, action in _greedy(rollai).items():
+        finishes[int(state[1:]) * (MAX_DICES + 1) + int(state[0])] = int(action)
+    keepKeys, keepValues = _table(keeps, np.int32)
+    finishKeys, finishValues = _table(finishes, np.int8)
+    return FrozenPolicy(SPLIT, keepKeys, keepValues, finishKeys, finishValues, rng=rng)
+
+
+class FrozenPlayer(PolicyPlayer):
+    """TenK player playing a `FrozenPolicy` (e.g. to serve moves)."""
+
+    def __init__(self, policy: FrozenPolicy, exit: Optional[int] = None):
+        super().__init__(self.move, exit=exit)
+        self.policy = policy
+
+    def move(self, code: int, score: int) -> Tuple[int, bool]:
+        """Return the keep and finish decision of the policy for one roll."""
+        keep = int(self.policy.choose_batch(np.array([code]), np.array([score]))[0])
+        finish = self.policy.finish_batch(
+            np.array([code - keep]), np.array([score + SCORES.get(keep, 0)])
+        )
+        return keep, bool(finish[0])
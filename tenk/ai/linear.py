@@ -0,0 +1,402 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from tenk import batch
+from tenk.ai import checkpoint
+from tenk.ai.arrayq import keep_indexes, keep_mask
+from tenk.ai.convergence import EarlyStopping
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.batch import BatchPlayer, random_keeps
+from tenk.game import play
+from tenk.rng import DiceStream
+from tenk.scoring import (
+    CODE_SPACE,
+    DICES,
+    FACES,
+    KEEPS,
+    LEGAL_KEEPS,
+    MAX_DICES,
+    SCORES,
+    encode,
+    on_rules,
+)
+
+# points are scaled to keep the features in the range of the counts
+SCALE = 1000.0
+# features of a keep: kept and rolled back dices per face, points of the keep,
+# turn score before the keep, dices to roll next (one hot) and the turn score
+# after the keep per dices to roll next
+FEATURES = (
+    ["bias"]
+    + ["kept%i" % face for face in FACES]
+    + ["rest%i" % face for face in FACES]
+    + ["points", "score"]
+    + ["left%i" % left for left in range(1, MAX_DICES + 1)]
+    + ["total_left%i" % left for left in range(1, MAX_DICES + 1)]
+)
+POINTS = FEATURES.index("points")
+SCORE = FEATURES.index("score")
+LEFT = FEATURES.index("left1")
+TOTAL_LEFT = FEATURES.index("total_left1")
+
+_KEEPS = {}
+on_rules(_KEEPS.clear)
+# states with cached features (see `state_features`), cleared when full
+CACHE_SIZE = 50000
+_FEATURES = {}
+on_rules(_FEATURES.clear)
+_RANKS = []
+on_rules(_RANKS.clear)
+
+
+def keep_features(code: int) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """
+    Return the features of all legal keeps of a roll as `A + score * B` and
+    the keep masks (see `tenk.ai.arrayq.keep_mask`). Cached per dice code.
+    """
+    if code not in _KEEPS:
+        A = np.zeros((len(KEEPS[code]), len(FEATURES)))
+        B = np.zeros_like(A)
+        for row, keep in enumerate(KEEPS[code]):
+            points = SCORES[keep] / SCALE
+            left = len(DICES[code - keep]) or MAX_DICES
+            A[row, 0] = 1.0
+            for dice in DICES[keep]:
+                A[row, dice] += 1.0
+            for dice in DICES[code - keep]:
+                A[row, MAX_DICES + dice] += 1.0
+            A[row, POINTS] = points
+            A[row, LEFT + left - 1] = 1.0
+            A[row, TOTAL_LEFT + left - 1] = points
+            B[row, SCORE] = B[row, TOTAL_LEFT + left - 1] = 1.0 / SCALE
+        _KEEPS[code] = (A, B, [keep_mask(keep) for keep in LEGAL_KEEPS[code]])
+    return _KEEPS[code]
+
+
+def state_features(state: int) -> Tuple[np.ndarray, np.ndarray, List[int], list]:
+    """
+    Return the features of the legal keeps of a state (keeps x features and
+    transposed, both contiguous), their masks and the squared norms of the
+    features, cached per state.
+    """
+    features = _FEATURES.get(state)
+    if features is None:
+        if len(_FEATURES) >= CACHE_SIZE:
+            _FEATURES.clear()
+        score, code = divmod(state, CODE_SPACE)
+        A, B, masks = keep_features(code)
+        matrix = A + score * B
+        norms = (matrix * matrix).sum(axis=1).tolist()
+        features = _FEATURES[state] = matrix, matrix.T.copy(), masks, norms
+    return features
+
+
+def rank_features() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return `A` and `B` of the keep features (see `keep_features`) of all
+    dice codes by their rank in `tenk.batch.RANK_TABLE`, padded to the most
+    keeps (ranks x keeps x features), and the mask of the real keeps.
+    """
+    if not _RANKS:
+        size = (len(KEEPS), int(batch.KEEP_COUNTS.max()), len(FEATURES))
+        A, B = np.zeros(size), np.zeros(size)
+        for rank, code in enumerate(KEEPS):
+            keeps = len(KEEPS[code])
+            A[rank, :keeps], B[rank, :keeps] = keep_features(code)[:2]
+        valid = np.arange(size[1]) < batch.KEEP_COUNTS[:, None]
+        _RANKS.extend((A, B, valid))
+    return tuple(_RANKS)
+
+
+class LinearQ(object):
+    """
+    Linear Q function of the `LinearAi`: one row of weights over the keep
+    `FEATURES` per finish decision, so the model has a fixed size and
+    generalizes over similar rolls. The values of the keeps of a state are
+    cached until the weights change (see `update`).
+
+    Read access mimics the dictionary of dictionaries of `BaseAi.Q` for the
+    integer states and actions of the `LinearAi`.
+    """
+
+    def __init__(self):
+        self.weights = np.zeros((2, len(FEATURES)))
+        self.cache = {}
+
+    def __len__(self) -> int:
+        return self.weights.size
+
+    def __contains__(self, state: int) -> bool:
+        return bool(KEEPS.get(state % CODE_SPACE))
+
+    def values(self, transposed: np.ndarray) -> np.ndarray:
+        """
+        Return the values of transposed keep features (finish x keeps) with
+        one matrix product.
+        """
+        return self.weights.dot(transposed)
+
+    def evaluate(self, state: int) -> Tuple[np.ndarray, int]:
+        """
+        Return the values of the legal keeps of a state (finish x keeps) and
+        the best (flat) index of them.
+        """
+        evaluated = self.cache.get(state)
+        if evaluated is None:
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            values = self.values(state_features(state)[1])
+            evaluated = self.cache[state] = values, int(values.argmax())
+        return evaluated
+
+    def update(self, finish: int, step: float, features: np.ndarray) -> None:
+        """Add `step * features` to the weights of a finish decision."""
+        weights = self.weights[finish]
+        weights += step * features
+        if self.cache:
+            self.cache.clear()
+
+    def get(self, state: int, default=None) -> Dict[int, float]:
+        if state not in self:
+            return default
+        values = self.evaluate(state)[0]
+        masks = keep_features(state % CODE_SPACE)[2]
+        return {
+            finish << MAX_DICES | mask: values.item(finish, row)
+            for row, mask in enumerate(masks)
+            for finish in (0, 1)
+        }
+
+    def __getitem__(self, state: int) -> Dict[int, float]:
+        rewards = self.get(state)
+        if rewards is None:
+            raise KeyError(state)
+        return rewards
+
+    def toDict(self) -> Dict[int, Dict[str, float]]:
+        """Return the weights as finish -> feature name -> weight."""
+        return {
+            finish: dict(zip(FEATURES, self.weights[finish].tolist()))
+            for finish in (0, 1)
+        }
+
+    def fromDict(self, weights: Dict[int, Dict[str, float]]) -> None:
+        for finish in (0, 1):
+            for i, name in enumerate(FEATURES):
+                self.weights[finish, i] = weights[finish].get(name, 0.0)
+        self.cache.clear()
+
+
+class LinearAi(SingleAi):
+    """
+    `SingleAi` approximating Q linearly over features of the keeps (see
+    `LinearQ`) instead of a table entry per state, updated by semi-gradient
+    TD with the step size normalized by the squared norm of the features.
+    All legal keeps of a roll are scored at once with one matrix product of
+    the features cached per state (see `state_features`).
+    States and actions are encoded as integers like the `ArraySingleAi`.
+    The features are of the raw dices and scores and the best value is the
+    estimate of a state, so reward functions and abstractions are rejected.
+    """
+
+    NAME = "LinearAi"
+
+    def __init__(
+        self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None, abstraction=None
+    ):
+        if rewardFkn is not None:
+            raise ValueError("linear models estimate states by their best value")
+        if abstraction is not None:
+            raise ValueError("linear models use features of the raw states")
+        super().__init__(alpha, gamma, randomness)
+        self.Q = LinearQ()
+
+    def init(self) -> None:
+        super().init()
+        self.evaluated = None
+        self.lastFeatures = None
+        self.lastNorm = 1.0
+
+    def encodeState(self) -> any:
+        return self.score * CODE_SPACE + encode(self.dices)
+
+    def encodeAction(self) -> any:
+        return int(self.finish) << MAX_DICES | keep_mask(self.keep)
+
+    def decodeAction(self, action):
+        return action >> MAX_DICES, keep_indexes(action & ((1 << MAX_DICES) - 1))
+
+    def keepValues(self) -> tuple:
+        """
+        Return features, masks, norms, values and the best (flat) index of the
+        values of the keeps of the current state, evaluated once per state:
+        the update of the previous step and the choice of the action both use
+        the values before the update. Read-only ais use the values cached by
+        `LinearQ.evaluate`.
+        """
+        if self.evaluated is None:
+            features, transposed, masks, norms = state_features(self.state)
+            if self.READ_ONLY:
+                values, best = self.Q.evaluate(self.state)
+            else:
+                values = self.Q.values(transposed)
+                best = values.argmax()
+            self.evaluated = features, masks, norms, values, best
+        return self.evaluated
+
+    def greedyAction(self, state: int) -> Tuple[Optional[int], float]:
+        if state not in self.Q:
+            return None, 0.0
+        values, best = self.Q.evaluate(state)
+        masks = keep_features(state % CODE_SPACE)[2]
+        finish, row = divmod(best, len(masks))
+        mask = masks[row]
+        return finish << MAX_DICES | mask, values.item(best)
+
+    def load(self, filename: str) -> None:
+        self.Q = LinearQ()
+        self.Q.fromDict(checkpoint.load_all(filename))
+
+    def save(self, filename: str, base: Optional[str] = None) -> None:
+        checkpoint.save(self.Q.toDict(), filename, base=base)
+
+    def compress(self, single_value=True):
+        raise TypeError("linear models have no table to compress")
+
+    def boundQ(self, max_states: int, policy: str = "lfu") -> None:
+        raise TypeError("linear models have a fixed size")
+
+    def trackVisits(self) -> None:
+        raise TypeError("linear models can not merge visits")
+
+    def setTraces(self, lam: float) -> None:
+        if lam:
+            raise ValueError("linear models learn one-step TD only")
+        super().setTraces(lam)
+
+    def updateReward(self, terminal: bool = False) -> None:
+        features = self.lastFeatures
+        if features is None or self.READ_ONLY:
+            return
+        finish = self.lastAction >> MAX_DICES
+        target = self.calculateReward()
+        if not terminal:
+            evaluated = self.evaluated or self.keepValues()
+            target += self.GAMMA * evaluated[3].item(evaluated[4])
+        td = target - features.dot(self.Q.weights[finish])
+        if self.convergence is not None:
+            greedy = self.Q.evaluate(self.lastState)[1]
+        self.Q.update(finish, self.ALPHA * td / self.lastNorm, features)
+        if self.convergence is not None:
+            changed = greedy != self.Q.evaluate(self.lastState)[1]
+            self.convergence.add(td, changed)
+
+    def act(self):
+        features, masks, norms, values, best = self.evaluated or self.keepValues()
+        self.evaluated = None
+        if self.rng.random() < self.RANDOMNESS:
+            row = int(self.rng.random() * len(masks))
+            self.finish = self.rng.bit()
+        else:
+            self.finish, row = divmod(int(best), len(masks))
+        self.keep = keep_indexes(masks[row])
+        if not self.READ_ONLY:
+            self.lastFeatures = features[row]
+            self.lastNorm = norms[row]
+        return self.finish << MAX_DICES | masks[row]
+
+
+class LinearAiPlayer(SingleAiPlayer):
+    """`SingleAiPlayer` of a `LinearAi`, evaluated with the `LinearBatchPlayer`."""
+
+    def batchPlayer(self):
+        return LinearBatchPlayer(self.ai)
+
+
+class LinearBatchPlayer(BatchPlayer):
+    """
+    Greedy batch player of a `LinearAi` without learning. The values of the
+    keeps of all dice codes are computed with one matrix product whenever
+    the weights changed, so all rolls of a batch step are scored at once.
+    Exploration is like `tenk.ai.single.SingleAiBatchPlayer`.
+    """
+
+    def __init__(self, ai: LinearAi, rng: Optional[np.random.Generator] = None):
+        self.ai = ai
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.weights = None
+        self.values = None
+        self.finishes = None
+
+    def keepValues(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the values of the keeps of all dice codes by rank as `A + score
+        * B` (ranks x keeps x finish), padded keeps valued `-inf`.
+        """
+        weights = self.ai.Q.weights
+        if self.weights is None or not np.array_equal(self.weights, weights):
+            A, B, valid = rank_features()
+            A, B = A.dot(weights.T), B.dot(weights.T)
+            A[~valid] = -np.inf
+            self.weights = weights.copy()
+            self.values = A, B
+        return self.values
+
+    def choose(self, codes, scores):
+        A, B = self.keepValues()
+        ranks = batch.RANK_TABLE[codes]
+        values = A[ranks] + scores[:, None, None] * B[ranks]
+        best = values.reshape(len(codes), -1).argmax(axis=1)
+        keep = batch.KEEP_TABLE[ranks, best >> 1]
+        finish = (best & 1).astype(bool)
+        explore = self.rng.random(len(codes)) < self.ai.RANDOMNESS
+        keep[explore] = random_keeps(codes[explore], self.rng)
+        finish[explore] = self.rng.random(int(explore.sum())) < 0.5
+        self.finishes = finish
+        return keep
+
+    def finish(self, codes, scores):
+        return self.finishes
+
+    def moves(self, code, score):
+        action, _ = self.ai.greedyAction(score * CODE_SPACE + code)
+        finish, keep = self.ai.decodeAction(action)
+        return [(1.0, encode([DICES[code][i] for i in keep]), float(finish))], []
+
+
+def train(
+    name,
+    alpha=0.01,
+    gamma=0.6,
+    exp=0.1,
+    max_games=10000000,
+    step=1000000,
+    progress=100000,
+    tag=None,
+    load=None,
+    fileformat="pickle",
+    seed=None,
+    metrics=None,
+    stopping: Optional[EarlyStopping] = None,
+):
+    """Like `tenk.ai.single.train` with a `LinearAi`."""
+    if not tag:
+        tag = "%s_%s_%s_%s" % (
+            name,
+            str(alpha).replace(".", ""),
+            str(gamma).replace(".", ""),
+            str(exp).replace(".", ""),
+        )
+    player = LinearAiPlayer(
+        LinearAi(alpha, gamma, exp),
+        tag=tag,
+        save=step,
+        exit=max_games,
+        progress=progress,
+        load=load,
+        fileformat=fileformat,
+        dice=DiceStream(seed) if seed is not None else None,
+        metrics=metrics,
+        stopping=stopping,
+    )
+    play(player)
+    return tag
@@ -0,0 +1,197 @@
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from tenk.ai.base import BaseTenkPlayer
+from tenk.game import play
+from tenk.stats import TurnStats
+
+# Q deltas: state -> action -> (value, visits), one dictionary per ai of a player.
+Delta = Dict[any, Dict[any, tuple]]
+
+
+def collect_delta(ai) -> Delta:
+    """Return the values of all state/actions the ai updated since the last call."""
+    delta = {}
+    for state, actions in ai.popVisits().items():
+        rewards = ai.getRewards(state)
+        delta[state] = {
+            action: (rewards[action], visits) for action, visits in actions.items()
+        }
+    return delta
+
+
+def merge(deltas: List[Delta]) -> Dict[any, Dict[any, float]]:
+    """
+    Merge the deltas of several workers for one ai.
+
+    Every state/action updated by at least one worker gets the visit-weighted
+    average of the workers' values: `sum(n_k * q_k) / sum(n_k)`, where `n_k` is
+    the number of updates worker `k` made to it since the last merge. Values
+    not updated by any worker are kept.
+    """
+    sums = {}
+    for delta in deltas:
+        for state, actions in delta.items():
+            state_sums = sums.setdefault(state, {})
+            for action, (value, visits) in actions.items():
+                total, count = state_sums.get(action, (0.0, 0))
+                state_sums[action] = (total + value * visits, count + visits)
+    return {
+        state: {action: total / count for action, (total, count) in actions.items()}
+        for state, actions in sums.items()
+    }
+
+
+def apply(ai, merged: Dict[any, Dict[any, float]]) -> None:
+    """Write merged values into the Q dictionary of an ai."""
+    for state, actions in merged.items():
+        ai.setRewards(state, actions)
+
+
+def _worker(make_player: Callable, seed: np.random.SeedSequence, conn) -> None:
+    player = make_player()
+    player.dice.seed(seed)
+    player.PROGRESS = float("inf")
+    player.SAVE = None
+    for ai in player.ais:
+        ai.trackVisits()
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        merged, games = message
+        for ai, values in zip(player.ais, merged):
+            apply(ai, values)
+        start = time.time()
+        player.end = False
+        player.EXIT = player.games + games
+        if games:
+            play(player)
+        deltas = [collect_delta(ai) for ai in player.ais]
+        conn.send((deltas, games, time.time() - start, player.stats.scores.total))
+        player.stats = TurnStats()
+    conn.close()
+
+
+def _split(games: int, workers: int) -> List[int]:
+    return [
+        games // workers + (1 if i < games % workers else 0) for i in range(workers)
+    ]
+
+
+def train_parallel(
+    make_player: Callable[[], BaseTenkPlayer],
+    workers: Optional[int] = None,
+    sync: int = 10000,
+    max_games: int = 10000000,
+    save: Optional[int] = 1000000,
+    progress: int = 100000,
+    seed: int = 0,
+) -> BaseTenkPlayer:
+    """
+    Train the ais of a player in `workers` processes.
+
+    Every worker plays up to `sync` games on its own copy of the Q tables (with
+    its dice stream seeded with a child of `SeedSequence(seed)`), then ships its
+    delta to the coordinator which merges them (see `merge`) and sends the
+    merged values back to all workers.
+    `make_player` has to be picklable (e.g. a module level function or a
+    `functools.partial` of one) and is called once in every process.
+    Returns the coordinator player holding the merged Q tables.
+    """
+    workers = workers if workers else os.cpu_count()
+    player = make_player()
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    connections = []
+    processes = []
+    for i in range(workers):
+        parent, child = mp.Pipe()
+        process = mp.Process(
+            target=_worker, args=(make_player, seeds[i], child), daemon=True
+        )
+        process.start()
+        connections.append(parent)
+        processes.append(process)
+
+    merged = [{} for ai in player.ais]
+    start_time = time.time()
+    last_progress = player.games
+    scores = seconds = 0.0
+    try:
+        while player.games < max_games:
+            # play exactly up to the next checkpoint or the end
+            remaining = max_games - player.games
+            if save:
+                remaining = min(remaining, save - player.games % save)
+            for conn, games in zip(
+                connections, _split(min(remaining, sync * workers), workers)
+            ):
+                conn.send((merged, games))
+            results = [conn.recv() for conn in connections]
+            merged = [
+                merge([deltas[i] for deltas, _, _, _ in results])
+                for i in range(len(player.ais))
+            ]
+            for ai, values in zip(player.ais, merged):
+                apply(ai, values)
+
+            player.games += sum(games for _, games, _, _ in results)
+            scores += sum(score for _, _, _, score in results)
+            seconds += sum(elapsed for _, _, elapsed, _ in results)
+            if player.games - last_progress >= progress:
+                elapsed = time.time() - start_time
+                print(
+                    "%9i: %3i - %8.0f games/s - %2i workers (%.0f games/s each) - %s"
+                    % (
+                        player.games,
+                        round(scores / (player.games - last_progress)),
+                        (player.games - last_progress) / elapsed,
+                        workers,
+                        (player.games - last_progress) / seconds,
+                        "/".join([str(len(ai.Q)) for ai in player.ais]),
+                    )
+                )
+                last_progress = player.games
+                scores = seconds = 0.0
+                start_time = time.time()
+            if save and player.games % save == 0:
+                player.saveAis()
+    finally:
+        for conn in connections:
+            conn.send(None)
+        for process in processes:
+            process.join()
+    return player
+
+
+def scaling(
+    make_player: Callable[[], BaseTenkPlayer],
+    workers: List[int] = (1, 2, 4, 8, 16, 32),
+    games: int = 200000,
+    sync: int = 10000,
+) -> Dict[int, float]:
+    """
+    Measure training throughput for different numbers of worker processes.
+    Prints and returns games/sec per worker count.
+    """
+    rates = {}
+    for count in workers:
+        if count > os.cpu_count():
+            break
+        start = time.time()
+        train_parallel(
+            make_player,
+            workers=count,
+            sync=sync,
+            max_games=games,
+            save=None,
+            progress=float("inf"),
+        )
+        rates[count] = games / (time.time() - start)
+        print(
+            "%2i workers: %8.0f games/s (x%.2f)"
+            % (count, rates[count], rates[count] / rates[workers[0]])
+        )
+    return rates
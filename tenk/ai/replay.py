@@ -0,0 +1,102 @@
+import numpy as np
+from typing import Optional, Tuple
+
+
+class ReplayBuffer(object):
+    """
+    Ring buffer of transitions (state, action, reward, next state, terminal)
+    in preallocated NumPy arrays, states and actions as integer codes. Added
+    transitions are collected in a list and written to the arrays in bulk
+    before the next batch.
+
+    Batches are the most recent transitions (`recent`) or sampled uniformly
+    (`sample`), with `prioritized` proportional to `(|TD error| + eps) ** alpha`
+    of their last update (new transitions get the highest priority so far).
+    Without an `rng` the ai learning from the buffer seeds it from its dice
+    stream (see `ArrayQAi.setReplay`).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        prioritized: bool = False,
+        alpha: float = 0.6,
+        eps: float = 1.0,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        self.CAPACITY = capacity
+        self.PRIORITIZED = prioritized
+        self.ALPHA = alpha
+        self.EPS = eps
+        self.rng = rng
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.nextStates = np.zeros(capacity, dtype=np.int64)
+        self.terminals = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+        self.maxPriority = 1.0
+        self.count = 0  # transitions added in total
+        self.pending = []
+
+    def __len__(self) -> int:
+        return min(self.count, self.CAPACITY)
+
+    def seed(self, seed: any) -> None:
+        """Sample from a new generator seeded with `seed` (e.g. a `SeedSequence`)."""
+        self.rng = np.random.default_rng(seed)
+
+    def add(
+        self, state: int, action: int, reward: float, nextState: int, terminal: bool
+    ) -> None:
+        self.pending.append((state, action, reward, nextState, terminal))
+        self.count += 1
+
+    def flush(self) -> None:
+        """Write the pending transitions to the arrays."""
+        if not self.pending:
+            return
+        pending = self.pending[-self.CAPACITY :]
+        indexes = np.arange(self.count - len(pending), self.count) % self.CAPACITY
+        states, actions, rewards, nextStates, terminals = zip(*pending)
+        self.states[indexes] = states
+        self.actions[indexes] = actions
+        self.rewards[indexes] = rewards
+        self.nextStates[indexes] = nextStates
+        self.terminals[indexes] = terminals
+        self.priorities[indexes] = self.maxPriority
+        self.pending = []
+
+    def recent(self, size: int) -> np.ndarray:
+        """Return the indexes of the last `size` transitions, oldest first."""
+        self.flush()
+        size = min(size, len(self))
+        return np.arange(self.count - size, self.count) % self.CAPACITY
+
+    def sample(self, size: int) -> np.ndarray:
+        """Return the indexes of `size` sampled transitions."""
+        self.flush()
+        if self.rng is None:
+            self.rng = np.random.default_rng()
+        if not self.PRIORITIZED:
+            return self.rng.integers(0, len(self), size)
+        totals = np.cumsum(self.priorities[: len(self)])
+        return np.searchsorted(totals, self.rng.random(size) * totals[-1], "right")
+
+    def batch(
+        self, indexes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            self.states[indexes],
+            self.actions[indexes],
+            self.rewards[indexes],
+            self.nextStates[indexes],
+            self.terminals[indexes],
+        )
+
+    def updatePriorities(self, indexes: np.ndarray, td: np.ndarray) -> None:
+        if not self.PRIORITIZED:
+            return
+        priorities = (np.abs(td) + self.EPS) ** self.ALPHA
+        self.priorities[indexes] = priorities
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
@@ -0,0 +1,67 @@
+import os
+import sys
+import traceback
+from typing import Callable, List
+
+
+class BackgroundSaver(object):
+    """
+    Runs checkpoint saves in forked child processes: the child gets a
+    copy-on-write snapshot of the Q tables at the time of the fork and
+    serializes it while training goes on in the parent. At most `pending`
+    saves are in flight, further saves wait for the oldest one first.
+    Without `os.fork` (e.g. on windows) saves run synchronously.
+    """
+
+    def __init__(self, pending: int = 1):
+        self.PENDING = max(pending, 1)
+        self.pids = []
+        self.failed = 0
+
+    def save(self, fkn: Callable[[], None]) -> None:
+        """Call `fkn` (writing checkpoints) on a snapshot of the process."""
+        if not hasattr(os, "fork"):
+            fkn()
+            return
+        self.poll()
+        while len(self.pids) >= self.PENDING:
+            self._wait(self.pids.pop(0))
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:  # child
+            status = 0
+            try:
+                fkn()
+                sys.stdout.flush()
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        self.pids.append(pid)
+
+    def _wait(self, pid: int) -> None:
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            self.failed += 1
+
+    def poll(self) -> List[int]:
+        """Reap finished saves and return the pids still in flight."""
+        for pid in list(self.pids):
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                self.pids.remove(pid)
+                if status != 0:
+                    self.failed += 1
+        return self.pids
+
+    def wait(self) -> None:
+        """
+        Wait for all saves in flight. Raises `RuntimeError` if any save failed
+        since the last call.
+        """
+        while self.pids:
+            self._wait(self.pids.pop(0))
+        failed, self.failed = self.failed, 0
+        if failed:
+            raise RuntimeError("%i background save(s) failed" % failed)
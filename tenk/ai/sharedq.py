@@ -0,0 +1,403 @@
+import argparse
+import functools
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+from tenk.ai.arrayq import ArrayQ
+from tenk.ai.base import BaseTenkPlayer
+from tenk.ai.single import ArraySingleAi, SingleAiPlayer
+from tenk.ai.split import ArrayDiceAi, ArrayRollAi, SplitAiPlayer
+from tenk.game import play
+from tenk.scoring import CODE_SPACE, DICES, MAX_DICES, SCORES
+from tenk.stats import TurnStats
+
+# all scores are multiples of this step
+STEP = 50
+# dense index of every dice code
+CODES = list(DICES)
+RANKS = {code: rank for rank, code in enumerate(CODES)}
+
+
+def _check_scores() -> None:
+    if any(points % STEP for points in SCORES.values()):
+        raise ValueError("scores have to be multiples of %i" % STEP)
+
+
+class SingleLayout(object):
+    """
+    Rows of `ArraySingleAi` states: score (up to `cap`) x dice code. States
+    from `CAPPED` on have scores above the cap.
+    """
+
+    def __init__(self, cap: int = 10000):
+        _check_scores()
+        self.CAP = cap
+        self.ROWS = (cap // STEP + 1) * len(CODES)
+        self.CAPPED = (cap + 1) * CODE_SPACE
+
+    def row(self, state: int) -> int:
+        score, code = divmod(state, CODE_SPACE)
+        return min(score, self.CAP) // STEP * len(CODES) + RANKS[code]
+
+    def state(self, row: int) -> int:
+        score, rank = divmod(row, len(CODES))
+        return score * STEP * CODE_SPACE + CODES[rank]
+
+
+class DiceLayout(object):
+    """Rows of `ArrayDiceAi` states: dice codes."""
+
+    ROWS = len(CODES)
+    CAPPED = float("inf")
+
+    def row(self, state: int) -> int:
+        return RANKS[state]
+
+    def state(self, row: int) -> int:
+        return CODES[row]
+
+
+class RollLayout(object):
+    """
+    Rows of `ArrayRollAi` states: score (up to `cap`) x dices left. States
+    from `CAPPED` on have scores above the cap.
+    """
+
+    def __init__(self, cap: int = 10000):
+        _check_scores()
+        self.CAP = cap
+        self.ROWS = (cap // STEP + 1) * (MAX_DICES + 1)
+        self.CAPPED = (cap + 1) * (MAX_DICES + 1)
+
+    def row(self, state: int) -> int:
+        score, left = divmod(state, MAX_DICES + 1)
+        return min(score, self.CAP) // STEP * (MAX_DICES + 1) + left
+
+    def state(self, row: int) -> int:
+        score, left = divmod(row, MAX_DICES + 1)
+        return score * STEP * (MAX_DICES + 1) + left
+
+
+def layout(ai, cap: int = 10000):
+    """Return the row layout for the states of an array ai."""
+    if isinstance(ai, ArraySingleAi):
+        return SingleLayout(cap)
+    if isinstance(ai, ArrayDiceAi):
+        return DiceLayout()
+    if isinstance(ai, ArrayRollAi):
+        return RollLayout(cap)
+    raise ValueError("no shared layout for %s" % ai.__class__.__name__)
+
+
+class SharedArrayQ(ArrayQ):
+    """
+    `ArrayQ` in `multiprocessing.shared_memory` for the array ais, read and
+    updated by many processes without locks (Hogwild: concurrent updates of
+    the same state may get lost, which is accepted).
+
+    States map to fixed rows of a `layout` instead of rows allocated on first
+    use, so all processes agree on them; scores above the cap of the layout
+    share the rows of the cap (`capped` counts the updates of such states in
+    this process). Pickles attach to the same shared memory.
+    """
+
+    def __init__(self, layout, actions: int, name: Optional[str] = None):
+        self.layout = layout
+        self.ACTIONS = actions
+        self.capped = 0
+        rows = layout.ROWS
+        sizes = [rows * actions * 4, rows * actions, rows * 4, rows * 2]
+        offsets = np.cumsum([0] + [-(-size // 8) * 8 for size in sizes])
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=name is None, size=int(offsets[-1])
+        )
+        buffer = self.memory.buf
+        self.values = np.ndarray((rows, actions), np.float32, buffer, offsets[0])
+        self.visited = np.ndarray((rows, actions), bool, buffer, offsets[1])
+        self.bestValues = np.ndarray(rows, np.float32, buffer, offsets[2])
+        self.bestActions = np.ndarray(rows, np.int16, buffer, offsets[3])
+        if name is None:
+            self.values[:] = 0
+            self.visited[:] = False
+            self.bestValues[:] = 0
+            self.bestActions[:] = -1
+
+    def __reduce__(self):
+        return SharedArrayQ, (self.layout, self.ACTIONS, self.memory.name)
+
+    def close(self, unlink: bool = False) -> None:
+        """Detach from the shared memory (and free it with `unlink`)."""
+        del self.values, self.visited, self.bestValues, self.bestActions
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.bestActions >= 0))
+
+    def __contains__(self, state: any) -> bool:
+        return self.bestActions[self.layout.row(state)] >= 0
+
+    def __iter__(self):
+        return (self.layout.state(row) for row in self._rows())
+
+    def _rows(self) -> List[int]:
+        return np.flatnonzero(self.bestActions >= 0).tolist()
+
+    def __getitem__(self, state: any) -> Dict[int, float]:
+        row = self.layout.row(state)
+        if self.bestActions[row] < 0:
+            raise KeyError(state)
+        return self.rewards(row)
+
+    def get(self, state: any, default=None) -> Dict[int, float]:
+        row = self.layout.row(state)
+        return default if self.bestActions[row] < 0 else self.rewards(row)
+
+    def items(self):
+        return ((self.layout.state(row), self.rewards(row)) for row in self._rows())
+
+    def row(self, state: any) -> int:
+        if state >= self.layout.CAPPED:
+            self.capped += 1
+        return self.layout.row(state)
+
+    def best(self, state: any) -> Tuple[int, float]:
+        row = self.layout.row(state)
+        action = int(self.bestActions[row])
+        if action < 0:
+            return None, 0.0
+        return action, float(self.bestValues[row])
+
+    def set(self, row: int, action: int, value: float) -> None:
+        self.values[row, action] = value
+        self.visited[row, action] = True
+        value = float(self.values[row, action])  # as stored
+        best = self.bestActions[row]
+        if best < 0 or value > self.bestValues[row]:
+            self.bestActions[row] = action
+            self.bestValues[row] = value
+        elif best == action:
+            # the best action got worse, search the row again
+            values = np.where(self.visited[row], self.values[row], -np.inf)
+            best = int(values.argmax())
+            self.bestActions[row] = best
+            self.bestValues[row] = values[best]
+
+    def bestValuesOf(self, rows: np.ndarray) -> np.ndarray:
+        return self.bestValues[rows].astype(np.float64)
+
+    def add(self, rows: np.ndarray, actions: np.ndarray, deltas: np.ndarray) -> None:
+        np.add.at(self.values, (rows, actions), deltas)
+        self.visited[rows, actions] = True
+        rows = np.unique(rows)
+        values = np.where(self.visited[rows], self.values[rows], -np.inf)
+        best = values.argmax(axis=1)
+        self.bestActions[rows] = best
+        self.bestValues[rows] = values[np.arange(len(rows)), best]
+
+
+def share(ai, cap: int = 10000) -> SharedArrayQ:
+    """Move the Q table of an array ai into shared memory and return it."""
+    Q = SharedArrayQ(layout(ai, cap), ai.ACTIONS)
+    for state, rewards in ai.Q.items():
+        row = Q.row(state)
+        for action, value in rewards.items():
+            Q.set(row, action, value)
+    ai.Q = Q
+    return Q
+
+
+def _worker(
+    make_player: Callable, tables: List[SharedArrayQ], seed, claimed, limit, chunk, out
+) -> None:
+    player = make_player()
+    player.dice.seed(seed)
+    player.PROGRESS = float("inf")
+    player.SAVE = None
+    for ai, Q in zip(player.ais, tables):
+        ai.Q = Q
+    while True:
+        with claimed.get_lock():
+            games = min(chunk, limit - claimed.value)
+            claimed.value += max(games, 0)
+        if games <= 0:
+            break
+        start = time.time()
+        capped = sum(Q.capped for Q in tables)
+        player.end = False
+        player.EXIT = player.games + games
+        play(player)
+        capped = sum(Q.capped for Q in tables) - capped
+        out.put((games, time.time() - start, player.stats.scores.total, capped))
+        player.stats = TurnStats()
+    out.put(None)
+    for Q in tables:
+        Q.close()
+
+
+def train_hogwild(
+    make_player: Callable[[], BaseTenkPlayer],
+    workers: Optional[int] = None,
+    max_games: int = 10000000,
+    chunk: int = 1000,
+    save: Optional[int] = 1000000,
+    progress: int = 100000,
+    seed: int = 0,
+    cap: int = 10000,
+) -> BaseTenkPlayer:
+    """
+    Train the array ais of a player in `workers` processes sharing one copy of
+    the Q tables (see `SharedArrayQ`) without synchronization.
+
+    Workers claim `chunk` games at a time until `max_games` games are played
+    (counting the games of a loaded player) and report their scores to the
+    coordinator, which prints progress and saves checkpoints from the shared
+    tables about every `save` games (named with the games reported so far).
+    Updates of states above the score `cap` are counted and printed.
+    `make_player` has to be picklable (see `tenk.ai.parallel.train_parallel`).
+    Returns the coordinator player, its Q tables are copied back into
+    private `ArrayQ`s before the shared memory is freed.
+    """
+    workers = workers if workers else os.cpu_count()
+    player = make_player()
+    tables = [share(ai, cap) for ai in player.ais]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    claimed = mp.Value("q", player.games)
+    out = mp.Queue()
+    processes = [
+        mp.Process(
+            target=_worker,
+            args=(make_player, tables, seeds[i], claimed, max_games, chunk, out),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    start_time = time.time()
+    last_progress = last_save = player.games
+    scores = seconds = 0.0
+    capped = total_capped = 0
+    try:
+        running = workers
+        while running:
+            try:
+                message = out.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("hogwild workers died")
+                continue
+            if message is None:
+                running -= 1
+                continue
+            games, elapsed, score, chunk_capped = message
+            player.games += games
+            scores += score
+            seconds += elapsed
+            capped += chunk_capped
+            total_capped += chunk_capped
+            if player.games - last_progress >= progress:
+                elapsed = time.time() - start_time
+                print(
+                    "%9i: %3i - %8.0f games/s - %2i workers (%.0f games/s each) - %s"
+                    " - %i capped"
+                    % (
+                        player.games,
+                        round(scores / (player.games - last_progress)),
+                        (player.games - last_progress) / elapsed,
+                        workers,
+                        (player.games - last_progress) / seconds,
+                        "/".join([str(len(ai.Q)) for ai in player.ais]),
+                        capped,
+                    )
+                )
+                last_progress = player.games
+                scores = seconds = 0.0
+                capped = 0
+                start_time = time.time()
+            if save and player.games // save > last_save // save:
+                player.saveAis()
+                last_save = player.games
+    finally:
+        for process in processes:
+            process.join()
+        for ai, Q in zip(player.ais, tables):
+            ai.Q = ArrayQ(ai.ACTIONS, capacity=max(len(Q), 1))
+            for state, rewards in Q.items():
+                ai.setRewards(state, rewards)
+            Q.close(unlink=True)
+    if total_capped:
+        print("%i updates of states above the score cap of %i" % (total_capped, cap))
+    return player
+
+
+def scaling(
+    make_player: Callable[[], BaseTenkPlayer],
+    workers: List[int] = (1, 2, 4, 8, 16, 32),
+    games: int = 200000,
+    chunk: int = 1000,
+    cap: int = 10000,
+) -> Dict[int, float]:
+    """
+    Measure Hogwild training throughput for different numbers of worker
+    processes (up to the number of cores). Prints and returns games/sec per
+    worker count.
+    """
+    rates = {}
+    for count in workers:
+        if count > os.cpu_count():
+            print("%2i workers: skipped, %i cores" % (count, os.cpu_count()))
+            break
+        start = time.time()
+        train_hogwild(
+            make_player,
+            workers=count,
+            max_games=games,
+            chunk=chunk,
+            save=None,
+            progress=float("inf"),
+            cap=cap,
+        )
+        rates[count] = games / (time.time() - start)
+        print(
+            "%2i workers: %8.0f games/s (x%.2f)"
+            % (count, rates[count], rates[count] / rates[workers[0]])
+        )
+    return rates
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Hogwild training throughput per number of worker processes"
+    )
+    parser.add_argument("--kind", choices=("single", "split"), default="single")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--games", type=int, default=200000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    parser.add_argument("--cap", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    if args.kind == "single":
+        make_player = functools.partial(
+            SingleAiPlayer, ArraySingleAi(0.05, 0.6, 0.1), save=None
+        )
+    else:
+        make_player = functools.partial(
+            SplitAiPlayer,
+            ArrayDiceAi(0.05, 0.6, 0.1),
+            ArrayRollAi(0.05, 0.6, 0.1),
+            save=None,
+        )
+    scaling(make_player, args.workers, args.games, chunk=args.chunk, cap=args.cap)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
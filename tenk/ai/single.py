@@ -1,6 +1,16 @@
-import random as r
+import numpy as np
+from functools import partial
 from typing import Optional
+from tenk.ai import parallel
+from tenk.ai.arrayq import ArrayQAi, keep_indexes, keep_mask
 from tenk.ai.base import BaseTenkAi, BaseTenkPlayer
+from tenk.ai.convergence import EarlyStopping
+from tenk.batch import BatchPlayer, map_unique, play_batch, random_keeps
+from tenk.evaluate import evaluate
+from tenk.game import play
+from tenk.instrument import Instrument
+from tenk.rng import DiceStream
+from tenk.scoring import CODE_SPACE, DICES, KEEPS, LEGAL_KEEPS, MAX_DICES, encode
 
 
 class SingleAi(BaseTenkAi):
@@ -8,8 +18,14 @@ class SingleAi(BaseTenkAi):
     Ai that uses one single dictionary to learn the game.
     """
 
-    def __init__(self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None):
-        super().__init__(alpha, gamma, randomness, rewardFkn=rewardFkn)
+    NAME = "SingleAi"
+
+    def __init__(
+        self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None, abstraction=None
+    ):
+        super().__init__(
+            alpha, gamma, randomness, rewardFkn=rewardFkn, abstraction=abstraction
+        )
 
     def init(self) -> None:
         super().init()
@@ -17,7 +33,7 @@ class SingleAi(BaseTenkAi):
         self.finish = "N"
 
     def encodeState(self) -> any:
-        return "".join([str(dice) for dice in self.dices]) + "_" + str(self.score)
+        return self.abstractDices(self.dices) + "_" + self.abstractScore(self.score)
 
     def encodeAction(self) -> any:
         return str(self.finish) + "".join([str(k) for k in self.keep])
@@ -30,26 +46,55 @@ class SingleAi(BaseTenkAi):
 
     def act(self):
         # pick next dices & finish
-        currentRewards = self.Q.setdefault(self.state, {})
+        action, reward = self.bestAction(self.state)
         if (
-            (not currentRewards)
-            or (r.random() < self.RANDOMNESS)
-            or (max(currentRewards.values()) <= 0)  # just speeds up learning
+            (action is None)
+            or (self.rng.random() < self.RANDOMNESS)
+            or (reward <= 0)  # just speeds up learning
         ):
-            keep = []
-            while not keep:  # keep at least one
-                keep = [i for i in range(len(self.dices)) if (r.random() > 0.2)]
-            self.finish = r.getrandbits(1)
-            self.keep = keep
+            # keep a random valid set of dices (in canonical form)
+            self.keep = list(self.rng.choice(LEGAL_KEEPS[encode(self.dices)]))
+            self.finish = self.rng.bit()
             action = self.encodeAction()
         else:
-            action = max(currentRewards, key=currentRewards.get)
             finish, keep = self.decodeAction(action)
             self.finish = finish
             self.keep = keep
         return action
 
 
+class ArraySingleAi(SingleAi, ArrayQAi):
+    """
+    `SingleAi` with integer encoded states and actions stored in an `ArrayQ`.
+    """
+
+    ACTIONS = 2 << MAX_DICES
+
+    def encodeState(self) -> any:
+        return self.score * CODE_SPACE + encode(self.dices)
+
+    def encodeAction(self) -> any:
+        return int(self.finish) << MAX_DICES | keep_mask(self.keep)
+
+    def decodeAction(self, action):
+        return action >> MAX_DICES, keep_indexes(action & ((1 << MAX_DICES) - 1))
+
+    def stateName(self, state):
+        score, code = divmod(state, CODE_SPACE)
+        return "".join([str(dice) for dice in DICES[code]]) + "_" + str(score)
+
+    def stateFromName(self, name):
+        dices, score = name.split("_")
+        return int(score) * CODE_SPACE + encode([int(dice) for dice in dices])
+
+    def actionName(self, action):
+        finish, keep = self.decodeAction(action)
+        return str(finish) + "".join([str(k) for k in keep])
+
+    def actionFromName(self, name):
+        return int(name[0]) << MAX_DICES | keep_mask([int(s) for s in name[1:]])
+
+
 class SingleAiPlayer(BaseTenkPlayer):
     """
     TenK player using the `SingleAi`.
@@ -63,9 +108,30 @@ class SingleAiPlayer(BaseTenkPlayer):
         save: Optional[int] = None,
         exit: Optional[int] = None,
         progress: int = 100000,
+        fileformat: str = "pickle",
+        delta: Optional[int] = None,
+        instrument: Optional[Instrument] = None,
+        dice: Optional[DiceStream] = None,
+        metrics: Optional[str] = None,
+        convergence: bool = False,
+        stopping: Optional[EarlyStopping] = None,
+        background: int = 0,
     ):
         super().__init__(
-            [ai], tag=tag, load=load, save=save, exit=exit, progress=progress
+            [ai],
+            tag=tag,
+            load=load,
+            save=save,
+            exit=exit,
+            progress=progress,
+            fileformat=fileformat,
+            delta=delta,
+            instrument=instrument,
+            dice=dice,
+            metrics=metrics,
+            convergence=convergence,
+            stopping=stopping,
+            background=background,
         )
         self.ai = ai
         self.GAMMA = ai.GAMMA
@@ -84,37 +150,119 @@ class SingleAiPlayer(BaseTenkPlayer):
         self.ai.init()
         super().write(score)
 
+    def batchPlayer(self):
+        return SingleAiBatchPlayer(self.ai)
+
+
+class SingleAiBatchPlayer(BatchPlayer):
+    """
+    Greedy batch player using the Q table of a `SingleAi` without learning.
+    States without positive rewards are played randomly like `SingleAi.act`.
+    """
+
+    def __init__(self, ai: SingleAi, rng: Optional[np.random.Generator] = None):
+        self.ai = ai
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.actions = {}
+        self.finishes = None
+
+    def state(self, key: int) -> any:
+        """Return the ai state of a state key (turn score and dice code)."""
+        self.ai.score, code = divmod(key, CODE_SPACE)
+        self.ai.dices = DICES[code]
+        return self.ai.encodeState()
+
+    def action(self, key: int):
+        """Return the greedy keep code and finish for a state key (keep 0: random)."""
+        action, reward = self.ai.greedyAction(self.state(key))
+        if action is None or reward <= 0:
+            return 0, 0
+        finish, keep = self.ai.decodeAction(action)
+        return encode([self.ai.dices[i] for i in keep]), finish
+
+    def choose(self, codes, scores):
+        keys = scores.astype(np.int64) * CODE_SPACE + codes
+        actions = map_unique(keys, self.actions, self.action)
+        keep = actions[:, 0].astype(np.int32)
+        finish = actions[:, 1].astype(bool)
+        explore = (keep == 0) | (self.rng.random(len(codes)) < self.ai.RANDOMNESS)
+        keep[explore] = random_keeps(codes[explore], self.rng)
+        finish[explore] = self.rng.random(int(explore.sum())) < 0.5
+        self.finishes = finish
+        return keep
+
+    def finish(self, codes, scores):
+        return self.finishes
+
+    def moves(self, code, score):
+        key = score * CODE_SPACE + code
+        if key not in self.actions:
+            self.actions[key] = self.action(key)
+        keep, finish = self.actions[key]
+        if keep:
+            return [(1.0, keep, float(finish))], []
+        keeps = KEEPS[code]
+        return [(1 / len(keeps), keep, 0.5) for keep in keeps], [self.state(key)]
+
 
 def debug(tag, game):
-    return SingleAiPlayer(SingleAi(), tag=tag, load=game)
+    player = SingleAiPlayer(SingleAi(), tag=tag, load=game)
+    player.setReadOnly()
+    return player
 
 
 def check(tag, max_game=10000000, step=1000000, sample_size=100000):
     print(tag)
     for game in range(step, max_game + 1, step):
         print("%8i: " % game, end="")
-        play(
-            SingleAiPlayer(
-                SingleAi(),
-                tag=tag,
-                load=game,
-                exit=game + sample_size,
-                progress=sample_size,
-            )
+        player = SingleAiPlayer(
+            SingleAi(),
+            tag=tag,
+            load=game,
+            exit=game + sample_size,
+            progress=sample_size,
         )
+        player.setReadOnly()
+        play(player)
 
 
-def train(
+def check_batch(tag, max_game=10000000, step=1000000, sample_size=100000, seed=None):
+    """Like `check` but plays the greedy policies with the batch engine."""
+    print(tag)
+    rng = np.random.default_rng(seed)
+    for game in range(step, max_game + 1, step):
+        scores = play_batch(
+            SingleAiBatchPlayer(debug(tag, game).ai, rng=rng), sample_size, seed=rng
+        )
+        print("%8i: %3i" % (game, round(scores.mean())))
+
+
+def check_exact(tag, max_game=10000000, step=1000000, min_reach=1e-9):
+    """Like `check` but evaluates the greedy policies exactly (`tenk.evaluate`)."""
+    print(tag)
+    for game in range(step, max_game + 1, step):
+        player = SingleAiBatchPlayer(debug(tag, game).ai)
+        print("%8i: %s" % (game, evaluate(player, min_reach=min_reach)))
+
+
+def make_player(alpha, gamma, exp, tag, load=None):
+    return SingleAiPlayer(SingleAi(alpha, gamma, exp), tag=tag, load=load)
+
+
+def train_parallel(
     name,
     alpha=0.05,
     gamma=0.6,
     exp=0.1,
+    workers=None,
+    sync=10000,
     max_games=10000000,
     step=1000000,
     progress=100000,
     tag=None,
     load=None,
 ):
+    """Like `train` but plays in `workers` processes (see `parallel.train_parallel`)."""
     if not tag:
         tag = "%s_%s_%s_%s" % (
             name,
@@ -122,38 +270,90 @@ def train(
             str(gamma).replace(".", ""),
             str(exp).replace(".", ""),
         )
-    play(
-        SingleAiPlayer(
-            SingleAi(alpha, gamma, exp),
-            tag=tag,
-            save=step,
-            exit=max_games,
-            progress=progress,
-            load=load,
-        )
+    parallel.train_parallel(
+        partial(make_player, alpha, gamma, exp, tag, load),
+        workers=workers,
+        sync=sync,
+        max_games=max_games,
+        save=step,
+        progress=progress,
     )
     return tag
 
 
-def watch(
-    tag=None, delay=1, alpha=0.1, gamma=0.6, exp=0.1, load=10000000, games=1000
+def train(
+    name,
+    alpha=0.05,
+    gamma=0.6,
+    exp=0.1,
+    max_games=10000000,
+    step=1000000,
+    progress=100000,
+    tag=None,
+    load=None,
+    fileformat="pickle",
+    delta=None,
+    seed=None,
+    metrics=None,
+    max_states=None,
+    eviction="lfu",
+    stopping=None,
+    background=0,
+    lam=0.0,
 ):
-    play(
-        SingleAiPlayer(
-            SingleAi(alpha, gamma, exp),
-            tag=tag,
-            load=load,
-            exit=load + games,
-        ),
-        doshow=True,
-        delay=delay,
+    """
+    Train for `max_games` games with a checkpoint every `step` games, with
+    `lam` by Watkins Q(λ) (see `BaseTenkAi.setTraces`). Q tables bounded to
+    `max_states` can not be saved as `delta` checkpoints.
+    """
+    if max_states and delta:
+        raise ValueError("bounded Q tables can not be saved as delta checkpoints")
+    if not tag:
+        tag = "%s_%s_%s_%s" % (
+            name,
+            str(alpha).replace(".", ""),
+            str(gamma).replace(".", ""),
+            str(exp).replace(".", ""),
+        )
+        if lam:
+            tag += "_l" + str(lam).replace(".", "")
+    player = SingleAiPlayer(
+        SingleAi(alpha, gamma, exp),
+        tag=tag,
+        save=step,
+        exit=max_games,
+        progress=progress,
+        load=load,
+        fileformat=fileformat,
+        delta=delta,
+        dice=DiceStream(seed) if seed is not None else None,
+        metrics=metrics,
+        stopping=stopping,
+        background=background,
     )
+    if max_states:
+        for ai in player.ais:
+            ai.boundQ(max_states, eviction)
+    if lam:
+        for ai in player.ais:
+            ai.setTraces(lam)
+    play(player)
+    return tag
 
 
-if __name__ == "__main__":
-    from tenk.game import play
+def watch(tag=None, delay=1, alpha=0.1, gamma=0.6, exp=0.1, load=10000000, games=1000):
+    player = SingleAiPlayer(
+        SingleAi(alpha, gamma, exp),
+        tag=tag,
+        load=load,
+        exit=load + games,
+    )
+    player.setReadOnly()
+    play(player, doshow=True, delay=delay)
 
-    # r.seed(0)
+
+if __name__ == "__main__":
+    # tenk.rng.seed(0)
     tag = train(name="v1")
     check(tag)
 
@@ -1,6 +1,24 @@
-import random as r
+import numpy as np
+from functools import partial
 from typing import Optional
+from tenk.ai import parallel
+from tenk.ai.arrayq import ArrayQAi, keep_indexes, keep_mask
 from tenk.ai.base import BaseTenkAi, BaseTenkPlayer
+from tenk.ai.convergence import EarlyStopping
+from tenk.batch import BatchPlayer, map_unique, play_batch, random_keeps
+from tenk.evaluate import evaluate
+from tenk.game import play
+from tenk.instrument import Instrument
+from tenk.rng import DiceStream
+from tenk.scoring import (
+    CODE_SPACE,
+    DICES,
+    KEEPS,
+    LEGAL_KEEPS,
+    MAX_DICES,
+    SCORES,
+    encode,
+)
 
 
 class DiceAi(BaseTenkAi):
@@ -8,8 +26,14 @@ class DiceAi(BaseTenkAi):
     Ai learning which dices to pick.
     """
 
-    def __init__(self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None):
-        super().__init__(alpha, gamma, randomness, rewardFkn=rewardFkn)
+    NAME = "DiceAi"
+
+    def __init__(
+        self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None, abstraction=None
+    ):
+        super().__init__(
+            alpha, gamma, randomness, rewardFkn=rewardFkn, abstraction=abstraction
+        )
 
     def init(self):
         super().init()
@@ -23,7 +47,7 @@ class DiceAi(BaseTenkAi):
         return [int(s) for s in action]
 
     def encodeState(self):
-        return "".join([str(dice) for dice in self.dices])
+        return self.abstractDices(self.dices)
 
     def calculateReward(self):
         assert (
@@ -34,20 +58,13 @@ class DiceAi(BaseTenkAi):
     def act(self):
         """Return array of indexes with dices to keep"""
         self.lastKeep = self.keep
-        currentRewards = self.Q.setdefault(self.state, {})
+        action, reward = self.bestAction(self.state)
         # choose random dices if _randomness_ is true or there are no other valid paths
-        if (
-            (not currentRewards)
-            or (r.random() < self.RANDOMNESS)
-            or (max(currentRewards.values()) <= 0)
-        ):
-            keep = []
-            while not keep:  # we need to select at least one dice
-                keep = [i for i in range(len(self.dices)) if (r.random() > 0.2)]
-            self.keep = keep
+        if (action is None) or (self.rng.random() < self.RANDOMNESS) or (reward <= 0):
+            # keep a random valid set of dices (in canonical form)
+            self.keep = list(self.rng.choice(LEGAL_KEEPS[encode(self.dices)]))
             action = self.encodeAction()
         else:
-            action = max(currentRewards, key=currentRewards.get)
             self.keep = self.decodeAction(action)
         return action
 
@@ -57,13 +74,19 @@ class RollAi(BaseTenkAi):
     Ai learning how often to re-roll the dices.
     """
 
-    def __init__(self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None):
-        super().__init__(alpha, gamma, randomness, rewardFkn=rewardFkn)
+    NAME = "RollAi"
+
+    def __init__(
+        self, alpha=0.0, gamma=0.0, randomness=0.0, rewardFkn=None, abstraction=None
+    ):
+        super().__init__(
+            alpha, gamma, randomness, rewardFkn=rewardFkn, abstraction=abstraction
+        )
 
     def encodeState(self):
         d = len(self.dices) if self.dices else 0
         a = len(self.args) if self.args else 0
-        return str(d - a) + str(self.score)
+        return str(d - a) + self.abstractScore(self.score)
 
     def decodeAction(self, action):
         return action
@@ -76,20 +99,73 @@ class RollAi(BaseTenkAi):
 
     def act(self):
         # choose random dices if _randomness_ is true or there are no other valid paths
-        action = self.selectAction(self.state)
-        currentRewards = self.Q.setdefault(self.state, {})
-        if (
-            (not currentRewards)
-            or (r.random() < self.RANDOMNESS)
-            or (max(currentRewards.values()) <= 0)
-        ):
-            self.finish = r.getrandbits(1)  # todo: try other rand value
+        action, reward = self.bestAction(self.state)
+        if (action is None) or (self.rng.random() < self.RANDOMNESS) or (reward <= 0):
+            self.finish = self.rng.bit()  # todo: try other rand value
         else:
             self.finish = self.decodeAction(action)
 
         return self.finish
 
 
+class ArrayDiceAi(DiceAi, ArrayQAi):
+    """
+    `DiceAi` with integer encoded states and actions stored in an `ArrayQ`.
+    """
+
+    ACTIONS = 1 << MAX_DICES
+
+    def encodeAction(self):
+        return keep_mask(self.keep)
+
+    def decodeAction(self, action):
+        return keep_indexes(action)
+
+    def encodeState(self):
+        return encode(self.dices)
+
+    def stateName(self, state):
+        return "".join([str(dice) for dice in DICES[state]])
+
+    def stateFromName(self, name):
+        return encode([int(dice) for dice in name])
+
+    def actionName(self, action):
+        return "".join([str(k) for k in keep_indexes(action)])
+
+    def actionFromName(self, name):
+        return keep_mask([int(s) for s in name])
+
+
+class ArrayRollAi(RollAi, ArrayQAi):
+    """
+    `RollAi` with integer encoded states and actions stored in an `ArrayQ`.
+    """
+
+    ACTIONS = 2
+
+    def encodeState(self):
+        d = len(self.dices) if self.dices else 0
+        a = len(self.args) if self.args else 0
+        return self.score * (MAX_DICES + 1) + d - a
+
+    def encodeAction(self):
+        return int(self.finish)
+
+    def stateName(self, state):
+        score, dices = divmod(state, MAX_DICES + 1)
+        return str(dices) + str(score)
+
+    def stateFromName(self, name):
+        return int(name[1:]) * (MAX_DICES + 1) + int(name[0])
+
+    def actionName(self, action):
+        return action
+
+    def actionFromName(self, name):
+        return int(name)
+
+
 class SplitAiPlayer(BaseTenkPlayer):
     """
     TenK player using the `DiceAi`and the `RollAi`.
@@ -104,6 +180,14 @@ class SplitAiPlayer(BaseTenkPlayer):
         save: Optional[int] = None,
         exit: Optional[int] = None,
         progress: int = 100000,
+        fileformat: str = "pickle",
+        delta: Optional[int] = None,
+        instrument: Optional[Instrument] = None,
+        dice: Optional[DiceStream] = None,
+        metrics: Optional[str] = None,
+        convergence: bool = False,
+        stopping: Optional[EarlyStopping] = None,
+        background: int = 0,
     ):
         self.diceai = diceai
         self.rollai = rollai
@@ -114,6 +198,14 @@ class SplitAiPlayer(BaseTenkPlayer):
             save=save,
             exit=exit,
             progress=progress,
+            fileformat=fileformat,
+            delta=delta,
+            instrument=instrument,
+            dice=dice,
+            metrics=metrics,
+            convergence=convergence,
+            stopping=stopping,
+            background=background,
         )
 
     def choose(self, dices):
@@ -136,38 +228,161 @@ class SplitAiPlayer(BaseTenkPlayer):
         self.diceai.init()
         self.rollai.init()
 
+    def batchPlayer(self):
+        return SplitAiBatchPlayer(self.diceai, self.rollai)
+
+
+class SplitAiBatchPlayer(BatchPlayer):
+    """
+    Greedy batch player using the Q tables of a `DiceAi` and a `RollAi` without
+    learning. States without positive rewards are played randomly.
+    """
+
+    def __init__(
+        self,
+        diceai: DiceAi,
+        rollai: RollAi,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        self.diceai = diceai
+        self.rollai = rollai
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.keeps = {}
+        self.finishes = {}
+
+    def diceState(self, code: int) -> any:
+        """Return the `DiceAi` state of a dice code."""
+        self.diceai.dices = DICES[code]
+        return self.diceai.encodeState()
+
+    def rollState(self, key: int) -> any:
+        """Return the `RollAi` state of a state key (turn score and dices left)."""
+        self.rollai.score, code = divmod(key, CODE_SPACE)
+        self.rollai.dices = DICES[code]
+        self.rollai.args = None
+        return self.rollai.encodeState()
+
+    def keep(self, code: int) -> int:
+        """Return the greedy keep code for a dice code (0: random)."""
+        action, reward = self.diceai.greedyAction(self.diceState(code))
+        if action is None or reward <= 0:
+            return 0
+        keep = self.diceai.decodeAction(action)
+        return encode([self.diceai.dices[i] for i in keep])
+
+    def roll(self, key: int) -> int:
+        """Return the greedy finish for a state key (-1: random)."""
+        action, reward = self.rollai.greedyAction(self.rollState(key))
+        if action is None or reward <= 0:
+            return -1
+        return int(self.rollai.decodeAction(action))
+
+    def choose(self, codes, scores):
+        keep = map_unique(codes, self.keeps, self.keep).astype(np.int32)
+        explore = (keep == 0) | (self.rng.random(len(codes)) < self.diceai.RANDOMNESS)
+        keep[explore] = random_keeps(codes[explore], self.rng)
+        return keep
+
+    def finish(self, codes, scores):
+        keys = scores.astype(np.int64) * CODE_SPACE + codes
+        finish = map_unique(keys, self.finishes, self.roll)
+        explore = (finish < 0) | (self.rng.random(len(codes)) < self.rollai.RANDOMNESS)
+        finish[explore] = self.rng.random(int(explore.sum())) < 0.5
+        return finish.astype(bool)
+
+    def moves(self, code, score):
+        if code not in self.keeps:
+            self.keeps[code] = self.keep(code)
+        unseen = []
+        keeps = [(1.0, self.keeps[code])]
+        if not self.keeps[code]:
+            keeps = [(1 / len(KEEPS[code]), keep) for keep in KEEPS[code]]
+            unseen.append(self.diceState(code))
+        moves = []
+        for weight, keep in keeps:
+            finish = 0
+            if keep in KEEPS[code]:
+                key = (score + SCORES[keep]) * CODE_SPACE + code - keep
+                if key not in self.finishes:
+                    self.finishes[key] = self.roll(key)
+                finish = self.finishes[key]
+                if finish < 0:
+                    finish = 0.5
+                    unseen.append(self.rollState(key))
+            moves.append((weight, keep, float(finish)))
+        return moves, unseen
+
 
 def debug(tag, game):
-    return SplitAiPlayer(diceai=DiceAi(), rollai=RollAi(), tag=tag, load=game)
+    player = SplitAiPlayer(diceai=DiceAi(), rollai=RollAi(), tag=tag, load=game)
+    player.setReadOnly()
+    return player
 
 
 def check(tag, max_game=10000000, step=1000000, sample_size=100000):
     print(tag)
     for game in range(step, max_game + 1, step):
         print("%8i: " % game, end="")
-        play(
-            SplitAiPlayer(
-                diceai=DiceAi(),
-                rollai=RollAi(),
-                tag=tag,
-                load=game,
-                exit=game + sample_size,
-                progress=sample_size,
-            )
+        player = SplitAiPlayer(
+            diceai=DiceAi(),
+            rollai=RollAi(),
+            tag=tag,
+            load=game,
+            exit=game + sample_size,
+            progress=sample_size,
         )
+        player.setReadOnly()
+        play(player)
 
 
-def train(
+def check_batch(tag, max_game=10000000, step=1000000, sample_size=100000, seed=None):
+    """Like `check` but plays the greedy policies with the batch engine."""
+    print(tag)
+    rng = np.random.default_rng(seed)
+    for game in range(step, max_game + 1, step):
+        player = debug(tag, game)
+        scores = play_batch(
+            SplitAiBatchPlayer(player.diceai, player.rollai, rng=rng),
+            sample_size,
+            seed=rng,
+        )
+        print("%8i: %3i" % (game, round(scores.mean())))
+
+
+def check_exact(tag, max_game=10000000, step=1000000, min_reach=1e-9):
+    """Like `check` but evaluates the greedy policies exactly (`tenk.evaluate`)."""
+    print(tag)
+    for game in range(step, max_game + 1, step):
+        player = debug(tag, game)
+        evaluation = evaluate(
+            SplitAiBatchPlayer(player.diceai, player.rollai), min_reach=min_reach
+        )
+        print("%8i: %s" % (game, evaluation))
+
+
+def make_player(alpha, gamma, exp, tag, load=None):
+    return SplitAiPlayer(
+        diceai=DiceAi(alpha, gamma, exp),
+        rollai=RollAi(alpha, gamma, exp),
+        tag=tag,
+        load=load,
+    )
+
+
+def train_parallel(
     name,
     alpha=0.05,
     gamma=0.6,
     exp=0.1,
+    workers=None,
+    sync=10000,
     max_games=10000000,
     step=1000000,
     progress=100000,
     tag=None,
     load=None,
 ):
+    """Like `train` but plays in `workers` processes (see `parallel.train_parallel`)."""
     if not tag:
         tag = "%s_%s_%s_%s" % (
             name,
@@ -175,38 +390,92 @@ def train(
             str(gamma).replace(".", ""),
             str(exp).replace(".", ""),
         )
-    play(
-        SplitAiPlayer(
-            diceai=DiceAi(alpha, gamma, exp),
-            rollai=RollAi(alpha, gamma, exp),
-            tag=tag,
-            save=step,
-            exit=max_games,
-            progress=progress,
-            load=load,
+    parallel.train_parallel(
+        partial(make_player, alpha, gamma, exp, tag, load),
+        workers=workers,
+        sync=sync,
+        max_games=max_games,
+        save=step,
+        progress=progress,
+    )
+    return tag
+
+
+def train(
+    name,
+    alpha=0.05,
+    gamma=0.6,
+    exp=0.1,
+    max_games=10000000,
+    step=1000000,
+    progress=100000,
+    tag=None,
+    load=None,
+    fileformat="pickle",
+    delta=None,
+    seed=None,
+    metrics=None,
+    max_states=None,
+    eviction="lfu",
+    stopping=None,
+    background=0,
+    lam=0.0,
+):
+    """
+    Train for `max_games` games with a checkpoint every `step` games, with
+    `lam` by Watkins Q(λ) (see `BaseTenkAi.setTraces`). Q tables bounded to
+    `max_states` can not be saved as `delta` checkpoints.
+    """
+    if max_states and delta:
+        raise ValueError("bounded Q tables can not be saved as delta checkpoints")
+    if not tag:
+        tag = "%s_%s_%s_%s" % (
+            name,
+            str(alpha).replace(".", ""),
+            str(gamma).replace(".", ""),
+            str(exp).replace(".", ""),
         )
+        if lam:
+            tag += "_l" + str(lam).replace(".", "")
+    player = SplitAiPlayer(
+        diceai=DiceAi(alpha, gamma, exp),
+        rollai=RollAi(alpha, gamma, exp),
+        tag=tag,
+        save=step,
+        exit=max_games,
+        progress=progress,
+        load=load,
+        fileformat=fileformat,
+        delta=delta,
+        dice=DiceStream(seed) if seed is not None else None,
+        metrics=metrics,
+        stopping=stopping,
+        background=background,
     )
+    if max_states:
+        for ai in player.ais:
+            ai.boundQ(max_states, eviction)
+    if lam:
+        for ai in player.ais:
+            ai.setTraces(lam)
+    play(player)
     return tag
 
 
 def watch(tag=None, delay=1, alpha=0.1, gamma=0.6, exp=0.1, load=10000000, games=1000):
-    play(
-        SplitAiPlayer(
-            diceai=DiceAi(alpha, gamma, exp),
-            rollai=RollAi(alpha, gamma, exp),
-            tag=tag,
-            load=load,
-            exit=load + games,
-        ),
-        doshow=True,
-        delay=delay,
+    player = SplitAiPlayer(
+        diceai=DiceAi(alpha, gamma, exp),
+        rollai=RollAi(alpha, gamma, exp),
+        tag=tag,
+        load=load,
+        exit=load + games,
     )
+    player.setReadOnly()
+    play(player, doshow=True, delay=delay)
 
 
 if __name__ == "__main__":
-    from tenk.game import play
-
-    # r.seed(0)
+    # tenk.rng.seed(0)
     tag = train(name="v1")
     check(tag)
 
@@ -0,0 +1,187 @@
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import sys
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.ai.split import DiceAi, RollAi, SplitAiPlayer
+from tenk.game import play
+
+SINGLE = "single"
+SPLIT = "split"
+PARAMETERS = ("alpha", "gamma", "exp")
+
+
+def grid(**space: Sequence[float]) -> List[Dict[str, float]]:
+    """Return all combinations of the values of every parameter."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(
+    samples: int, seed: Optional[int] = None, **space: any
+) -> List[Dict[str, float]]:
+    """
+    Return `samples` random configurations. Parameters given as `(low, high)`
+    tuple are drawn uniformly, lists are sampled from.
+    """
+    generator = np.random.default_rng(seed)
+    configs = []
+    for _ in range(samples):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                config[name] = round(float(generator.uniform(*values)), 4)
+            else:
+                config[name] = values[int(generator.integers(len(values)))]
+        configs.append(config)
+    return configs
+
+
+def config_tag(name: str, config: Dict[str, float]) -> str:
+    """Return the tag of a configuration like `train` does."""
+    return "_".join(
+        [name] + [str(config[parameter]).replace(".", "") for parameter in PARAMETERS]
+    )
+
+
+def _player(kind: str, config: Dict[str, float], tag: str, load: int, games: int):
+    ais = [config[parameter] for parameter in PARAMETERS]
+    if kind == SINGLE:
+        return SingleAiPlayer(
+            SingleAi(*ais), tag=tag, load=load, save=games, exit=games, progress=games
+        )
+    return SplitAiPlayer(
+        diceai=DiceAi(*ais),
+        rollai=RollAi(*ais),
+        tag=tag,
+        load=load,
+        save=games,
+        exit=games,
+        progress=games,
+    )
+
+
+def _run(args: tuple) -> float:
+    """Train a configuration from `load` to `games` games and evaluate it."""
+    kind, config, tag, load, games, seed, min_reach = args
+    player = _player(kind, config, tag, load, games)
+    if not load:
+        player.dice.seed(seed)
+    play(player)
+    return player.evaluate(min_reach=min_reach).value
+
+
+def budgets(min_games: int, max_games: int, eta: int) -> List[int]:
+    """Return the games per rung: `min_games` times powers of `eta` to `max_games`."""
+    rungs = [min_games]
+    while rungs[-1] * eta < max_games:
+        rungs.append(rungs[-1] * eta)
+    if rungs[-1] < max_games:
+        rungs.append(max_games)
+    return rungs
+
+
+def sweep(
+    configs: List[Dict[str, float]],
+    kind: str = SINGLE,
+    name: str = "sweep",
+    min_games: int = 100000,
+    max_games: int = 10000000,
+    eta: int = 3,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    min_reach: float = 1e-6,
+    leaderboard: Optional[str] = "leaderboard.json",
+) -> List[Dict[str, any]]:
+    """
+    Successive halving over hyperparameter configurations (`alpha`, `gamma`,
+    `exp`) of the `single` or `split` ais.
+
+    All configurations are trained for `min_games` games in a pool of
+    `workers` processes and their greedy policies are evaluated exactly (see
+    `tenk.evaluate`). The best `1 / eta` go on to `eta` times the games,
+    resumed from their checkpoints, up to `max_games`. Returns the
+    leaderboard (best budget first, then by score), written as JSON to
+    `leaderboard` after every rung.
+    """
+    if kind not in (SINGLE, SPLIT):
+        raise ValueError("unknown kind: %s" % kind)
+    seeds = np.random.SeedSequence(seed).spawn(len(configs))
+    entries = [
+        {"tag": config_tag(name, config), "config": config, "games": 0}
+        for config in configs
+    ]
+    alive = list(range(len(entries)))
+    with mp.Pool(workers) as pool:
+        for rung, games in enumerate(budgets(min_games, max_games, eta)):
+            jobs = [
+                (kind, entries[i]["config"], entries[i]["tag"], entries[i]["games"])
+                + (games, seeds[i], min_reach)
+                for i in alive
+            ]
+            for i, score in zip(alive, pool.map(_run, jobs)):
+                entries[i].update(games=games, score=score, rung=rung)
+            alive.sort(key=lambda i: -entries[i]["score"])
+            for i in alive:
+                print("%8i: %7.2f %s" % (games, entries[i]["score"], entries[i]["tag"]))
+            board = sorted(entries, key=lambda e: (-e["games"], -e["score"]))
+            if leaderboard:
+                with open(leaderboard, "w") as file:
+                    json.dump(board, file, indent=2)
+            alive = alive[: max(len(alive) // eta, 1)]
+    return board
+
+
+def _values(text: str) -> any:
+    """Parse `low:high` as range or `a,b,c` as list of values."""
+    if ":" in text:
+        return tuple(float(value) for value in text.split(":"))
+    return [float(value) for value in text.split(",")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep")
+    parser.add_argument("--kind", choices=(SINGLE, SPLIT), default=SINGLE)
+    parser.add_argument("--name", default="sweep")
+    parser.add_argument("--alpha", type=_values, default=[0.01, 0.05, 0.1])
+    parser.add_argument("--gamma", type=_values, default=[0.4, 0.6, 0.8])
+    parser.add_argument("--exp", type=_values, default=[0.05, 0.1, 0.2])
+    parser.add_argument(
+        "--samples", type=int, help="random search samples (default: grid)"
+    )
+    parser.add_argument("--min-games", type=int, default=100000)
+    parser.add_argument("--max-games", type=int, default=10000000)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--leaderboard", default="leaderboard.json")
+    args = parser.parse_args(argv)
+
+    space = {"alpha": args.alpha, "gamma": args.gamma, "exp": args.exp}
+    if args.samples:
+        configs = random_search(args.samples, seed=args.seed, **space)
+    else:
+        if any(isinstance(values, tuple) for values in space.values()):
+            parser.error("ranges need --samples")
+        configs = grid(**space)
+    os.makedirs("./Q", exist_ok=True)
+    sweep(
+        configs,
+        kind=args.kind,
+        name=args.name,
+        min_games=args.min_games,
+        max_games=args.max_games,
+        eta=args.eta,
+        workers=args.workers,
+        seed=args.seed,
+        leaderboard=args.leaderboard,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
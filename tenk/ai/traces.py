@@ -0,0 +1,148 @@
+import argparse
+import sys
+import time
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from tenk.ai.base import BaseTenkPlayer
+from tenk.ai.convergence import EarlyStopping
+from tenk.ai.single import ArraySingleAi, SingleAi, SingleAiPlayer
+from tenk.ai.split import ArrayDiceAi, ArrayRollAi, DiceAi, RollAi, SplitAiPlayer
+from tenk.ai.sweep import SINGLE, SPLIT
+from tenk.game import play
+from tenk.rng import DiceStream
+
+
+def make_player(
+    kind: str,
+    alpha: float,
+    gamma: float,
+    exp: float,
+    lam: float = 0.0,
+    array: bool = False,
+    **kwargs: any
+) -> BaseTenkPlayer:
+    """
+    Return a fresh `single` or `split` player (of the array ais with `array`)
+    learning with traces of `lam` (see `BaseTenkAi.setTraces`).
+    """
+    if kind == SINGLE:
+        ai = ArraySingleAi if array else SingleAi
+        player = SingleAiPlayer(ai(alpha, gamma, exp), **kwargs)
+    elif kind == SPLIT:
+        diceai, rollai = (ArrayDiceAi, ArrayRollAi) if array else (DiceAi, RollAi)
+        player = SplitAiPlayer(
+            diceai(alpha, gamma, exp), rollai(alpha, gamma, exp), **kwargs
+        )
+    else:
+        raise ValueError("unknown kind: %s" % kind)
+    for ai in player.ais:
+        ai.setTraces(lam)
+    return player
+
+
+def games_to_target(
+    kind: str,
+    lam: float,
+    target: float,
+    alpha: float = 0.05,
+    gamma: float = 0.6,
+    exp: float = 0.1,
+    array: bool = False,
+    max_games: int = 10000000,
+    every: int = 10000,
+    seed: int = 0,
+    min_reach: float = 1e-6,
+) -> Dict[str, any]:
+    """
+    Train a fresh player until the exact evaluation of its greedy policy
+    (every `every` games, see `EarlyStopping`) reaches `target`, at most
+    `max_games` games. Returns the games played (`None` if the target was not
+    reached), the final evaluated score and the seconds of training.
+    """
+    stopping = EarlyStopping(window=0, target=target, min_reach=min_reach)
+    player = make_player(
+        kind,
+        alpha,
+        gamma,
+        exp,
+        lam=lam,
+        array=array,
+        exit=max_games,
+        progress=every,
+        dice=DiceStream(seed),
+        stopping=stopping,
+    )
+    start = time.time()
+    play(player)
+    return {
+        "games": player.games if stopping.reason else None,
+        "score": stopping.scores[-1] if stopping.scores else 0.0,
+        "seconds": time.time() - start,
+    }
+
+
+def compare(
+    kind: str, lams: Sequence[float], target: float, seeds: int = 3, **kwargs: any
+) -> Dict[float, List[Dict[str, any]]]:
+    """
+    Compare the games to reach `target` of one-step Q-learning (`lam=0`) and
+    Q(λ) over `seeds` runs per λ (see `games_to_target`) and print a summary.
+    """
+    results = {}
+    for lam in lams:
+        results[lam] = [
+            games_to_target(kind, lam, target, seed=seed, **kwargs)
+            for seed in range(seeds)
+        ]
+    print("%6s %8s %12s %10s %10s" % ("lambda", "reached", "games", "score", "seconds"))
+    for lam, runs in results.items():
+        games = [run["games"] for run in runs if run["games"] is not None]
+        print(
+            "%6.2f %5i/%-2i %12s %10.2f %10.1f"
+            % (
+                lam,
+                len(games),
+                len(runs),
+                "%i" % np.median(games) if games else "-",
+                np.mean([run["score"] for run in runs]),
+                np.mean([run["seconds"] for run in runs]),
+            )
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Games to a target score of one-step Q-learning vs Q(lambda)"
+    )
+    parser.add_argument("--kind", choices=(SINGLE, SPLIT), default=SINGLE)
+    parser.add_argument("--array", action="store_true", help="use the array ais")
+    parser.add_argument("--lams", type=float, nargs="*", default=[0.0, 0.5, 0.9])
+    parser.add_argument("--target", type=float, default=300.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--gamma", type=float, default=0.6)
+    parser.add_argument("--exp", type=float, default=0.1)
+    parser.add_argument("--max-games", type=int, default=10000000)
+    parser.add_argument("--every", type=int, default=10000)
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--min-reach", type=float, default=1e-6)
+    args = parser.parse_args(argv)
+
+    compare(
+        args.kind,
+        args.lams,
+        args.target,
+        seeds=args.seeds,
+        alpha=args.alpha,
+        gamma=args.gamma,
+        exp=args.exp,
+        array=args.array,
+        max_games=args.max_games,
+        every=args.every,
+        min_reach=args.min_reach,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from tenk import scoring
+from tenk.scoring import (
+    CODE_SPACE,
+    DICES,
+    FACE_BITS,
+    FACE_CODE,
+    FACES,
+    KEEPS,
+    MAX_DICES,
+    SCORES,
+    VALID,
+    on_rules,
+)
+
+# Dense versions of the `tenk.scoring` tables indexed by dice code.
+FACE_CODES = np.array(FACE_CODE, dtype=np.int32)
+SIZE_TABLE = np.zeros(CODE_SPACE, dtype=np.int8)
+for _code, _dices in DICES.items():
+    SIZE_TABLE[_code] = len(_dices)
+
+
+def _tables() -> None:
+    """(Re)build the dense tables of the scoring rules in use."""
+    global SCORE_TABLE, VALID_TABLE, RANK_TABLE, KEEP_COUNTS, KEEP_TABLE
+    SCORE_TABLE = np.zeros(CODE_SPACE, dtype=np.int32)
+    VALID_TABLE = np.zeros(CODE_SPACE, dtype=bool)
+    for code in DICES:
+        VALID_TABLE[code] = VALID[code]
+    for code, score in SCORES.items():
+        SCORE_TABLE[code] = score
+    # valid keeps per roll, indexed by the rank of the dice code in `RANK_TABLE`
+    RANK_TABLE = np.zeros(CODE_SPACE, dtype=np.int16)
+    KEEP_COUNTS = np.zeros(len(KEEPS), dtype=np.int8)
+    KEEP_TABLE = np.zeros((len(KEEPS), max(len(k) for k in KEEPS.values())), np.int32)
+    for rank, (code, keeps) in enumerate(KEEPS.items()):
+        RANK_TABLE[code] = rank
+        KEEP_COUNTS[rank] = len(keeps)
+        KEEP_TABLE[rank, : len(keeps)] = keeps
+
+
+_tables()
+on_rules(_tables)
+
+
+def contains(codes: np.ndarray, keep_codes: np.ndarray) -> np.ndarray:
+    """Check for each row if the dices of `keep_codes` are part of `codes`."""
+    mask = (1 << FACE_BITS) - 1
+    result = np.ones(codes.shape, dtype=bool)
+    for face in FACES:
+        shift = FACE_BITS * (face - 1)
+        result &= ((keep_codes >> shift) & mask) <= ((codes >> shift) & mask)
+    return result
+
+
+def random_keeps(codes: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Pick a random valid keep for each rolled dice code like the exploration
+    in the ais (uniform over the distinct valid keeps).
+    """
+    ranks = RANK_TABLE[codes]
+    picks = (rng.random(len(codes)) * KEEP_COUNTS[ranks]).astype(np.intp)
+    return KEEP_TABLE[ranks, picks]
+
+
+def outcome(
+    codes: np.ndarray, keep: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return for each rolled dice code and keep code if the keep is legal, the
+    dice code left to roll (0 if illegal) and the points of the keep.
+    """
+    points = SCORE_TABLE[keep]
+    legal = (points > 0) & contains(codes, keep)
+    return legal, np.where(legal, codes - keep, 0), points
+
+
+def map_unique(keys: np.ndarray, cache: Dict[int, any], fkn: Callable) -> np.ndarray:
+    """
+    Map `fkn` over the distinct `keys` only, memoizing results in `cache`.
+    Returns the results for all rows as array.
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    values = []
+    for key in unique.tolist():
+        if key not in cache:
+            cache[key] = fkn(key)
+        values.append(cache[key])
+    return np.asarray(values)[inverse]
+
+
+class BatchPlayer(object):
+    """Batch TenK player interface for `play_batch`."""
+
+    def choose(self, codes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        Choose dices for each rolled dice code given the turn score before the
+        roll. Return the dice codes to keep.
+        """
+        raise NotImplementedError
+
+    def finish(self, codes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        Return `True` for each turn that should be finished, given the dice codes
+        left after the last `choose` and the turn scores including the keep.
+        Rows with invalid keeps are passed along but ignored.
+        """
+        raise NotImplementedError
+
+    def moves(self, code: int, score: int) -> Tuple[List[tuple], List[any]]:
+        """
+        Return the moves of the frozen policy for one rolled dice code and turn
+        score as `(probability, keep code, finish probability)` tuples, and the
+        states played randomly because the policy has not learned them.
+        Used for exact evaluation (`tenk.evaluate`), exploration is ignored.
+        """
+        raise NotImplementedError
+
+
+class BatchGame(object):
+    """
+    A batch of concurrent TenK turns played in lockstep, by the scoring rules
+    in use (`num_dices` defaults to the dices of the rules).
+    """
+
+    def __init__(
+        self,
+        num_games: int,
+        num_dices: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        num_dices = num_dices if num_dices else scoring.RULES.NUM_DICES
+        if num_dices > MAX_DICES:
+            raise ValueError("at most %i dices supported" % MAX_DICES)
+        self.NUM_DICES = num_dices
+        self.MIN_SCORE = scoring.RULES.MIN_SCORE
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.codes = np.zeros(num_games, dtype=np.int32)
+        self.scores = np.zeros(num_games, dtype=np.int32)
+        self.dices = np.full(num_games, num_dices, dtype=np.int8)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.rolls = np.zeros(num_games, dtype=np.int32)
+
+    def roll(self, rows: Optional[np.ndarray] = None) -> None:
+        """
+        Roll the dices of all running turns (or the running turns of the mask
+        `rows`) and end turns without valid moves.
+        """
+        rows = ~self.done if rows is None else rows & ~self.done
+        faces = self.rng.integers(
+            1, 7, size=(len(self.codes), self.NUM_DICES), dtype=np.int8
+        )
+        faces[np.arange(self.NUM_DICES) >= self.dices[:, None]] = 0
+        codes = FACE_CODES[faces].sum(axis=1, dtype=np.int32)
+        self.codes = np.where(rows, codes, np.where(self.done, 0, self.codes))
+        self.rolls += rows
+        self.bust(rows & ~VALID_TABLE[self.codes])
+
+    def bust(self, index: np.ndarray) -> None:
+        """End turns (given as mask or indexes) with a score of 0."""
+        self.scores[index] = 0
+        self.done[index] = True
+
+    def step(self, player: BatchPlayer) -> bool:
+        """Play one roll of all running turns. Returns `False` once all are done."""
+        self.roll()
+        active = np.flatnonzero(~self.done)
+        if not active.size:
+            return False
+        codes = self.codes[active]
+        keep = np.asarray(player.choose(codes, self.scores[active]), dtype=np.int32)
+        legal, left, points = outcome(codes, keep)
+        finish = player.finish(left, self.scores[active] + points)
+        self.move(active, legal, left, points, finish)
+        return True
+
+    def move(
+        self,
+        active: np.ndarray,
+        legal: np.ndarray,
+        left: np.ndarray,
+        points: np.ndarray,
+        finish: np.ndarray,
+    ) -> None:
+        """
+        Apply the `outcome` of keeps and the finish decisions to the turns with
+        the indexes `active`. Turns with illegal keeps bust.
+        """
+        finish = np.asarray(finish, dtype=bool)
+        self.bust(active[~legal])
+        active, left, finish = active[legal], left[legal], finish[legal]
+        self.scores[active] += points[legal]
+        dices = SIZE_TABLE[left]
+        self.dices[active] = np.where(dices > 0, dices, self.NUM_DICES)
+        if self.MIN_SCORE:
+            finish &= self.scores[active] >= self.MIN_SCORE
+        self.done[active] |= finish
+
+    def play(self, player: BatchPlayer) -> np.ndarray:
+        """Play all turns to the end. Returns the final scores."""
+        while self.step(player):
+            pass
+        return self.scores
+
+
+def play_batch(
+    player: BatchPlayer,
+    games: int,
+    num_dices: Optional[int] = None,
+    batch_size: int = 100000,
+    seed: Optional[any] = None,
+) -> np.ndarray:
+    """
+    Play `games` games in batches of `batch_size`. Returns all final scores.
+    `seed` is anything `numpy.random.default_rng` accepts (including a generator).
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for start in range(0, games, batch_size):
+        game = BatchGame(min(batch_size, games - start), num_dices=num_dices, rng=rng)
+        results.append(game.play(player))
+    return np.concatenate(results) if results else np.zeros(0, dtype=np.int32)
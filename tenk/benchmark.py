@@ -0,0 +1,386 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from tenk import rng
+from tenk.ai import checkpoint
+from tenk.ai.linear import LinearAi, LinearBatchPlayer
+from tenk.ai.replay import ReplayBuffer
+from tenk.ai.single import ArraySingleAi, SingleAi, SingleAiBatchPlayer, SingleAiPlayer
+from tenk.ai.split import DiceAi, RollAi, SplitAiPlayer
+from tenk.batch import BatchPlayer, play_batch
+from tenk.game import Player, calculate, play, roll, valid_moves
+from tenk.scoring import LEGAL_KEEPS, encode
+
+# Result of one benchmark: {"value": ..., "unit": ..., "better": "higher"|"lower"}
+Result = Dict[str, any]
+
+FORMAT_VERSION = 1
+
+
+class TrivialPlayer(Player):
+    """Player keeping the first legal set of dices until `limit` points."""
+
+    def __init__(self, games: int, limit: int = 350):
+        super().__init__()
+        self.EXIT = games
+        self.LIMIT = limit
+        self.games = 0
+
+    def choose(self, dices):
+        return list(LEGAL_KEEPS[encode(dices)][0])
+
+    def finish(self, score):
+        return score >= self.LIMIT
+
+    def write(self, score):
+        self.games += 1
+        if self.games >= self.EXIT:
+            self.end = True
+
+
+def _rate(fkn: Callable[[], None], ops: int, repeat: int, seed: int) -> float:
+    """Return the best rate (ops/s) of `repeat` seeded runs of `fkn`."""
+    best = float("inf")
+    for _ in range(repeat):
+        rng.seed(seed)
+        start = time.perf_counter()
+        fkn()
+        best = min(best, time.perf_counter() - start)
+    return ops / best
+
+
+def _result(value: float, unit: str, better: str = "higher") -> Result:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def _rolls(count: int) -> List[List[int]]:
+    return [roll(1 + i % 6) for i in range(count)]
+
+
+def bench_roll(count: int, repeat: int, seed: int) -> Result:
+    def run():
+        for i in range(count):
+            roll(1 + i % 6)
+
+    return _result(_rate(run, count, repeat, seed), "rolls/s")
+
+
+def bench_valid_moves(count: int, repeat: int, seed: int) -> Result:
+    rng.seed(seed)
+    rolls = _rolls(count)
+
+    def run():
+        for dices in rolls:
+            valid_moves(dices)
+
+    return _result(_rate(run, count, repeat, seed), "calls/s")
+
+
+def bench_calculate(count: int, repeat: int, seed: int) -> Result:
+    rng.seed(seed)
+    moves = [
+        (dices, list(rng.STREAM.choice(LEGAL_KEEPS[encode(dices)])))
+        for dices in _rolls(count)
+        if valid_moves(dices)
+    ]
+
+    def run():
+        for dices, keep in moves:
+            calculate(dices, keep)
+
+    return _result(_rate(run, len(moves), repeat, seed), "calls/s")
+
+
+def bench_play(games: int, repeat: int, seed: int) -> Result:
+    return _result(
+        _rate(lambda: play(TrivialPlayer(games)), games, repeat, seed), "games/s"
+    )
+
+
+def _single_player(games: int, ai=None) -> SingleAiPlayer:
+    return SingleAiPlayer(
+        ai if ai else SingleAi(0.05, 0.6, 0.1), exit=games, progress=float("inf")
+    )
+
+
+def _split_player(games: int) -> SplitAiPlayer:
+    return SplitAiPlayer(
+        DiceAi(0.05, 0.6, 0.1),
+        RollAi(0.05, 0.6, 0.1),
+        exit=games,
+        progress=float("inf"),
+    )
+
+
+def bench_train_single(games: int, repeat: int, seed: int) -> Result:
+    return _result(
+        _rate(lambda: play(_single_player(games)), games, repeat, seed), "games/s"
+    )
+
+
+def bench_train_split(games: int, repeat: int, seed: int) -> Result:
+    return _result(
+        _rate(lambda: play(_split_player(games)), games, repeat, seed), "games/s"
+    )
+
+
+def bench_train_array_single(games: int, repeat: int, seed: int, replay=False):
+    """Training of an `ArraySingleAi`, online or from a replay buffer."""
+
+    def run():
+        ai = ArraySingleAi(0.05, 0.6, 0.1)
+        if replay:
+            ai.setReplay(ReplayBuffer(100000))
+        play(_single_player(games, ai))
+
+    return _result(_rate(run, games, repeat, seed), "games/s")
+
+
+def bench_decide(ai, count: int, repeat: int, seed: int) -> Result:
+    """Learning decisions (update and action) of a `SingleAi` like ai."""
+    rng.seed(seed)
+    states = [(dices, 50 * (i % 20)) for i, dices in enumerate(_rolls(count))]
+    states = [(dices, score) for dices, score in states if valid_moves(dices)]
+
+    def run():
+        ai.init()
+        for dices, score in states:
+            ai.processGameState(dices, score)
+
+    return _result(_rate(run, len(states), repeat, seed), "decisions/s")
+
+
+def bench_decide_batch(player: BatchPlayer, games: int, repeat: int, seed: int):
+    """Greedy decisions of a batch player, all rolls of a batch step at once."""
+    choose = player.choose
+    decisions = []
+
+    def counted(codes, scores):
+        decisions.append(len(codes))
+        return choose(codes, scores)
+
+    def run():
+        play_batch(player, games, seed=np.random.default_rng(seed))
+
+    player.choose = counted
+    run()  # the same rolls and decisions every run
+    count = sum(decisions)
+    player.choose = choose
+    return _result(_rate(run, count, repeat, seed), "decisions/s")
+
+
+def _trained_single(games: int, seed: int) -> SingleAi:
+    rng.seed(seed)
+    player = _single_player(games)
+    play(player)
+    return player.ai
+
+
+def bench_greedy(ai: SingleAi, games: int, repeat: int, seed: int) -> Result:
+    """Greedy play of a trained `SingleAi` in the sequential game loop."""
+    greedy = SingleAi()
+    greedy.Q = ai.Q
+    greedy.setReadOnly()  # shares Q with `ai`, do not insert states
+
+    def run():
+        play(SingleAiPlayer(greedy, exit=games, progress=float("inf")))
+
+    return _result(_rate(run, games, repeat, seed), "games/s")
+
+
+def bench_greedy_batch(ai: SingleAi, games: int, repeat: int, seed: int) -> Result:
+    """Greedy play of a trained `SingleAi` with the batch engine."""
+
+    def run():
+        rng = np.random.default_rng(seed)
+        play_batch(SingleAiBatchPlayer(ai, rng=rng), games, seed=rng)
+
+    return _result(_rate(run, games, repeat, seed), "games/s")
+
+
+def synthetic_Q(states: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """Q dictionary shaped like the one of `SingleAi` with `states` states."""
+    rng = np.random.default_rng(seed)
+    values = rng.random((states, 4)).tolist()
+    return {
+        "%i_%i"
+        % (i // 600, i % 600 * 50): {"0" + str(a): value for a, value in enumerate(row)}
+        for i, row in enumerate(values)
+    }
+
+
+def bench_checkpoints(sizes: List[int], repeat: int, seed: int) -> Dict[str, Result]:
+    """Save and load synthetic Q tables as pickle and `.tenkq` checkpoint."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            Q = synthetic_Q(size, seed)
+            for fileformat in ("pickle", "tenkq"):
+                filename = os.path.join(directory, "Q.%s" % fileformat)
+                name = "checkpoint_%s_%i" % (fileformat, size)
+                results[name + "_save"] = _result(
+                    _rate(lambda: checkpoint.save(Q, filename), size, repeat, seed),
+                    "states/s",
+                )
+                # read every state, lazy checkpoints would not load anything
+                results[name + "_load"] = _result(
+                    _rate(lambda: checkpoint.load_all(filename), size, repeat, seed),
+                    "states/s",
+                )
+    return results
+
+
+def bench_memory(ai_class, games: int, seed: int) -> Result:
+    """Peak memory of training per million visited states."""
+    rng.seed(seed)
+    player = _single_player(games, ai_class(0.05, 0.6, 0.1))
+    tracemalloc.start()
+    try:
+        play(player)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return _result(peak / len(player.ai.Q), "MB/1M states", better="lower")
+
+
+def run(
+    scale: float = 1.0, repeat: int = 3, seed: int = 0, only: Optional[List[str]] = None
+) -> Dict[str, any]:
+    """
+    Run all benchmarks (or those starting with one of `only`) with sizes
+    multiplied by `scale` and return the results as JSON compatible dictionary.
+    """
+
+    def n(count):
+        return max(1, int(count * scale))
+
+    def wanted(name):
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    results = {}
+    if wanted("roll"):
+        results["roll"] = bench_roll(n(200000), repeat, seed)
+    if wanted("valid_moves"):
+        results["valid_moves"] = bench_valid_moves(n(200000), repeat, seed)
+    if wanted("calculate"):
+        results["calculate"] = bench_calculate(n(200000), repeat, seed)
+    if wanted("play"):
+        results["play"] = bench_play(n(50000), repeat, seed)
+    if wanted("train_single"):
+        results["train_single"] = bench_train_single(n(20000), repeat, seed)
+    if wanted("train_array_single"):
+        results["train_array_single"] = bench_train_array_single(n(20000), repeat, seed)
+        results["train_array_single_replay"] = bench_train_array_single(
+            n(20000), repeat, seed, replay=True
+        )
+    if wanted("decide"):
+        results["decide_single"] = bench_decide(
+            SingleAi(0.05, 0.6, 0.1), n(100000), repeat, seed
+        )
+        results["decide_linear"] = bench_decide(
+            LinearAi(0.05, 0.6, 0.1), n(100000), repeat, seed
+        )
+        linear = LinearAi(0.05, 0.6, 0.1)
+        bench_decide(linear, n(100000), 1, seed)  # some weights to play with
+        results["decide_linear_batch"] = bench_decide_batch(
+            LinearBatchPlayer(linear, rng=np.random.default_rng(seed)),
+            n(100000),
+            repeat,
+            seed,
+        )
+    if wanted("train_split"):
+        results["train_split"] = bench_train_split(n(20000), repeat, seed)
+    if wanted("greedy"):
+        ai = _trained_single(n(50000), seed)
+        results["greedy"] = bench_greedy(ai, n(20000), repeat, seed)
+        results["greedy_batch"] = bench_greedy_batch(ai, n(200000), repeat, seed)
+    if wanted("checkpoint"):
+        sizes = sorted({n(10000), n(100000)})
+        results.update(bench_checkpoints(sizes, repeat, seed))
+    if wanted("memory"):
+        results["memory_single"] = bench_memory(SingleAi, n(50000), seed)
+        results["memory_array_single"] = bench_memory(ArraySingleAi, n(50000), seed)
+    return {
+        "version": FORMAT_VERSION,
+        "seed": seed,
+        "scale": scale,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(
+    results: Dict[str, any], baseline: Dict[str, any], threshold: float = 0.1
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Compare results with a baseline and print the changes. Returns the
+    regressions (name, baseline, value, relative change): benchmarks that got
+    worse by more than `threshold` (relative to the baseline).
+    """
+    regressions = []
+    print("%-32s %14s %14s %8s" % ("benchmark", "baseline", "current", "change"))
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print("%-32s %14s %14.4g %8s" % (name, "-", result["value"], "new"))
+            continue
+        change = result["value"] / old["value"] - 1
+        worse = -change if result["better"] == "higher" else change
+        regressed = worse > threshold
+        print(
+            "%-32s %14.4g %14.4g %+7.1f%%%s"
+            % (
+                name,
+                old["value"],
+                result["value"],
+                change * 100,
+                " REGRESSION" if regressed else "",
+            )
+        )
+        if regressed:
+            regressions.append((name, old["value"], result["value"], change))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="TenK engine and learner benchmarks")
+    parser.add_argument("--output", default="benchmark.json", help="result file")
+    parser.add_argument("--baseline", help="baseline result file to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative regression threshold"
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="size multiplier")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="benchmark name prefixes to run")
+    args = parser.parse_args(argv)
+
+    results = run(scale=args.scale, repeat=args.repeat, seed=args.seed, only=args.only)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    if not args.baseline:
+        for name, result in results["results"].items():
+            print("%-32s %14.4g %s" % (name, result["value"], result["unit"]))
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, threshold=args.threshold)
+    if regressions:
+        print(
+            "%i regression(s) above %.0f%%" % (len(regressions), args.threshold * 100)
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
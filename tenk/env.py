@@ -0,0 +1,164 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from tenk import rng, scoring
+from tenk.batch import BatchGame, outcome
+from tenk.rng import DiceStream
+from tenk.scoring import DICES, FACE_CODE, KEEPS, MAX_DICES, SCORES, VALID, on_rules
+
+# valid keeps per rolled dice code for fast membership tests
+KEEP_SETS = {}
+
+
+def _keep_sets() -> None:
+    KEEP_SETS.clear()
+    KEEP_SETS.update({code: frozenset(keeps) for code, keeps in KEEPS.items()})
+
+
+_keep_sets()
+on_rules(_keep_sets)
+
+
+def keep_code(dices: Sequence[int], keep: Sequence[int]) -> Optional[int]:
+    """
+    Return the dice code of the dices at the indexes `keep`, `None` if the
+    indexes are not distinct indexes of `dices`.
+    """
+    if len(set(keep)) != len(keep):
+        return None
+    code = 0
+    for i in keep:
+        if not 0 <= i < len(dices):
+            return None
+        code += FACE_CODE[dices[i]]
+    return code
+
+
+class Env(object):
+    """
+    A TenK turn as environment with `reset` and `step`.
+
+    Observations are the rolled dices as dice code (see `tenk.scoring`) and
+    the turn score before the roll. An action is a keep (as dice code) and
+    whether to finish the turn after it. The reward is the written down
+    score when the turn ends (0 for busts and invalid keeps), else 0.
+    If the first roll has no valid moves the turn is over right after
+    `reset` (`done` is set).
+    Turns are played by the scoring rules in use (see `tenk.scoring.use`),
+    `num_dices` defaults to the dices of the rules and finishing below their
+    minimum score is ignored.
+    """
+
+    def __init__(
+        self, num_dices: Optional[int] = None, dice: Optional[DiceStream] = None
+    ):
+        num_dices = num_dices if num_dices else scoring.RULES.NUM_DICES
+        if num_dices > MAX_DICES:
+            raise ValueError("at most %i dices supported" % MAX_DICES)
+        self.NUM_DICES = num_dices
+        self.MIN_SCORE = scoring.RULES.MIN_SCORE
+        self.dice = dice if dice else rng.STREAM
+        self.code = 0
+        self.score = 0
+        self.rolls = 0
+        self.done = True
+
+    def _roll(self, num_dices: int) -> None:
+        self.code = self.dice.roll_code(num_dices)
+        self.rolls += 1
+        if not VALID[self.code]:
+            self.score = 0
+            self.done = True
+
+    def reset(self) -> Tuple[int, int]:
+        """Start a new turn and return the first observation."""
+        self.score = 0
+        self.rolls = 0
+        self.done = False
+        self._roll(self.NUM_DICES)
+        return self.code, self.score
+
+    def dices(self) -> List[int]:
+        """Return the rolled dices sorted."""
+        return list(DICES[self.code])
+
+    def points(self, keep: Optional[int]) -> int:
+        """Return the points of a keep code for the current roll, 0 if invalid."""
+        return SCORES[keep] if keep in KEEP_SETS[self.code] else 0
+
+    def step(self, action: Tuple[int, bool]) -> Tuple[Tuple[int, int], int, bool, Dict]:
+        """
+        Keep the dices of the keep code and finish or roll again. Returns the
+        observation, reward, done and an info dictionary (`bust` if the next
+        roll has no valid moves, `invalid` if the keep is not valid).
+        """
+        if self.done:
+            raise ValueError("turn is over, call reset()")
+        keep, finish = action
+        points = self.points(keep)
+        if not points:
+            self.score = 0
+            self.done = True
+            return (self.code, 0), 0, True, {"bust": False, "invalid": True}
+        self.score += points
+        if finish and self.score >= self.MIN_SCORE:
+            self.done = True
+            info = {"bust": False, "invalid": False}
+            return (self.code, self.score), self.score, True, info
+        self._roll(len(DICES[self.code - keep]) or self.NUM_DICES)
+        info = {"bust": self.done, "invalid": False}
+        return (self.code, self.score), 0, self.done, info
+
+
+class BatchEnv(object):
+    """
+    Many independent TenK turns stepped together (see `Env`), with dice codes,
+    scores, rewards and done flags as arrays. Finished turns stay done (and
+    are ignored by `step`) until they are `reset`.
+    """
+
+    def __init__(
+        self,
+        num_games: int,
+        num_dices: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        self.game = BatchGame(num_games, num_dices=num_dices, rng=rng)
+        self.game.done[:] = True
+
+    @property
+    def done(self) -> np.ndarray:
+        return self.game.done
+
+    def reset(self, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Start new turns for all games (or the games of the mask `rows`) and
+        return the observations (dice codes, scores) of all games.
+        """
+        game = self.game
+        rows = np.ones(len(game.codes), dtype=bool) if rows is None else rows
+        game.scores[rows] = 0
+        game.dices[rows] = game.NUM_DICES
+        game.rolls[rows] = 0
+        game.done[rows] = False
+        game.roll(rows)
+        return game.codes.copy(), game.scores.copy()
+
+    def step(
+        self, keep: np.ndarray, finish: np.ndarray
+    ) -> Tuple[Tuple[np.ndarray, np.ndarray], np.ndarray, np.ndarray]:
+        """
+        Apply keep codes and finish decisions (arrays over all games, entries
+        of finished games are ignored) and roll the turns going on. Returns
+        the observations, the rewards (final scores of the turns ending in
+        this step) and the done flags.
+        """
+        game = self.game
+        active = np.flatnonzero(~game.done)
+        keep = np.asarray(keep, dtype=np.int32)[active]
+        legal, left, points = outcome(game.codes[active], keep)
+        game.move(active, legal, left, points, np.asarray(finish)[active])
+        game.roll()
+        ended = np.zeros(len(game.codes), dtype=bool)
+        ended[active] = game.done[active]
+        rewards = np.where(ended, game.scores, 0)
+        return (game.codes.copy(), game.scores.copy()), rewards, game.done.copy()
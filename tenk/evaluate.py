@@ -0,0 +1,114 @@
+import heapq
+from typing import Dict, Optional
+from tenk import scoring
+from tenk.batch import BatchPlayer
+from tenk.scoring import DICES, KEEPS, MAX_DICES, ROLLS, SCORES, VALID
+
+
+class Evaluation(object):
+    """Exact results of a policy evaluation."""
+
+    def __init__(
+        self, value: float, bust: float, states: int, unseen: Dict, cut: float
+    ):
+        self.value = value
+        self.bust = bust
+        self.states = states
+        # probability of reaching states cut off by `min_reach` or `cap`
+        self.cut = cut
+        # unseen state -> expected number of random decisions per turn in it
+        self.unseen = unseen
+
+    def __str__(self):
+        return (
+            "%.2f - bust %.2f%% - %i states - %i unseen (%.3f random moves/turn)"
+            " - cut %.1e"
+            % (
+                self.value,
+                self.bust * 100,
+                self.states,
+                len(self.unseen),
+                sum(self.unseen.values()),
+                self.cut,
+            )
+        )
+
+
+def evaluate(
+    player: BatchPlayer,
+    num_dices: Optional[int] = None,
+    cap: int = 30000,
+    min_reach: float = 0.0,
+) -> Evaluation:
+    """
+    Compute the exact expected turn score and bust probability of the frozen
+    policy of `player` (see `BatchPlayer.moves`) by recursion over the exact
+    roll outcomes. Turns reaching `cap`, or a state with a probability below
+    `min_reach`, are counted as written down at that score.
+
+    States (dices to roll, turn score) are first expanded forward in order of
+    increasing score, keeping the probability to reach them, and then valued
+    backwards, so every decision of the policy is looked up exactly once.
+    Turns are played by the scoring rules in use (see `tenk.scoring.use`).
+    """
+    num_dices = num_dices if num_dices else scoring.RULES.NUM_DICES
+    min_score = scoring.RULES.MIN_SCORE
+    if num_dices > MAX_DICES:
+        raise ValueError("at most %i dices supported" % MAX_DICES)
+    start = (num_dices, 0)
+    reach = {start: 1.0}
+    transitions = {}
+    unseen = {}
+    cut = 0.0
+    queue = [(0, num_dices)]
+    while queue:
+        score, dices = heapq.heappop(queue)
+        state = (dices, score)
+        edges = transitions[state] = []
+        # all predecessors have lower scores, so the reach probability is final
+        if reach[state] < min_reach:
+            cut += reach[state]
+            continue
+        for code, prob in ROLLS[dices]:
+            if not VALID[code]:
+                continue
+            moves, random_states = player.moves(code, score)
+            for name in random_states:
+                unseen[name] = unseen.get(name, 0.0) + reach[state] * prob
+            for weight, keep, finish in moves:
+                if keep not in KEEPS[code]:
+                    continue  # invalid keep, scores 0
+                new_score = score + SCORES[keep]
+                left = len(DICES[code - keep]) or num_dices
+                if new_score < min_score:
+                    finish = 0.0
+                if new_score >= cap and finish < 1:
+                    cut += reach[state] * prob * weight * (1 - finish)
+                    finish = 1.0
+                edges.append((prob * weight, new_score, left, finish))
+                if finish < 1:
+                    successor = (left, new_score)
+                    if successor not in reach:
+                        reach[successor] = 0.0
+                        heapq.heappush(queue, (new_score, left))
+                    reach[successor] += reach[state] * prob * weight * (1 - finish)
+
+    values = {}
+    busts = {}
+    for state in sorted(transitions, key=lambda s: s[1], reverse=True):
+        if not transitions[state] and reach[state] < min_reach:
+            values[state] = float(state[1])
+            busts[state] = 0.0
+            continue
+        value = 0.0
+        bust = 1.0
+        for prob, new_score, left, finish in transitions[state]:
+            value += prob * finish * new_score
+            bust -= prob * finish
+            if finish < 1:
+                successor = (left, new_score)
+                value += prob * (1 - finish) * values[successor]
+                bust -= prob * (1 - finish) * (1 - busts[successor])
+        values[state] = value
+        busts[state] = bust
+    return Evaluation(values[start], busts[start], len(transitions), unseen, cut)
@@ -1,7 +1,19 @@
-import random as r
 from collections import Counter
 import time
-from typing import List
+from typing import Callable, List, Optional, Tuple
+from tenk import rng
+from tenk.env import Env, keep_code
+from tenk.scoring import (
+    FACE_CODE,
+    MAX_DICES,
+    SCORES,
+    VALID,
+    canonical_keep,
+    encode,
+    score_counts,
+    valid_counts,
+)
+from tenk.stats import TurnStats
 
 console_output = False
 
@@ -14,8 +26,8 @@ def show(x="", delay=0):
 
 
 def roll(num_dice=6):
-    """Roll the dices."""
-    return sorted([r.randint(1, 6) for dice in range(num_dice)])
+    """Roll the dices (from the default stream of `tenk.rng`)."""
+    return rng.STREAM.roll(num_dice)
 
 
 def splitdices(dices, keep):
@@ -32,86 +44,103 @@ def calculate(dices, keep):
     """
     if not keep:
         raise ValueError("No keep")
-    next_dices, kept_dices = splitdices(dices, keep)
-    counters = Counter(kept_dices)
-    score = 0
-    for points in counters.keys():
-        counter = counters[points]
-        if points == 1:
-            if counter < 3:
-                score += counter * 100
-            else:
-                score += (counter - 2) * 1000
-        elif points == 5:
-            if counter < 3:
-                score += counter * 50
-            else:
-                score += (counter - 2) * 500
-        else:
-            if counter < 3:
-                raise ValueError(str("points: %i, counter: %i" % (points, counter)))
-            else:
-                score += (counter - 2) * 100 * points
+    next_dices = [dices[i] for i in range(len(dices)) if i not in keep]
+    if len(keep) > MAX_DICES:
+        return score_counts(Counter([dices[i] for i in keep])), next_dices
+    keep_code = 0
+    for i in keep:
+        keep_code += FACE_CODE[dices[i]]
+    score = SCORES.get(keep_code)
+    if score is None:
+        # raises with the same message as the scoring rules
+        score_counts(Counter([dices[i] for i in keep]))
     return score, next_dices
 
 
 def valid_moves(dices):
     """Check if there are valid moves possible with the given dices."""
-    counters = Counter(dices)
-    return (
-        counters[1] > 0
-        or counters[5] > 0
-        or counters[2] > 2
-        or counters[3] > 2
-        or counters[4] > 2
-        or counters[6] > 2
-    )
-
-
-def play(player, num_dices=6, delay=0, doshow=False):
-    """Play a game."""
+    if len(dices) > MAX_DICES:
+        return valid_counts(Counter(dices))
+    return VALID[encode(dices)]
+
+
+def play(player, num_dices=None, delay=0, doshow=False):
+    """
+    Play a game: an adapter running the callbacks of `player` on a
+    `tenk.env.Env` (by the scoring rules in use). Dices are rolled from the
+    `dice` stream of the player if it has one (see `tenk.rng`). If the player
+    has an `instrument` (see `tenk.instrument`) the phases of the game loop
+    are timed.
+    """
     global console_output
     console_output = doshow
+    env = Env(num_dices, getattr(player, "dice", None))
+    instrument = getattr(player, "instrument", None)
+    if instrument is None:
+        _loop(
+            player,
+            env,
+            delay,
+            env.reset,
+            env.step,
+            player.choose,
+            player.finish,
+            player.write,
+            show,
+        )
+        return
+    instrument.start()
+    try:
+        _loop(player, env, delay, *instrument.phases(player, env))
+    finally:
+        instrument.stop()
+
+
+def _loop(player, env, delay, reset, step, choose, finish_turn, write, show):
+    output = console_output  # messages are only formatted for the console
     while not player.end:  # game loop
-        score = 0
-        finish = False
-        dices = []
-        while not finish:
-            # roll dices
-            if not dices:
-                dices = roll(num_dices)
-            else:
-                dices = roll(len(dices))
-            d = dices
-            show("Roll: %s" % dices, delay)
-            if not valid_moves(dices):
-                show("  no valid moves %s" % dices)
-                player.write(0)
-                show("Final score: 0", delay * 5)
-                show()
+        reset()
+        while True:
+            dices = env.dices()
+            if output:
+                show("Roll: %s" % dices, delay)
+            if env.done:
+                if output:
+                    show("  no valid moves %s" % dices)
+                write(0)
+                if output:
+                    show("Final score: 0", delay * 5)
+                    show()
                 break
 
             # choose dices to keep
-            keep = player.choose(dices)
-            show("  Keep: %s" % ([dices[i] for i in keep]), delay)
+            keep = choose(dices)
+            if output:
+                show("  Keep: %s" % ([dices[i] for i in keep]), delay)
             # calculate score
-            try:
-                result = calculate(dices, keep)
-                score += result[0]
-                dices = result[1]
-                show("  Score +%i -> %i" % (result[0], score), delay)
-                finish = player.finish(score)
+            code = keep_code(dices, keep)
+            points = env.points(code)
+            if not points:
+                step((code, True))
+                write(0)
+                if output:
+                    show("  wrong move!!!")
+                    show("Final score: 0", delay * 5)
+                    show()
+                break
+            score = env.score + points
+            if output:
+                show("  Score +%i -> %i" % (points, score), delay)
+            finish = finish_turn(score)
+            if output:
                 show("  Finish: %s" % finish, delay)
-            except ValueError:
-                player.write(0)
-                show("  wrong move!!!")
-                show("Final score: 0", delay * 5)
-                show()
+            step((code, finish))
+            if env.done and env.score:  # written down
+                write(score)
+                if output:
+                    show("Final score: %i" % score, delay * 5)
+                    show()
                 break
-            if finish:
-                player.write(score)
-                show("Final score: %i" % score, delay * 5)
-                show()
 
 
 class Player(object):
@@ -139,6 +168,44 @@ class Player(object):
         raise NotImplementedError
 
 
+class PolicyPlayer(Player):
+    """
+    TenK player of a fixed policy: `decide(code, score)` returns the dice code
+    to keep and the finish decision for a rolled dice code and the turn score
+    before the roll. The written down turns are counted in `stats` (see
+    `tenk.stats.TurnStats`), the game ends after `exit` games.
+    """
+
+    def __init__(
+        self, decide: Callable[[int, int], Tuple[int, bool]], exit: Optional[int] = None
+    ) -> None:
+        super().__init__()
+        self.decide = decide
+        self.EXIT = exit
+        self.games = 0
+        self.stats = TurnStats()
+        self.score = 0
+        self.rolls = 0
+        self.finishing = False
+
+    def choose(self, dices):
+        self.rolls += 1
+        keep, self.finishing = self.decide(encode(dices), self.score)
+        return canonical_keep(dices, keep)
+
+    def finish(self, score):
+        self.score = score
+        return self.finishing
+
+    def write(self, score):
+        self.stats.add(score, self.rolls)
+        self.score = 0
+        self.rolls = 0
+        self.games += 1
+        if self.EXIT and self.games >= self.EXIT:
+            self.end = True
+
+
 class HumanPlayer(Player):
     """Human TenK player implementation."""
 
@@ -0,0 +1,186 @@
+import cProfile
+import time
+from typing import Callable, List, Optional
+from tenk.game import show
+
+# phases of the game loop timed by `tenk.game.play`
+LOOP_PHASES = ("reset", "step", "choose", "finish", "write", "show")
+# methods of `BaseTenkAi` timed per ai (nested in the loop phases)
+AI_PHASES = (
+    "encodeState",
+    "updateReward",
+    "act",
+    "getRewards",
+    "bestAction",
+    "estimateReward",
+)
+
+
+class Instrument(object):
+    """
+    Per-phase timers and call counters for the game loop and the ais of a
+    player, and Q table growth per ai.
+
+    Nothing is instrumented unless an instrument is given to a player: the
+    game loop then binds timed wrappers of its phases and the ai methods are
+    shadowed by timed wrappers on the ai instances, so the uninstrumented code
+    paths stay unchanged. With `profile` (a filename pattern with one `%i` for
+    the number of games) a cProfile snapshot is dumped with every report.
+    Calls are counted when they start, and work between `pause` and `resume`
+    (e.g. progress lines and checkpoints) is not timed, also within a phase.
+    """
+
+    def __init__(self, profile: Optional[str] = None):
+        self.PROFILE = profile
+        self.profiler = cProfile.Profile() if profile else None
+        self.times = {}
+        self.calls = {}
+        self.nested = set()
+        self.ais = []
+        self.sizes = {}
+        self.elapsed = 0.0
+        self.started = None
+        self.games = 0
+        # (phase, [start]) of the timed calls in progress
+        self.running = []
+
+    def timed(self, name: str, fkn: Callable) -> Callable:
+        """Return `fkn` wrapped to add its calls and time to phase `name`."""
+        times = self.times
+        calls = self.calls
+        running = self.running
+        times.setdefault(name, 0.0)
+        calls.setdefault(name, 0)
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            start = [clock()]
+            running.append((name, start))
+            try:
+                return fkn(*args, **kwargs)
+            finally:
+                running.pop()
+                times[name] += clock() - start[0]
+
+        return wrapper
+
+    def phases(self, player, env) -> List[Callable]:
+        """Return timed loop phases (see `LOOP_PHASES`) for `tenk.game.play`."""
+        functions = {
+            "reset": env.reset,
+            "step": env.step,
+            "choose": player.choose,
+            "finish": player.finish,
+            "write": player.write,
+            "show": show,
+        }
+        return [self.timed(name, functions[name]) for name in LOOP_PHASES]
+
+    def attach(self, ai) -> None:
+        """Time the methods of an ai (see `AI_PHASES`) and track its Q size."""
+        name = ai.__class__.__name__
+        for method in AI_PHASES:
+            phase = "%s.%s" % (name, method)
+            self.nested.add(phase)
+            setattr(ai, method, self.timed(phase, getattr(ai, method)))
+        self.ais.append(ai)
+        self.sizes[id(ai)] = len(ai.Q)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+
+    def stop(self) -> None:
+        if self.profiler:
+            self.profiler.disable()
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+
+    def pause(self) -> None:
+        """Stop timing, also the phases in progress, until `resume`."""
+        now = time.perf_counter()
+        for name, start in self.running:
+            self.times[name] += now - start[0]
+            start[0] = now
+        self.stop()
+
+    def resume(self) -> None:
+        self.start()
+        now = time.perf_counter()
+        for _, start in self.running:
+            start[0] = now
+
+    def reset(self) -> None:
+        """Reset all counters (keeps running if started)."""
+        for name in self.times:
+            self.times[name] = 0.0
+            self.calls[name] = 0
+        for ai in self.ais:
+            self.sizes[id(ai)] = len(ai.Q)
+        self.elapsed = 0.0
+        if self.started is not None:
+            self.started = time.perf_counter()
+
+    def report(self, games: int) -> str:
+        """
+        Return the breakdown since the last reset over `games` games and dump a
+        profile snapshot if profiling.
+        """
+        elapsed = self.elapsed
+        if self.started is not None:
+            elapsed += time.perf_counter() - self.started
+        games = max(games, 1)
+        lines = [
+            "  %-28s %10s %9s %9s %9s %6s"
+            % ("phase", "calls", "total s", "us/call", "us/game", "%")
+        ]
+
+        def line(name, calls, seconds):
+            lines.append(
+                "  %-28s %10i %9.3f %9.2f %9.2f %5.1f%%"
+                % (
+                    name,
+                    calls,
+                    seconds,
+                    seconds / calls * 1e6 if calls else 0.0,
+                    seconds / games * 1e6,
+                    seconds / elapsed * 100 if elapsed else 0.0,
+                )
+            )
+
+        for name in self.times:
+            if name not in self.nested:
+                line(name, self.calls[name], self.times[name])
+        loop = sum(t for name, t in self.times.items() if name not in self.nested)
+        line("(loop overhead)", games, max(elapsed - loop, 0.0))
+        for name in self.times:
+            if name in self.nested:
+                line("  " + name, self.calls[name], self.times[name])
+        for ai in self.ais:
+            size = len(ai.Q)
+            growth = size - self.sizes[id(ai)]
+            lines.append(
+                "  Q %-26s %10i states (+%i, %.3f/game)"
+                % (ai.__class__.__name__, size, growth, growth / games)
+            )
+
+        if self.profiler:
+            filename = (
+                self.PROFILE % self.games if "%" in self.PROFILE else self.PROFILE
+            )
+            running = self.started is not None
+            self.profiler.dump_stats(filename)  # disables the profiler
+            if running:
+                self.profiler.enable()
+            lines.append("  profile: %s" % filename)
+        return "\n".join(lines)
+
+    def progress(self, games: int, total: int) -> str:
+        """Report the last `games` games (of `total` played) and reset."""
+        self.games = total
+        result = self.report(games)
+        self.reset()
+        return result
@@ -0,0 +1,145 @@
+import pickle
+import numpy as np
+from typing import List, Sequence
+from tenk.scoring import DICES, FACE_CODE, FACES, MAX_DICES
+
+# dice code of every face, indexed by face - 1
+_FACE_CODES = np.array([FACE_CODE[face] for face in FACES], dtype=np.int64)
+
+
+class _Block(object):
+    """
+    Block of pre-generated values drawn from its own bit generator. The state
+    of the generator before drawing the block and the position in the block
+    restore it exactly.
+    """
+
+    def __init__(self, seed: np.random.SeedSequence, draw, size: int):
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.draw = draw
+        self.SIZE = size
+        self.fill()
+
+    def fill(self) -> None:
+        self.state = self.generator.bit_generator.state
+        self.values = self.draw(self.generator, self.SIZE)
+        self.position = 0
+
+    def next(self):
+        if self.position == self.SIZE:
+            self.fill()
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+    def getstate(self) -> tuple:
+        return self.state, self.position
+
+    def setstate(self, state: tuple) -> None:
+        self.generator.bit_generator.state, position = state
+        self.fill()
+        self.position = position
+
+
+def _draw_rolls(num_dices: int):
+    def draw(generator: np.random.Generator, size: int) -> List[int]:
+        faces = generator.integers(0, len(FACES), (size, num_dices))
+        return _FACE_CODES[faces].sum(axis=1).tolist()
+
+    return draw
+
+
+def _draw_uniforms(generator: np.random.Generator, size: int) -> List[float]:
+    return generator.random(size).tolist()
+
+
+class DiceStream(object):
+    """
+    Seedable source of dice rolls and uniform random numbers.
+
+    Rolls of every number of dices (as dice codes) and uniforms are
+    pre-generated in blocks of `block` values from independent NumPy
+    generators, so sorted rolls are looked up in `tenk.scoring.DICES` instead
+    of drawing and sorting single dices.
+    `spawn` creates independent substreams (e.g. one per worker process) and
+    `getstate`/`setstate` (or `save`/`load`) restore a stream exactly.
+    """
+
+    def __init__(self, seed: any = None, block: int = 8192):
+        self.BLOCK = block
+        self.seed(seed)
+
+    def seed(self, seed: any = None) -> None:
+        """Restart the stream from `seed` (an int, `None` or a `SeedSequence`)."""
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seedSequence = seed
+        seeds = seed.spawn(MAX_DICES + 1)
+        self.rolls = [None] + [
+            _Block(seeds[n], _draw_rolls(n), self.BLOCK)
+            for n in range(1, MAX_DICES + 1)
+        ]
+        self.uniforms = _Block(seeds[0], _draw_uniforms, self.BLOCK)
+
+    def spawn(self, count: int) -> List["DiceStream"]:
+        """Return `count` independent substreams."""
+        return [DiceStream(seed, self.BLOCK) for seed in self.seedSequence.spawn(count)]
+
+    def roll_code(self, num_dices: int) -> int:
+        """Roll `num_dices` dices and return the dice code."""
+        return self.rolls[num_dices].next()
+
+    def roll(self, num_dices: int = 6) -> List[int]:
+        """Roll `num_dices` dices and return them sorted."""
+        if num_dices > MAX_DICES:
+            return sorted(self.choice(FACES) for _ in range(num_dices))
+        return list(DICES[self.rolls[num_dices].next()])
+
+    def random(self) -> float:
+        """Return a uniform random number in [0, 1)."""
+        return self.uniforms.next()
+
+    def bit(self) -> int:
+        """Return a random bit."""
+        return int(self.uniforms.next() < 0.5)
+
+    def choice(self, sequence: Sequence) -> any:
+        """Return a random element of a non empty sequence."""
+        return sequence[int(self.uniforms.next() * len(sequence))]
+
+    def getstate(self) -> dict:
+        sequence = self.seedSequence
+        return {
+            "block": self.BLOCK,
+            "seed": (sequence.entropy, sequence.spawn_key, sequence.n_children_spawned),
+            "rolls": [block.getstate() for block in self.rolls[1:]],
+            "uniforms": self.uniforms.getstate(),
+        }
+
+    def setstate(self, state: dict) -> None:
+        entropy, spawn_key, children = state["seed"]
+        self.BLOCK = state["block"]
+        self.seed(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+        self.seedSequence = np.random.SeedSequence(
+            entropy, spawn_key=spawn_key, n_children_spawned=children
+        )
+        for block, block_state in zip(self.rolls[1:], state["rolls"]):
+            block.setstate(block_state)
+        self.uniforms.setstate(state["uniforms"])
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as file:
+            pickle.dump(self.getstate(), file)
+
+    def load(self, filename: str) -> None:
+        with open(filename, "rb") as file:
+            self.setstate(pickle.load(file))
+
+
+# default stream of `tenk.game.roll` and the ais
+STREAM = DiceStream()
+
+
+def seed(seed: any = None) -> None:
+    """Restart the default stream from `seed`."""
+    STREAM.seed(seed)
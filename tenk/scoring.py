@@ -0,0 +1,311 @@
+from collections import Counter
+from math import factorial
+from itertools import combinations_with_replacement, product
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAX_DICES = 6
+FACES = range(1, 7)
+
+# A dice multiset is packed into one integer "dice code": three bits per face
+# holding how often that face occurs. Codes of disjoint multisets add up, so the
+# code of the remaining dices is just `code - keep_code`.
+FACE_BITS = 3
+FACE_CODE = (0,) + tuple(1 << (FACE_BITS * (face - 1)) for face in FACES)
+CODE_SPACE = 1 << (FACE_BITS * len(FACES))
+
+
+# how more than three of a kind score: the points of the triple are added for
+# every further dice (`ADD`: four ones 2000, five ones 3000) or doubled (`DOUBLE`:
+# four ones 2000, five ones 4000)
+ADD = "add"
+DOUBLE = "double"
+MULTIPLES = (ADD, DOUBLE)
+
+
+class RuleSet(object):
+    """
+    Declarative scoring rules, compiled into the lookup tables of this module
+    by `use` (the default rules are in use from the start).
+
+    Dices score in combinations: `singles` (face -> points of one dice),
+    three or more of a kind (`kinds`: face -> points of three, more dices
+    score by `multiples`), a `straight` (one of every face) and `three_pairs`
+    (a four of a kind counts as two pairs), the last two not at all if `None`.
+    A keep scores the best partition of its dices into combinations and is
+    invalid if any dice is left over. Turns start with `num_dices` dices (up
+    to `MAX_DICES`, also rolled again after keeping all dices) and can only be
+    written down from `min_score` on, finishing below is ignored.
+    """
+
+    def __init__(
+        self,
+        singles: Optional[Dict[int, int]] = None,
+        kinds: Optional[Dict[int, int]] = None,
+        multiples: str = ADD,
+        straight: Optional[int] = None,
+        three_pairs: Optional[int] = None,
+        num_dices: int = MAX_DICES,
+        min_score: int = 0,
+    ):
+        if multiples not in MULTIPLES:
+            raise ValueError("unknown multiples: %s" % multiples)
+        if not 0 < num_dices <= MAX_DICES:
+            raise ValueError("between 1 and %i dices supported" % MAX_DICES)
+        if singles is None:
+            singles = {1: 100, 5: 50}
+        if kinds is None:
+            kinds = {face: 1000 if face == 1 else 100 * face for face in FACES}
+        # faces as int keys also when read from JSON
+        self.SINGLES = {int(face): points for face, points in singles.items()}
+        self.KINDS = {int(face): points for face, points in kinds.items()}
+        self.MULTIPLES = multiples
+        self.STRAIGHT = straight
+        self.THREE_PAIRS = three_pairs
+        self.NUM_DICES = num_dices
+        self.MIN_SCORE = min_score
+        self._points = {}
+
+    def kind(self, face: int, count: int) -> int:
+        """Return the points of `count` (three or more) dices of a face."""
+        if self.MULTIPLES == DOUBLE:
+            return self.KINDS[face] << (count - 3)
+        return self.KINDS[face] * (count - 2)
+
+    def points(self, counts: Tuple[int, ...]) -> Optional[int]:
+        """
+        Return the points of dices given as count per face, `None` if they
+        can not all score.
+        """
+        points = self._points.get(counts, False)
+        if points is False:
+            points = self._points[counts] = self._best(counts)
+        return points
+
+    def _best(self, counts: Tuple[int, ...]) -> Optional[int]:
+        if not any(counts):
+            return 0
+        best = None
+        # every partition has a combination with a dice of the lowest face
+        for combination, points in self._combinations(counts):
+            rest = self.points(tuple(c - d for c, d in zip(counts, combination)))
+            if rest is not None and (best is None or points + rest > best):
+                best = points + rest
+        return best
+
+    def _combinations(self, counts: Tuple[int, ...]):
+        """Yield the scoring combinations with a dice of the lowest face."""
+        i = next(i for i, count in enumerate(counts) if count)
+        face = i + 1
+        if face in self.SINGLES:
+            yield _unit(i, 1), self.SINGLES[face]
+        if face in self.KINDS:
+            for count in range(3, counts[i] + 1):
+                yield _unit(i, count), self.kind(face, count)
+        if self.STRAIGHT is not None and all(counts):
+            yield (1,) * len(FACES), self.STRAIGHT
+        if self.THREE_PAIRS is not None:
+            for pairs in _PAIRS:
+                if pairs[i] and all(p <= c for p, c in zip(pairs, counts)):
+                    yield pairs, self.THREE_PAIRS
+
+    def score(self, counts: Dict[int, int]) -> int:
+        """
+        Score kept dices given as `face -> count`.
+        Raises `ValueError` if a face does not score.
+        """
+        points = self.points(tuple(counts.get(face, 0) for face in FACES))
+        if points is None:
+            raise ValueError("dices do not score: %s" % dict(counts))
+        return points
+
+    def valid(self, counts: Dict[int, int]) -> bool:
+        """Check if rolled dices given as `face -> count` have any valid move."""
+        return (
+            any(counts.get(face, 0) > 0 for face in self.SINGLES)
+            or any(counts.get(face, 0) > 2 for face in self.KINDS)
+            or (
+                self.STRAIGHT is not None
+                and all(counts.get(face, 0) > 0 for face in FACES)
+            )
+            or (
+                self.THREE_PAIRS is not None
+                and sum(counts.get(face, 0) // 2 for face in FACES) >= 3
+            )
+        )
+
+    def compile(
+        self,
+    ) -> Tuple[Dict[int, int], Dict[int, bool], Dict[int, List[int]]]:
+        """Return the `SCORES`, `VALID` and `KEEPS` tables of the rules."""
+        mask = (1 << FACE_BITS) - 1
+        scores = {}
+        for code in DICES:
+            counts = tuple(code >> (FACE_BITS * (face - 1)) & mask for face in FACES)
+            points = self.points(counts) if code else None
+            if points is not None:
+                scores[code] = points
+        keeps = {}
+        for code, dices in DICES.items():
+            counts = Counter(dices)
+            keeps[code] = [
+                keep_code
+                for keep_code in (
+                    encode([face for face, c in zip(FACES, kept) for _ in range(c)])
+                    for kept in product(*[range(counts[face] + 1) for face in FACES])
+                )
+                if keep_code in scores
+            ]
+        valid = {code: bool(keeps[code]) for code in DICES}
+        return scores, valid, keeps
+
+
+def _unit(i: int, count: int) -> Tuple[int, ...]:
+    return tuple(count if j == i else 0 for j in range(len(FACES)))
+
+
+# dice counts per face of three pairs
+_PAIRS = [
+    pairs for pairs in product((0, 2, 4), repeat=len(FACES)) if sum(pairs) == MAX_DICES
+]
+
+
+def score_counts(counts: Dict[int, int]) -> int:
+    """
+    Score kept dices given as `face -> count` (by the rules in use).
+    Raises `ValueError` if a face does not score.
+    """
+    return RULES.score(counts)
+
+
+def valid_counts(counts: Counter) -> bool:
+    """Check if rolled dices given as `face -> count` have any valid move."""
+    return RULES.valid(counts)
+
+
+def encode(dices: List[int]) -> int:
+    """Return the dice code of the given dices."""
+    code = 0
+    for dice in dices:
+        code += FACE_CODE[dice]
+    return code
+
+
+def _enumerate() -> Dict[int, Tuple[int, ...]]:
+    return {
+        encode(multiset): multiset
+        for num_dices in range(MAX_DICES + 1)
+        for multiset in combinations_with_replacement(FACES, num_dices)
+    }
+
+
+def canonical_keep(dices: List[int], keep_code: int) -> List[int]:
+    """
+    Return the canonical dice indexes for keeping the dices of `keep_code`:
+    the first occurrences of each kept face.
+    """
+    mask = (1 << FACE_BITS) - 1
+    counts = {face: keep_code >> (FACE_BITS * (face - 1)) & mask for face in FACES}
+    keep = []
+    for i, dice in enumerate(dices):
+        if counts[dice]:
+            counts[dice] -= 1
+            keep.append(i)
+    return keep
+
+
+def _legal_keeps(keeps: Dict[int, List[int]]) -> Dict[int, List[tuple]]:
+    return {
+        code: [tuple(canonical_keep(DICES[code], keep)) for keep in code_keeps]
+        for code, code_keeps in keeps.items()
+    }
+
+
+# `DICES`: dice code -> sorted dices, for every multiset of up to six dices.
+DICES = _enumerate()
+# `RULES`: the rules the tables are compiled from (see `use`).
+# `SCORES`: dice code -> score, only for multisets that are a valid keep.
+# `VALID`: dice code -> `True` if a roll with these dices has any valid move.
+# `KEEPS`: dice code -> dice codes of all distinct valid keeps of a roll.
+# `LEGAL_KEEPS`: dice code -> canonical dice indexes of these keeps for the sorted
+# dices of the roll (as returned by `tenk.game.roll`).
+RULES = RuleSet()
+SCORES, VALID, KEEPS = RULES.compile()
+LEGAL_KEEPS = _legal_keeps(KEEPS)
+_LISTENERS = []
+
+
+def use(rules: RuleSet) -> None:
+    """
+    Compile `rules` into the tables of this module. The tables are updated in
+    place, so modules that imported them play by the new rules without any
+    lookups of their own, and the tables derived from them are rebuilt (see
+    `on_rules`). Games, ais and evaluations started afterwards use the new
+    rules.
+    """
+    global RULES
+    scores, valid, keeps = rules.compile()
+    for table, compiled in (
+        (SCORES, scores),
+        (VALID, valid),
+        (KEEPS, keeps),
+        (LEGAL_KEEPS, _legal_keeps(keeps)),
+    ):
+        table.clear()
+        table.update(compiled)
+    RULES = rules
+    for fkn in _LISTENERS:
+        fkn()
+
+
+def on_rules(fkn: Callable[[], None]) -> None:
+    """Register `fkn` to rebuild tables derived from the scoring tables on `use`."""
+    _LISTENERS.append(fkn)
+
+
+def _roll_distributions() -> Dict[int, List[Tuple[int, float]]]:
+    rolls = {}
+    for num_dices in range(MAX_DICES + 1):
+        rolls[num_dices] = []
+        for multiset in combinations_with_replacement(FACES, num_dices):
+            ways = factorial(num_dices)
+            for count in Counter(multiset).values():
+                ways //= factorial(count)
+            rolls[num_dices].append((encode(multiset), ways / 6**num_dices))
+    return rolls
+
+
+# `ROLLS`: number of dices -> (dice code, probability) of every sorted roll outcome.
+ROLLS = _roll_distributions()
+
+
+def decode(code: int) -> List[int]:
+    """Return the sorted dices of a dice code."""
+    return list(DICES[code])
+
+
+def size(code: int) -> int:
+    """Return the number of dices in a dice code."""
+    return len(DICES[code])
+
+
+def score(keep_code: int) -> int:
+    """
+    Score of keeping the dices of `keep_code`.
+    Raises `ValueError` if the keep is not valid.
+    """
+    points = SCORES.get(keep_code)
+    if points is None:
+        if not keep_code:
+            raise ValueError("No keep")
+        raise ValueError("invalid keep: %s" % str(DICES.get(keep_code, keep_code)))
+    return points
+
+
+def remaining(code: int, keep_code: int) -> int:
+    """Return the dice code of the dices left after keeping `keep_code`."""
+    return code - keep_code
+
+
+def valid(code: int) -> bool:
+    """Check if there are valid moves possible for a rolled dice code."""
+    return VALID[code]
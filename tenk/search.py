@@ -0,0 +1,240 @@
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from tenk import rng, scoring
+from tenk.ai import single, split
+from tenk.game import Player, PolicyPlayer, play
+from tenk.scoring import (
+    DICES,
+    KEEPS,
+    MAX_DICES,
+    ROLLS,
+    SCORES,
+    on_rules,
+)
+from tenk.solver import Solver, SolverPlayer
+from tenk.stats import RunningStats
+
+# value of rolling n dices at a turn score, estimated without further search
+Leaf = Callable[[int, int], float]
+
+_OUTCOMES = {}
+on_rules(_OUTCOMES.clear)
+
+
+def outcomes(num_dices: int, max_dices: int = 6) -> List[Tuple[float, tuple]]:
+    """
+    Return the valid rolls of `num_dices` dices as (probability, options) with
+    the options (points, dices to roll next) of the distinct keeps, without
+    keeps dominated by another keep leaving as many dices for more points.
+    Busts are left out. Cached per number of dices.
+    """
+    key = (num_dices, max_dices)
+    if key not in _OUTCOMES:
+        rolls = []
+        for code, prob in ROLLS[num_dices]:
+            best = {}
+            for keep in KEEPS[code]:
+                left = len(DICES[code - keep]) or max_dices
+                best[left] = max(best.get(left, 0), SCORES[keep])
+            if best:
+                rolls.append((prob, tuple((p, n) for n, p in best.items())))
+        _OUTCOMES[key] = rolls
+    return _OUTCOMES[key]
+
+
+def bank_leaf(num_dices: int, score: int) -> float:
+    """Leaf heuristic: the turn is written down at the current score."""
+    return float(score) if score >= scoring.RULES.MIN_SCORE else 0.0
+
+
+def q_leaf(rollai) -> Leaf:
+    """
+    Leaf values from the Q table of a (trained) `RollAi`: the learned value of
+    rolling again if that is its greedy action, the score otherwise or if the
+    state is unknown.
+    """
+
+    def leaf(num_dices: int, score: int) -> float:
+        # states hold the dices left after keeping, none after keeping all
+        if num_dices == scoring.RULES.NUM_DICES:
+            num_dices = 0
+        rollai.dices = [0] * num_dices
+        rollai.args = None
+        rollai.score = score
+        action, value = rollai.greedyAction(rollai.encodeState())
+        if action is None or action:  # unknown or finish
+            return float(score)
+        return max(float(value), float(score))
+
+    return leaf
+
+
+class Expectimax(object):
+    """
+    Depth limited expectimax over the keeps of a roll and the exact
+    distribution of the next roll (see `outcomes`).
+
+    The value of rolling `n` dices at a turn score with `depth` rolls left to
+    search is looked up in a transposition table keyed on (dices, score,
+    depth), shared by all decisions. At depth 0 the `leaf` estimate is used.
+    Decisions search up to `depth` rolls deep, or with a `budget` (seconds)
+    deepen iteratively until the budget per decision is used. Turns are
+    played by the scoring rules in use (see `tenk.scoring.use`).
+    """
+
+    def __init__(
+        self,
+        depth: int = 2,
+        leaf: Optional[Leaf] = None,
+        budget: Optional[float] = None,
+        num_dices: Optional[int] = None,
+        cap: int = 30000,
+    ):
+        num_dices = num_dices if num_dices else scoring.RULES.NUM_DICES
+        if num_dices > MAX_DICES:
+            raise ValueError("at most %i dices supported" % MAX_DICES)
+        self.DEPTH = depth
+        self.BUDGET = budget
+        self.NUM_DICES = num_dices
+        self.MIN_SCORE = scoring.RULES.MIN_SCORE
+        self.CAP = cap
+        self.leaf = leaf if leaf else bank_leaf
+        self.table = {}
+        self.decisions = {}
+
+    def value(self, num_dices: int, score: int, depth: int) -> float:
+        """Expected final score of rolling `num_dices` dices at `score`."""
+        if depth == 0:
+            return self.leaf(num_dices, score)
+        if score >= self.CAP:
+            return float(score)
+        key = (num_dices, score, depth)
+        value = self.table.get(key)
+        if value is None:
+            value = 0.0
+            for prob, options in outcomes(num_dices, self.NUM_DICES):
+                best = 0.0
+                for points, left in options:
+                    new_score = score + points
+                    cont = self.value(left, new_score, depth - 1)
+                    best = max(best, self.written(new_score), cont)
+                value += prob * best
+            self.table[key] = value
+        return value
+
+    def written(self, score: int) -> int:
+        """Score if written down, 0 below the minimum score."""
+        return score if score >= self.MIN_SCORE else 0
+
+    def search(self, code: int, score: int, depth: int) -> Tuple[int, bool]:
+        best = None
+        for keep in KEEPS[code]:
+            new_score = score + SCORES[keep]
+            left = len(DICES[code - keep]) or self.NUM_DICES
+            cont = self.value(left, new_score, depth)
+            written = self.written(new_score)
+            if best is None or max(written, cont) > best[0]:
+                best = (max(written, cont), keep, written >= cont and written > 0)
+        if best is None:
+            raise ValueError("no valid moves: %s" % str(DICES[code]))
+        return best[1], best[2]
+
+    def decide(self, code: int, score: int) -> Tuple[int, bool]:
+        """
+        Return the keep (as dice code) for a rolled dice code at the turn
+        score before the roll and whether to finish afterwards.
+        """
+        key = (code, score)
+        decision = self.decisions.get(key)
+        if decision is not None:
+            return decision
+        if self.BUDGET is None:
+            decision = self.search(code, score, self.DEPTH)
+        else:
+            start = time.perf_counter()
+            depth = 1
+            decision = self.search(code, score, depth)
+            while time.perf_counter() - start < self.BUDGET and depth < self.DEPTH:
+                depth += 1
+                decision = self.search(code, score, depth)
+        self.decisions[key] = decision
+        return decision
+
+
+class ExpectimaxPlayer(PolicyPlayer):
+    """TenK player deciding by `Expectimax` search."""
+
+    def __init__(self, search: Expectimax, exit: Optional[int] = None):
+        super().__init__(search.decide, exit=exit)
+        self.search = search
+
+
+def compare(players: Dict[str, Player]) -> Dict[str, Dict[str, float]]:
+    """
+    Play the games of every player (until it ends) and return their mean
+    scores and games per second.
+    """
+    results = {}
+    for name, player in players.items():
+        scores = RunningStats()
+        write = player.write
+
+        def record(score, write=write, scores=scores):
+            scores.add(score)
+            write(score)
+
+        player.write = record  # shadows the method like `tenk.instrument`
+        start = time.perf_counter()
+        play(player)
+        elapsed = time.perf_counter() - start
+        results[name] = {"mean": scores.mean, "games_per_sec": scores.count / elapsed}
+        print("%-24s %8.2f %12.0f" % (name, scores.mean, scores.count / elapsed))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Strength and throughput of search players vs the Q agents"
+    )
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--depths", type=int, nargs="*", default=[1, 2, 3])
+    parser.add_argument("--budget", type=float, help="seconds per decision")
+    parser.add_argument("--single", help="tag of a trained SingleAi")
+    parser.add_argument("--split", help="tag of trained DiceAi/RollAi")
+    parser.add_argument("--load", type=int, default=10000000, help="checkpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    players = {}
+    for depth in args.depths:
+        search = Expectimax(depth, budget=args.budget)
+        players["expectimax-%i" % depth] = ExpectimaxPlayer(search, exit=args.games)
+    if args.split:
+        rollai = split.debug(args.split, args.load).rollai
+        for depth in args.depths:
+            search = Expectimax(depth, leaf=q_leaf(rollai), budget=args.budget)
+            players["expectimax-%i-q" % depth] = ExpectimaxPlayer(
+                search, exit=args.games
+            )
+    for kind, tag, module in (
+        ("single", args.single, single),
+        ("split", args.split, split),
+    ):
+        if tag:
+            player = module.debug(tag, args.load)
+            player.EXIT = args.load + args.games
+            player.PROGRESS = args.games
+            players["%s-%s" % (kind, tag)] = player
+    players["solver"] = SolverPlayer(Solver(), exit=args.games)
+
+    print("%-24s %8s %12s" % ("player", "mean", "games/s"))
+    for name, player in players.items():
+        rng.seed(args.seed)
+        compare({name: player})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from tenk import scoring
+from tenk.batch import BatchPlayer, map_unique
+from tenk.game import PolicyPlayer
+from tenk.scoring import (
+    CODE_SPACE,
+    DICES,
+    KEEPS,
+    MAX_DICES,
+    ROLLS,
+    SCORES,
+)
+
+# all scores are multiples of this step
+STEP = 50
+
+
+class Solver(object):
+    """
+    Exact optimal policy for a TenK turn.
+
+    A state is the number of dices to roll next and the turn score. Keeping
+    dices only increases the score, so the expected final score of every state
+    can be computed backwards from high to low scores over the exact roll
+    distributions. Scores at or above `cap` are always written down.
+    Turns are played by the scoring rules in use (see `tenk.scoring.use`).
+    """
+
+    def __init__(self, num_dices: Optional[int] = None, cap: int = 30000):
+        num_dices = num_dices if num_dices else scoring.RULES.NUM_DICES
+        if num_dices > MAX_DICES:
+            raise ValueError("at most %i dices supported" % MAX_DICES)
+        if any(points % STEP for points in SCORES.values()):
+            raise ValueError("scores have to be multiples of %i" % STEP)
+        self.NUM_DICES = num_dices
+        self.MIN_SCORE = scoring.RULES.MIN_SCORE
+        self.CAP = cap - cap % STEP
+        size = self.CAP // STEP + max(SCORES.values()) // STEP + 1
+        self.scores = np.arange(size) * STEP
+        # score if written down, 0 below the minimum score
+        self.written = np.where(self.scores >= self.MIN_SCORE, self.scores, 0)
+        # values[n, i]: expected final score before rolling n dices at score i * STEP
+        self.values = np.tile(self.scores.astype(float), (num_dices + 1, 1))
+        tables = [self._outcomes(n) for n in range(1, num_dices + 1)]
+        for i in range(self.CAP // STEP - 1, -1, -1):
+            for n, (probs, gains, lefts, valid) in enumerate(tables, start=1):
+                j = i + gains
+                best = np.maximum(self.written[j], self.values[lefts, j])
+                best = np.where(valid, best, 0).max(axis=1)
+                self.values[n, i] = probs @ best
+
+    def _outcomes(self, num_dices: int):
+        """
+        Return the roll probabilities and for every roll and valid keep: the
+        score gain (in steps), the dices left to roll next and a validity mask.
+        """
+        rolls = ROLLS[num_dices]
+        width = max(len(KEEPS[code]) for code, _ in rolls)
+        probs = np.array([prob for _, prob in rolls])
+        gains = np.zeros((len(rolls), width), dtype=np.intp)
+        lefts = np.full((len(rolls), width), self.NUM_DICES, dtype=np.intp)
+        valid = np.zeros((len(rolls), width), dtype=bool)
+        for o, (code, _) in enumerate(rolls):
+            for k, keep in enumerate(KEEPS[code]):
+                gains[o, k] = SCORES[keep] // STEP
+                lefts[o, k] = self.left(code, keep)
+                valid[o, k] = True
+        return probs, gains, lefts, valid
+
+    def left(self, code: int, keep: int) -> int:
+        """Number of dices to roll next after keeping `keep` of `code`."""
+        return len(DICES[code - keep]) or self.NUM_DICES
+
+    def value(self, num_dices: int, score: int) -> float:
+        """Expected final score before rolling `num_dices` dices at `score`."""
+        if score >= self.CAP:
+            return float(score)
+        return float(self.values[num_dices, score // STEP])
+
+    def decide(self, code: int, score: int) -> Tuple[int, bool]:
+        """
+        Return the optimal keep (as dice code) for a rolled dice code at the
+        turn score before the roll and whether to finish afterwards.
+        """
+        best = None
+        for keep in KEEPS[code]:
+            new_score = score + SCORES[keep]
+            cont = self.value(self.left(code, keep), new_score)
+            written = new_score if new_score >= self.MIN_SCORE else 0
+            if best is None or max(written, cont) > best[0]:
+                best = (max(written, cont), keep, written >= cont and written > 0)
+        if best is None:
+            raise ValueError("no valid moves: %s" % str(DICES[code]))
+        return best[1], best[2]
+
+    def table(self, scores: Optional[List[int]] = None) -> None:
+        """Print the expected final scores per dices to roll and turn score."""
+        scores = scores if scores else range(0, 3001, 250)
+        print("score | " + " ".join(["%7i" % n for n in range(1, self.NUM_DICES + 1)]))
+        for score in scores:
+            print(
+                "%5i | " % score
+                + " ".join(
+                    [
+                        "%7.1f" % self.value(n, score)
+                        for n in range(1, self.NUM_DICES + 1)
+                    ]
+                )
+            )
+
+
+class SolverPlayer(PolicyPlayer):
+    """TenK player playing the optimal policy of a `Solver`."""
+
+    def __init__(self, solver: Solver, exit: Optional[int] = None):
+        super().__init__(solver.decide, exit=exit)
+        self.solver = solver
+
+
+class SolverBatchPlayer(BatchPlayer):
+    """Batch player playing the optimal policy of a `Solver`."""
+
+    def __init__(self, solver: Solver):
+        self.solver = solver
+        self.decisions = {}
+        self.finishes = None
+
+    def decide(self, key: int) -> Tuple[int, bool]:
+        score, code = divmod(key, CODE_SPACE)
+        return self.solver.decide(code, score)
+
+    def choose(self, codes, scores):
+        keys = scores.astype(np.int64) * CODE_SPACE + codes
+        decisions = map_unique(keys, self.decisions, self.decide)
+        self.finishes = decisions[:, 1].astype(bool)
+        return decisions[:, 0].astype(np.int32)
+
+    def finish(self, codes, scores):
+        return self.finishes
+
+    def moves(self, code, score):
+        keep, finish = self.solver.decide(code, score)
+        return [(1.0, keep, float(finish))], []
+
+
+if __name__ == "__main__":
+    import time
+    from tenk.batch import play_batch
+
+    start = time.time()
+    solver = Solver()
+    print("solved in %.2fs" % (time.time() - start))
+    solver.table()
+    print("expected turn score: %.2f" % solver.value(solver.NUM_DICES, 0))
+    scores = play_batch(SolverBatchPlayer(solver), 100000, seed=0)
+    print("played 100000 games: %.2f" % scores.mean())
@@ -0,0 +1,140 @@
+import csv
+import json
+import math
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+class RunningStats(object):
+    """Streaming count, mean, variance (Welford), minimum and maximum."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        """Sample variance."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class Histogram(object):
+    """Fixed bins of `width` starting at 0, the last bin counts all larger values."""
+
+    def __init__(self, width: int = 250, bins: int = 40):
+        self.WIDTH = width
+        self.counts = [0] * bins
+
+    def add(self, x: float) -> None:
+        self.counts[min(int(x // self.WIDTH), len(self.counts) - 1)] += 1
+
+
+class TurnStats(object):
+    """
+    Streaming statistics of written down turns: scores (mean, variance,
+    maximum and histogram), bust rate and the distribution of rolls per turn,
+    all in constant memory.
+    """
+
+    def __init__(self, width: int = 250, bins: int = 40, max_rolls: int = 32):
+        self.scores = RunningStats()
+        self.histogram = Histogram(width, bins)
+        self.rolls = RunningStats()
+        # rolls per turn -> turns, the last entry counts all longer turns
+        self.rollCounts = [0] * (max_rolls + 1)
+        self.busts = 0
+
+    def add(self, score: int, rolls: int) -> None:
+        self.scores.add(score)
+        self.histogram.add(score)
+        self.rolls.add(rolls)
+        self.rollCounts[min(rolls, len(self.rollCounts) - 1)] += 1
+        if score == 0:
+            self.busts += 1
+
+    @property
+    def bustRate(self) -> float:
+        return self.busts / self.scores.count if self.scores.count else 0.0
+
+    def summary(self) -> Dict[str, any]:
+        return {
+            "turns": self.scores.count,
+            "mean": self.scores.mean,
+            "std": self.scores.std,
+            "max": self.scores.max,
+            "bust_rate": self.bustRate,
+            "rolls_mean": self.rolls.mean,
+            "rolls_max": self.rolls.max,
+            "histogram_width": self.histogram.WIDTH,
+            "histogram": list(self.histogram.counts),
+            "rolls": list(self.rollCounts),
+        }
+
+
+def memory() -> Optional[int]:
+    """Peak resident memory of the process in bytes (`None` if unknown)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MetricsSink(object):
+    """
+    Append metric records (flat dictionaries) to a time series file: JSON
+    lines, or CSV if `filename` ends with `.csv` (lists are written space
+    separated, the columns are taken from the first record).
+    """
+
+    def __init__(self, filename: str):
+        self.FILENAME = filename
+        self.CSV = filename.endswith(".csv")
+        self.fields = None
+
+    def write(self, record: Dict[str, any]) -> None:
+        with open(self.FILENAME, "a", newline="") as file:
+            if not self.CSV:
+                file.write(json.dumps(record) + "\n")
+                return
+            writer = csv.writer(file)
+            if self.fields is None:
+                self.fields = list(record)
+                if file.tell() == 0:
+                    writer.writerow(self.fields)
+            writer.writerow([self._csv(record.get(field)) for field in self.fields])
+
+    @staticmethod
+    def _csv(value: any) -> any:
+        if isinstance(value, (list, tuple)):
+            return " ".join([str(v) for v in value])
+        return "" if value is None else value
+
+
+def read(filename: str) -> List[Dict[str, any]]:
+    """Read the records of a JSON lines metrics file."""
+    with open(filename) as file:
+        return [json.loads(line) for line in file if line.strip()]
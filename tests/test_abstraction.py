@@ -0,0 +1,26 @@
+from tenk import scoring
+from tenk.ai.abstraction import SCORING, StateAbstraction
+from tenk.scoring import DICES, RuleSet
+
+
+def test_scoring_default_rules():
+    abstraction = StateAbstraction(dices=SCORING)
+    for dices in DICES.values():
+        dices = list(dices)
+        expected = "".join(
+            str(dice) if dice in (1, 5) or dices.count(dice) > 2 else "x"
+            for dice in dices
+        )
+        assert abstraction.dices(dices) == expected
+
+
+def test_scoring_other_rules():
+    abstraction = StateAbstraction(dices=SCORING)
+    try:
+        scoring.use(RuleSet(straight=1500, three_pairs=750))
+        assert abstraction.dices([1, 2, 3, 4, 5, 6]) == "123456"
+        assert abstraction.dices([2, 2, 3, 3, 4, 4]) == "223344"
+        assert abstraction.dices([2, 2, 3, 4, 6, 6]) == "xxxxxx"
+    finally:
+        scoring.use(RuleSet())
+    assert abstraction.dices([2, 2, 3, 3, 4, 4]) == "xxxxxx"
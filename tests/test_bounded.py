@@ -0,0 +1,42 @@
+import pytest
+from tenk import rng
+from tenk.ai import checkpoint
+from tenk.ai.single import ArraySingleAi, SingleAi, SingleAiPlayer, train
+from tenk.game import play
+
+
+def test_bounded_delta_rejected():
+    with pytest.raises(ValueError):
+        train("bounded", max_states=500, fileformat="tenkq", delta=2)
+    ai = SingleAi(0.05, 0.6, 0.1)
+    ai.boundQ(500)
+    with pytest.raises(ValueError):
+        SingleAiPlayer(ai, fileformat="tenkq", delta=2)
+
+
+def test_bounded_full_checkpoints(tmp_path, monkeypatch):
+    # bounded after the player is built: checkpoints are saved fully
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Q").mkdir()
+    rng.seed(0)
+    player = SingleAiPlayer(
+        SingleAi(0.05, 0.6, 0.1),
+        tag="bounded",
+        save=500,
+        exit=2000,
+        progress=float("inf"),
+        fileformat="tenkq",
+        delta=2,
+    )
+    player.ai.boundQ(500)
+    play(player)
+    assert player.ai.Q.evictions
+    with checkpoint.Checkpoint("Q/SingleAi_bounded_2000.tenkq") as loaded:
+        assert loaded.base is None
+        assert len(loaded) == len(list(loaded)) == len(loaded.toDict()) <= 500
+        assert loaded.toDict().keys() == player.ai.Q.keys()
+
+
+def test_array_ais_unbounded():
+    with pytest.raises(TypeError):
+        ArraySingleAi(0.05, 0.6, 0.1).boundQ(500)
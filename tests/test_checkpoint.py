@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from tenk import rng
+from tenk.ai import checkpoint
+from tenk.ai.linear import LinearAi
+from tenk.ai.single import ArraySingleAi, SingleAi, SingleAiPlayer
+from tenk.game import play
+
+
+def trained_Q(games=2000):
+    rng.seed(0)
+    player = SingleAiPlayer(SingleAi(0.05, 0.6, 0.1), exit=games, progress=float("inf"))
+    play(player)
+    return player.ai.Q
+
+
+def as_float32(Q):
+    return {
+        state: {action: float(np.float32(value)) for action, value in rewards.items()}
+        for state, rewards in Q.items()
+    }
+
+
+@pytest.fixture(scope="module")
+def Q():
+    return trained_Q()
+
+
+def test_keys():
+    keys = [None, 0, 7, (1 << 62) - 1, "", "0", "11256_350", "il", "is", "x1x5_9"]
+    for key in keys:
+        assert checkpoint.unpack_key(checkpoint.pack_key(key)) == key
+    strings = [key for key in keys if isinstance(key, str)]
+    table = {}
+    packed = checkpoint.pack_keys(strings, table)
+    assert not table
+    assert checkpoint.unpack_keys(packed) == strings
+    others = [1 << 62, -1, "bias", "1234567890123456", 0.5, (1, 2), True]
+    for key in others:
+        assert checkpoint.pack_key(key) is None
+    packed = checkpoint.pack_keys(others + strings, table)
+    assert len(table) == len(others)
+    assert checkpoint.unpack_keys(packed, sorted(table, key=table.get)) == [
+        *others,
+        *strings,
+    ]
+
+
+def test_pickle(Q, tmp_path):
+    filename = str(tmp_path / "Q.pickle")
+    checkpoint.save(Q, filename)
+    assert checkpoint.load(filename) == Q
+
+
+def test_tenkq(Q, tmp_path):
+    filename = str(tmp_path / "Q.tenkq")
+    checkpoint.save(Q, filename)
+    expected = as_float32(Q)
+    assert checkpoint.load_all(filename) == expected
+    with checkpoint.load(filename) as lazy:
+        assert len(lazy) == len(Q)
+        assert set(lazy) == set(Q)
+        state = next(iter(Q))
+        assert lazy[state] == expected[state]
+        assert "unknown" not in lazy and 12 not in lazy
+        lazy["new"] = {"0": 1.0}
+        del lazy[state]
+        assert len(lazy) == len(Q)
+        assert dict(lazy.items()) == {
+            **{s: r for s, r in expected.items() if s != state},
+            "new": {"0": 1.0},
+        }
+    assert lazy.checkpoint.mm is None
+
+
+def test_delta(Q, tmp_path):
+    base = str(tmp_path / "base.tenkq")
+    delta = str(tmp_path / "delta.tenkq")
+    checkpoint.save(Q, base)
+    changed = dict(Q)
+    state = next(iter(Q))
+    changed[state] = {action: value + 1 for action, value in Q[state].items()}
+    changed["new"] = {"1": 2.0}
+    checkpoint.save(changed, delta, base=base)
+    with checkpoint.Checkpoint(delta) as loaded:
+        assert loaded.states == 2
+        assert dict(loaded.items()) == as_float32(changed)
+        assert loaded[state] == as_float32(changed)[state]
+    assert loaded.base.mm is None
+
+
+def test_unpackable_keys(tmp_path):
+    Q = {"bias": {0: 0.5, 1: -0.25}, ("x", 1): {"kept1": 1.0}, 3: {None: 2.0}}
+    filename = str(tmp_path / "Q.tenkq")
+    checkpoint.save(Q, filename)
+    assert checkpoint.load_all(filename) == Q
+    with checkpoint.Checkpoint(filename) as loaded:
+        assert loaded[("x", 1)] == {"kept1": 1.0}
+        assert "kept1" not in loaded
+
+
+def test_ais(Q, tmp_path):
+    ai = ArraySingleAi(0.05, 0.6, 0.1)
+    filename = str(tmp_path / "Q.tenkq")
+    checkpoint.save(Q, filename)
+    ai.load(filename)
+    # without the initial pseudo states
+    states = {state for state, rewards in Q.items() if None not in rewards}
+    assert {ai.stateName(state) for state in ai.Q} == states
+    linear = LinearAi(0.05, 0.6, 0.1)
+    linear.save(filename)
+    loaded = LinearAi(0.05, 0.6, 0.1)
+    loaded.load(filename)
+    assert loaded.Q.toDict() == as_float32(linear.Q.toDict())
+
+
+def test_player_filenames(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Q").mkdir()
+    rng.seed(0)
+    player = SingleAiPlayer(
+        ArraySingleAi(0.05, 0.6, 0.1),
+        tag="names",
+        save=1000,
+        exit=1000,
+        progress=float("inf"),
+    )
+    play(player)
+    # named by the logical ai, so the dictionary ai resumes from it
+    assert (tmp_path / "Q" / "SingleAi_names_1000.pickle").exists()
+    loaded = SingleAiPlayer(SingleAi(), tag="names", load=1000)
+    states = {player.ai.stateName(state) for state in player.ai.Q}
+    assert set(loaded.ai.Q.keys()) == states
+    # checkpoints named by the class are still found
+    (tmp_path / "Q" / "SingleAi_names_1000.pickle").rename(
+        tmp_path / "Q" / "ArraySingleAi_names_1000.pickle"
+    )
+    loaded = SingleAiPlayer(ArraySingleAi(), tag="names", load=1000)
+    assert set(loaded.ai.Q) == set(player.ai.Q)
+    assert LinearAi.NAME != SingleAi.NAME
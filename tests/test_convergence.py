@@ -0,0 +1,24 @@
+import pytest
+from tenk import rng
+from tenk.ai.convergence import Convergence
+from tenk.ai.single import ArraySingleAi, SingleAi, SingleAiPlayer
+from tenk.game import play
+
+
+def signals(ai, games=5000):
+    rng.seed(0)
+    player = SingleAiPlayer(ai, exit=games, progress=float("inf"), convergence=True)
+    play(player)
+    return ai.convergence.pop(len(ai.Q), games)
+
+
+def test_backends_agree():
+    single = signals(SingleAi(0.05, 0.6, 0.1))
+    array = signals(ArraySingleAi(0.05, 0.6, 0.1))
+    assert single["td_error"] == pytest.approx(array["td_error"])
+    assert single["greedy_changes"] == pytest.approx(array["greedy_changes"])
+
+
+def test_evictions():
+    convergence = Convergence(1000)
+    assert convergence.pop(900, 10)["new_states"] == 0.0
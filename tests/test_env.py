@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from tenk.env import BatchEnv, Env, keep_code
+from tenk.game import PolicyPlayer, Player, play
+from tenk.rng import DiceStream
+from tenk.scoring import DICES
+from tenk.solver import Solver
+
+
+@pytest.fixture(scope="module")
+def solver():
+    return Solver()
+
+
+class ScoresPlayer(PolicyPlayer):
+    def __init__(self, decide, exit):
+        super().__init__(decide, exit=exit)
+        self.scores = []
+
+    def write(self, score):
+        self.scores.append(score)
+        super().write(score)
+
+
+class DuplicatePlayer(Player):
+    """Keeps the index of a scoring single dice twice."""
+
+    def __init__(self, dice):
+        super().__init__()
+        self.dice = dice
+        self.scores = []
+
+    def choose(self, dices):
+        i = next((i for i, dice in enumerate(dices) if dice in (1, 5)), 0)
+        return [i, i]
+
+    def finish(self, score):
+        return True
+
+    def write(self, score):
+        self.scores.append(score)
+        self.end = len(self.scores) == 200
+
+
+class Rolls(object):
+    """Dice stream replaying recorded rolls."""
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+
+    def roll_code(self, num_dices):
+        code = self.codes.pop(0)
+        assert len(DICES[code]) == num_dices
+        return code
+
+
+def test_play_rejects_more_dices():
+    player = ScoresPlayer(lambda code, score: (0, True), exit=1)
+    with pytest.raises(ValueError):
+        play(player, num_dices=7)
+    with pytest.raises(ValueError):
+        Env(7)
+
+
+def test_duplicate_keep_invalid():
+    assert keep_code([1, 5, 3], [0, 0]) is None
+    assert keep_code([1, 5, 3], [0, 1]) == keep_code([1, 5], [1, 0])
+    assert keep_code([1, 5, 3], [3]) is None
+    env = Env(dice=DiceStream(0))
+    env.reset()
+    assert env.points(keep_code(env.dices(), [0, 0])) == 0
+    # keeping a single one or five twice used to score it twice
+    player = DuplicatePlayer(DiceStream(0))
+    play(player)
+    assert player.scores == [0] * 200
+
+
+def test_env_matches_play(solver):
+    player = ScoresPlayer(solver.decide, exit=2000)
+    player.dice = DiceStream(1)
+    play(player)
+
+    env = Env(dice=DiceStream(1))
+    scores = []
+    for _ in range(2000):
+        code, score = env.reset()
+        reward = 0
+        while not env.done:
+            (code, score), reward, done, info = env.step(solver.decide(code, score))
+            assert not info["invalid"]
+        scores.append(reward)
+    assert scores == player.scores
+    assert 0 < np.mean(scores)
+
+
+def test_batch_env_matches_env(solver):
+    games = 300
+    batch = BatchEnv(games, rng=np.random.default_rng(2))
+    codes, scores = batch.reset()
+    rolls = [[code] for code in codes.tolist()]
+    totals = np.zeros(games, dtype=np.int64)
+    while not batch.done.all():
+        active = np.flatnonzero(~batch.done)
+        keep = np.zeros(games, dtype=np.int32)
+        finish = np.zeros(games, dtype=bool)
+        for i in active.tolist():
+            keep[i], finish[i] = solver.decide(int(codes[i]), int(scores[i]))
+        (codes, scores), rewards, done = batch.step(keep, finish)
+        totals += rewards
+        for i in active.tolist():
+            if not rewards[i]:  # rolled again (finished turns are written down)
+                rolls[i].append(int(codes[i]))
+
+    for i in range(games):
+        env = Env(dice=Rolls(rolls[i]))
+        code, score = env.reset()
+        reward = 0
+        while not env.done:
+            (code, score), reward, done, info = env.step(solver.decide(code, score))
+        assert reward == totals[i]
+        assert env.rolls == len(rolls[i])
@@ -0,0 +1,45 @@
+import numpy as np
+from tenk.batch import BatchPlayer, play_batch
+from tenk.evaluate import evaluate
+from tenk.scoring import KEEPS, ROLLS, SCORES, VALID
+
+
+def best_keep(code):
+    return max(KEEPS[code], key=SCORES.get)
+
+
+class BestKeepPlayer(BatchPlayer):
+    """Keeps the highest scoring dices and finishes."""
+
+    def choose(self, codes, scores):
+        return np.array(
+            [best_keep(code) if KEEPS.get(code) else 0 for code in codes.tolist()],
+            dtype=np.int32,
+        )
+
+    def finish(self, codes, scores):
+        return np.ones(len(codes), dtype=bool)
+
+    def moves(self, code, score):
+        return [(1.0, best_keep(code), 1.0)], ["first" if score == 0 else "later"]
+
+
+def test_exact_value():
+    evaluation = evaluate(BestKeepPlayer())
+    value = sum(
+        prob * SCORES[best_keep(code)] for code, prob in ROLLS[6] if VALID[code]
+    )
+    bust = sum(prob for code, prob in ROLLS[6] if not VALID[code])
+    assert abs(evaluation.value - value) < 1e-9
+    assert abs(evaluation.value - 335.58384773662505) < 1e-9
+    assert abs(evaluation.bust - bust) < 1e-12
+    assert evaluation.states == 1 and evaluation.cut == 0.0
+    # every turn not busting on the first roll decides once
+    assert abs(evaluation.unseen["first"] - (1 - bust)) < 1e-12
+    assert "later" not in evaluation.unseen
+
+
+def test_matches_play_batch():
+    value = evaluate(BestKeepPlayer()).value
+    scores = play_batch(BestKeepPlayer(), 200000, seed=0)
+    assert abs(scores.mean() - value) < 3 * scores.std() / np.sqrt(len(scores))
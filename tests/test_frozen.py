@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from tenk.ai.frozen import SINGLE, SPLIT, FrozenPlayer, FrozenPolicy
+from tenk.ai.frozen import freeze_single, freeze_split
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.ai.split import DiceAi, RollAi, SplitAiPlayer
+from tenk.game import PolicyPlayer, play
+from tenk.rng import DiceStream
+from tenk.scoring import DICES, KEEPS, SCORES
+
+
+class ScoresPlayer(PolicyPlayer):
+    def __init__(self, decide, exit):
+        super().__init__(decide, exit=exit)
+        self.scores = []
+
+    def write(self, score):
+        self.scores.append(score)
+        super().write(score)
+
+
+def trained_single():
+    player = SingleAiPlayer(
+        SingleAi(0.05, 0.6, 0.1), exit=3000, progress=1e9, dice=DiceStream(0)
+    )
+    play(player)
+    return freeze_single(player.ai)
+
+
+def trained_split():
+    player = SplitAiPlayer(
+        DiceAi(0.05, 0.6, 0.1),
+        RollAi(0.05, 0.6, 0.1),
+        exit=3000,
+        progress=1e9,
+        dice=DiceStream(0),
+    )
+    play(player)
+    return freeze_split(player.diceai, player.rollai)
+
+
+@pytest.mark.parametrize(
+    "freeze, kind", [(trained_single, SINGLE), (trained_split, SPLIT)]
+)
+def test_round_trip(tmp_path, freeze, kind):
+    policy = freeze()
+    assert policy.KIND == kind and len(policy)
+    policy.save(str(tmp_path / "policy.npz"))
+    loaded = FrozenPolicy.load(str(tmp_path / "policy.npz"))
+    assert loaded.KIND == kind and len(loaded) == len(policy)
+
+    codes = np.array([code for code in DICES if KEEPS[code]] * 4)
+    scores = np.repeat([0, 300, 650, 1500], len(codes) // 4)
+    policy.rng, loaded.rng = np.random.default_rng(0), np.random.default_rng(0)
+    keeps = policy.choose_batch(codes, scores)
+    assert (loaded.choose_batch(codes, scores) == keeps).all()
+    left = codes - keeps
+    points = scores + np.array([SCORES.get(keep, 0) for keep in keeps.tolist()])
+    assert (
+        loaded.finish_batch(left, points) == policy.finish_batch(left, points)
+    ).all()
+    for code, score in [(codes[0], 0), (codes[-1], 1500)]:
+        assert loaded.moves(int(code), int(score)) == policy.moves(
+            int(code), int(score)
+        )
+
+    # served moves of both play the same games
+    players = []
+    for frozen in (policy, loaded):
+        frozen.rng = np.random.default_rng(1)
+        player = ScoresPlayer(FrozenPlayer(frozen).move, exit=500)
+        player.dice = DiceStream(1)
+        play(player)
+        players.append(player)
+    assert players[0].scores == players[1].scores
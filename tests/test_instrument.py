@@ -0,0 +1,33 @@
+import re
+import time
+from tenk import rng
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.game import play
+from tenk.instrument import Instrument
+
+
+def test_pause():
+    instrument = Instrument()
+    instrument.start()
+
+    def report():
+        instrument.pause()
+        time.sleep(0.05)
+        instrument.resume()
+
+    instrument.timed("write", report)()
+    instrument.stop()
+    assert instrument.calls["write"] == 1
+    assert instrument.times["write"] < 0.01
+    assert instrument.elapsed < 0.01
+
+
+def test_progress_not_timed(capsys):
+    rng.seed(0)
+    player = SingleAiPlayer(
+        SingleAi(0.05, 0.6, 0.1), exit=3000, progress=1000, instrument=Instrument()
+    )
+    play(player)
+    writes = re.findall(r"^  write +(\d+) ", capsys.readouterr().out, re.M)
+    # every interval counts its own games, the progress line is not in them
+    assert writes == ["1000", "1000", "1000"]
@@ -0,0 +1,24 @@
+import numpy as np
+from tenk import rng
+from tenk.ai.linear import LinearAi, LinearAiPlayer, LinearBatchPlayer
+from tenk.game import play
+from tenk.scoring import CODE_SPACE, DICES, KEEPS, encode
+
+
+def test_batch_player():
+    rng.seed(0)
+    player = LinearAiPlayer(LinearAi(0.01, 0.6, 0.1), exit=2000, progress=float("inf"))
+    play(player)
+    ai = player.ai
+    ai.RANDOMNESS = 0.0  # greedy batch decisions
+    codes = [code for code, keeps in KEEPS.items() if keeps]
+    codes = np.repeat(np.array(codes, dtype=np.int32), 3)
+    scores = np.tile(np.array([0, 300, 1500], dtype=np.int32), len(codes) // 3)
+    batch = LinearBatchPlayer(ai)
+    keep = batch.choose(codes, scores)
+    finish = batch.finish(codes, scores)
+    for code, score, kept, finished in zip(codes, scores, keep, finish):
+        action, _ = ai.greedyAction(int(score) * CODE_SPACE + int(code))
+        greedy, indexes = ai.decodeAction(action)
+        assert kept == encode([DICES[code][i] for i in indexes])
+        assert finished == greedy
@@ -0,0 +1,28 @@
+import functools
+import re
+from tenk.ai.parallel import merge, train_parallel
+from tenk.ai.single import SingleAi, SingleAiPlayer
+
+
+class CountingPlayer(SingleAiPlayer):
+    """Writes down the number of games played before as score."""
+
+    def write(self, score):
+        super().write(self.games)
+
+
+def test_merge():
+    merged = merge([{"s": {"a": (1.0, 1), "b": (2.0, 2)}}, {"s": {"a": (4.0, 3)}}])
+    assert merged == {"s": {"a": 3.25, "b": 2.0}}
+
+
+def test_progress_mean(capsys):
+    make_player = functools.partial(CountingPlayer, SingleAi(0.05, 0.6, 0.1))
+    player = train_parallel(
+        make_player, workers=2, sync=100, max_games=1000, save=None, progress=1000
+    )
+    assert player.games == 1000
+    line = capsys.readouterr().out.strip().splitlines()[-1]
+    # both workers wrote down 0..499 over the interval (not 400..499 of the
+    # last round only)
+    assert re.match(r" *1000: +250 - ", line)
@@ -0,0 +1,33 @@
+from tenk import rng
+from tenk.ai.frozen import FrozenPlayer, freeze_single
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.game import PolicyPlayer, play
+from tenk.scoring import KEEPS
+from tenk.solver import Solver, SolverPlayer
+
+
+def test_policy_player():
+    rng.seed(0)
+    # keep the first keep and finish
+    player = PolicyPlayer(lambda code, score: (KEEPS[code][0], True), exit=1000)
+    play(player)
+    assert player.games == player.stats.scores.count == 1000
+    assert player.stats.rolls.max == 1
+
+
+def test_solver_player():
+    rng.seed(0)
+    player = SolverPlayer(Solver(), exit=20000)
+    play(player)
+    solver = player.solver
+    assert abs(player.stats.scores.mean - solver.value(solver.NUM_DICES, 0)) < 15
+
+
+def test_frozen_player():
+    rng.seed(0)
+    trained = SingleAiPlayer(SingleAi(0.05, 0.6, 0.1), exit=2000, progress=1e9)
+    play(trained)
+    policy = freeze_single(trained.ai)
+    player = FrozenPlayer(policy, exit=500)
+    play(player)
+    assert player.stats.scores.count == 500
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from tenk.ai.replay import ReplayBuffer
+from tenk.ai.single import ArraySingleAi
+
+
+def filled(capacity, count, **kwargs):
+    replay = ReplayBuffer(capacity, rng=np.random.default_rng(0), **kwargs)
+    for i in range(count):
+        replay.add(i, i % 3, float(i), i + 1, i % 2 == 0)
+    return replay
+
+
+def test_wraparound():
+    replay = filled(4, 6)
+    assert len(replay) == 4 and replay.count == 6
+    states, actions, rewards, nextStates, terminals = replay.batch(replay.recent(3))
+    assert states.tolist() == [3, 4, 5]
+    assert actions.tolist() == [0, 1, 2]
+    assert rewards.tolist() == [3.0, 4.0, 5.0]
+    assert nextStates.tolist() == [4, 5, 6]
+    assert terminals.tolist() == [False, True, False]
+    assert replay.states.tolist() == [4, 5, 2, 3]
+    # more pending transitions than capacity: only the last ones are kept
+    replay = filled(4, 10)
+    replay.flush()
+    assert replay.states.tolist() == [8, 9, 6, 7]
+    assert replay.batch(replay.recent(10))[0].tolist() == [6, 7, 8, 9]
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_sample_filled(prioritized):
+    replay = filled(100, 5, prioritized=prioritized)
+    assert replay.sample(1000).max() < 5
+    if prioritized:
+        replay.updatePriorities(np.array([0, 1, 2, 3, 4]), np.array([0, 0, 0, 0, 1e6]))
+        assert (replay.sample(1000) == 4).mean() > 0.9
+
+
+def test_terminal_masking():
+    ai = ArraySingleAi(0.5, 0.9, 0.0)
+    Q = ai.Q
+    row, nextRow = Q.row(1), Q.row(2)
+    Q.set(row, 3, 10.0)
+    Q.set(nextRow, 5, 100.0)  # the best value of the next (and last) row
+    ai.setReplay(ReplayBuffer(16, rng=np.random.default_rng(0)), every=2, batch=2)
+    # terminal transitions are added with next row -1 (the last row)
+    ai.replay.add(row, 3, 20.0, -1, True)
+    ai.replay.add(nextRow, 5, 0.0, nextRow, False)
+    ai.learn()
+    # terminal: 10 + 0.5 * (20 - 10), not looking at the next state
+    assert Q.value(row, 3) == pytest.approx(15.0)
+    # not terminal: 100 + 0.5 * (0 + 0.9 * 100 - 100)
+    assert Q.value(nextRow, 5) == pytest.approx(95.0)
@@ -0,0 +1,32 @@
+from tenk import rng
+from tenk.ai.single import SingleAi, SingleAiPlayer, debug
+from tenk.game import play
+from tenk.rng import DiceStream
+
+
+def test_load_keeps_default_stream(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Q").mkdir()
+    player = SingleAiPlayer(
+        SingleAi(0.05, 0.6, 0.1),
+        tag="rng",
+        save=500,
+        exit=500,
+        progress=float("inf"),
+        dice=DiceStream(0),
+    )
+    play(player)
+    saved = player.dice.getstate()
+
+    rng.seed(1)
+    state = rng.STREAM.getstate()
+    # read-only players restore the saved stream in a stream of their own
+    player = debug("rng", 500)
+    assert player.dice is not rng.STREAM and player.ai.rng is player.dice
+    assert player.dice.getstate() == saved
+    assert rng.STREAM.getstate() == state
+    # resumed training continues the given stream
+    dice = DiceStream(2)
+    player = SingleAiPlayer(SingleAi(0.05, 0.6, 0.1), tag="rng", load=500, dice=dice)
+    assert player.dice is dice and dice.getstate() == saved
+    assert rng.STREAM.getstate() == state
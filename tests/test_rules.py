@@ -0,0 +1,57 @@
+from itertools import combinations
+from tenk import scoring
+from tenk.scoring import DICES, KEEPS, SCORES, VALID, RuleSet, encode
+from tests.test_scoring import (
+    outcome,
+    reference_calculate,
+    reference_valid_moves,
+)
+
+
+def reference_tables():
+    """`SCORES`, `VALID` and `KEEPS` built from the reference rule code."""
+    scores = {}
+    valid = {}
+    keeps = {}
+    for code, dices in DICES.items():
+        dices = list(dices)
+        valid[code] = reference_valid_moves(dices)
+        points = outcome(reference_calculate, dices, list(range(len(dices))))
+        if points is not ValueError:
+            scores[code] = points[0]
+        keeps[code] = {
+            encode([dices[i] for i in keep])
+            for size in range(1, len(dices) + 1)
+            for keep in combinations(range(len(dices)), size)
+            if outcome(reference_calculate, dices, list(keep)) is not ValueError
+        }
+    return scores, valid, keeps
+
+
+def compiled(rules):
+    scores, valid, keeps = rules.compile()
+    return scores, valid, {code: set(codes) for code, codes in keeps.items()}
+
+
+def test_default_rules():
+    expected = reference_tables()
+    assert compiled(RuleSet()) == expected
+    assert (SCORES, VALID, {code: set(codes) for code, codes in KEEPS.items()}) == (
+        expected
+    )
+
+
+def test_use():
+    default = compiled(RuleSet())
+    rules = RuleSet(straight=1500, three_pairs=750, multiples=scoring.DOUBLE)
+    try:
+        scoring.use(rules)
+        assert scoring.RULES is rules
+        assert SCORES[encode([1, 2, 3, 4, 5, 6])] == 1500
+        assert SCORES[encode([2, 2, 3, 3, 4, 4])] == 750
+        assert SCORES[encode([2, 2, 2, 2])] == 400
+    finally:
+        scoring.use(RuleSet())
+    assert (SCORES, VALID, {code: set(codes) for code, codes in KEEPS.items()}) == (
+        default
+    )
@@ -0,0 +1,62 @@
+import json
+import os
+import pytest
+from tenk.ai import checkpoint
+from tenk.ai.saver import BackgroundSaver
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.game import play
+from tenk.rng import DiceStream
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+def test_snapshot(tmp_path):
+    saver = BackgroundSaver(pending=2)
+    data = {"games": 1}
+
+    def save():
+        with open(tmp_path / ("%i.json" % data["games"]), "w") as file:
+            json.dump(data, file)
+
+    saver.save(save)
+    data["games"] = 2  # after the fork, not seen by the first save
+    saver.save(save)
+    saver.wait()
+    assert json.loads((tmp_path / "1.json").read_text()) == {"games": 1}
+    assert json.loads((tmp_path / "2.json").read_text()) == {"games": 2}
+    assert saver.poll() == []
+
+
+def test_failed_save():
+    saver = BackgroundSaver()
+    saver.save(lambda: 1 / 0)
+    with pytest.raises(RuntimeError):
+        saver.wait()
+    saver.wait()  # failures are reported once
+
+
+def test_delta_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Q").mkdir()
+    player = SingleAiPlayer(
+        SingleAi(0.05, 0.6, 0.1),
+        tag="bg",
+        save=500,
+        exit=2000,
+        progress=float("inf"),
+        fileformat="tenkq",
+        delta=2,
+        dice=DiceStream(0),
+        background=2,
+    )
+    play(player)
+    assert player.saver.poll() == []
+    with checkpoint.Checkpoint("Q/SingleAi_bg_2000.tenkq") as loaded:
+        assert loaded.base is not None
+    # the delta and its base read back as the Q table at the save
+    ai = SingleAi(0.05, 0.6, 0.1)
+    ai.load("Q/SingleAi_bg_2000.tenkq")
+    assert ai.Q.keys() == player.ai.Q.keys()
+    for state, rewards in player.ai.Q.items():
+        assert ai.Q[state] == pytest.approx(rewards, rel=1e-6, abs=1e-4)
+    assert os.path.exists(player.rngFilename())
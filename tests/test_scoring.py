@@ -0,0 +1,83 @@
+from collections import Counter
+from itertools import combinations, combinations_with_replacement
+from tenk.game import calculate, valid_moves
+from tenk.scoring import FACES, MAX_DICES
+
+
+def reference_calculate(dices, keep):
+    """The scoring rules before the lookup tables (see `tenk.game.calculate`)."""
+    if not keep:
+        raise ValueError("No keep")
+    next_dices = [dices[i] for i in range(len(dices)) if i not in keep]
+    counters = Counter([dices[i] for i in keep])
+    score = 0
+    for points in counters.keys():
+        counter = counters[points]
+        if points == 1:
+            if counter < 3:
+                score += counter * 100
+            else:
+                score += (counter - 2) * 1000
+        elif points == 5:
+            if counter < 3:
+                score += counter * 50
+            else:
+                score += (counter - 2) * 500
+        else:
+            if counter < 3:
+                raise ValueError(str("points: %i, counter: %i" % (points, counter)))
+            else:
+                score += (counter - 2) * 100 * points
+    return score, next_dices
+
+
+def reference_valid_moves(dices):
+    counters = Counter(dices)
+    return (
+        counters[1] > 0
+        or counters[5] > 0
+        or counters[2] > 2
+        or counters[3] > 2
+        or counters[4] > 2
+        or counters[6] > 2
+    )
+
+
+ROLLS = [
+    list(dices)
+    for num_dices in range(1, MAX_DICES + 1)
+    for dices in combinations_with_replacement(FACES, num_dices)
+]
+
+
+def keeps(dices):
+    for size in range(len(dices) + 1):
+        yield from combinations(range(len(dices)), size)
+
+
+def outcome(fkn, *args):
+    try:
+        return fkn(*args)
+    except ValueError:
+        return ValueError
+
+
+def test_calculate():
+    for dices in ROLLS:
+        for keep in keeps(dices):
+            keep = list(keep)
+            assert outcome(calculate, dices, keep) == outcome(
+                reference_calculate, dices, keep
+            ), (dices, keep)
+
+
+def test_valid_moves():
+    for dices in ROLLS:
+        assert valid_moves(dices) == reference_valid_moves(dices)
+
+
+def test_more_dices_than_tables():
+    dices = [1, 1, 1, 1, 5, 5, 5, 2]
+    keep = list(range(7))
+    assert calculate(dices, keep) == reference_calculate(dices, keep)
+    assert valid_moves(dices) == reference_valid_moves(dices)
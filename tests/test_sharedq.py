@@ -0,0 +1,107 @@
+import functools
+import multiprocessing as mp
+import pickle
+import pytest
+from tenk.ai.arrayq import ArrayQ
+from tenk.ai.sharedq import (
+    CODES,
+    DiceLayout,
+    RollLayout,
+    SharedArrayQ,
+    SingleLayout,
+    share,
+    train_hogwild,
+)
+from tenk.ai.single import ArraySingleAi, SingleAiPlayer
+from tenk.ai.split import ArrayDiceAi
+from tenk.game import play
+from tenk.rng import DiceStream
+from tenk.scoring import CODE_SPACE, MAX_DICES
+
+
+def _update(Q, state, action, value):
+    Q.set(Q.row(state), action, value)
+    Q.close()
+
+
+def test_layouts():
+    for layout in (SingleLayout(cap=1000), DiceLayout(), RollLayout(cap=1000)):
+        rows = range(layout.ROWS)
+        assert [layout.row(layout.state(row)) for row in rows] == list(rows)
+    single = SingleLayout(cap=1000)
+    assert single.ROWS == 21 * len(CODES)
+    # scores above the cap share the rows of the cap
+    assert single.row(5000 * CODE_SPACE + CODES[3]) == single.row(
+        1000 * CODE_SPACE + CODES[3]
+    )
+    roll = RollLayout(cap=1000)
+    assert roll.row(5000 * (MAX_DICES + 1) + 2) == roll.row(1000 * (MAX_DICES + 1) + 2)
+
+
+def test_share():
+    player = SingleAiPlayer(
+        ArraySingleAi(0.05, 0.6, 0.1), exit=500, progress=1e9, dice=DiceStream(0)
+    )
+    play(player)
+    ai = player.ai
+    private = dict(ai.Q.items())
+    Q = share(ai)
+    try:
+        assert ai.Q is Q and isinstance(Q, ArrayQ)
+        assert set(Q) == set(private)
+        for state, rewards in private.items():
+            assert Q[state] == pytest.approx(rewards, rel=1e-6, abs=1e-4)
+            assert Q.best(state)[0] == max(rewards, key=rewards.get)
+        # learning goes on in the shared table
+        player.EXIT = 1000
+        player.end = False
+        play(player)
+        assert len(Q) >= len(private)
+    finally:
+        Q.close(unlink=True)
+
+
+def test_attach():
+    Q = SharedArrayQ(DiceLayout(), ArrayDiceAi.ACTIONS)
+    try:
+        state = CODES[100]
+        assert state not in Q and Q.best(state) == (None, 0.0)
+        # pickles attach to the same memory, also in other processes
+        copy = pickle.loads(pickle.dumps(Q))
+        copy.set(copy.row(state), 3, 1.5)
+        copy.close()
+        assert Q.best(state) == (3, 1.5)
+        process = mp.get_context("fork").Process(
+            target=_update, args=(Q, state, 5, 2.5)
+        )
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert Q[state] == {3: 1.5, 5: 2.5} and Q.best(state) == (5, 2.5)
+        assert len(Q) == 1 and list(Q) == [state]
+    finally:
+        Q.close(unlink=True)
+
+
+def test_capped():
+    Q = SharedArrayQ(SingleLayout(cap=1000), ArraySingleAi.ACTIONS)
+    try:
+        Q.set(Q.row(1000 * CODE_SPACE + CODES[5]), 1, 1.0)
+        assert Q.capped == 0
+        Q.set(Q.row(1500 * CODE_SPACE + CODES[5]), 1, 2.0)
+        assert Q.capped == 1
+        assert Q.best(1000 * CODE_SPACE + CODES[5]) == (1, 2.0)
+    finally:
+        Q.close(unlink=True)
+
+
+def test_train_hogwild():
+    make_player = functools.partial(
+        SingleAiPlayer, ArraySingleAi(0.05, 0.6, 0.1), tag="hog", save=None
+    )
+    player = train_hogwild(
+        make_player, workers=2, max_games=4000, chunk=500, save=None, progress=1e9
+    )
+    assert player.games == 4000
+    assert isinstance(player.ai.Q, ArrayQ) and not isinstance(player.ai.Q, SharedArrayQ)
+    assert len(player.ai.Q) > 100
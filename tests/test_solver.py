@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from tenk.batch import play_batch
+from tenk.evaluate import evaluate
+from tenk.scoring import DICES, KEEPS, ROLLS, SCORES, VALID
+from tenk.solver import Solver, SolverBatchPlayer
+
+
+@pytest.fixture(scope="module")
+def solver():
+    return Solver()
+
+
+def test_value(solver):
+    assert round(solver.value(6, 0), 2) == 486.08
+    evaluation = evaluate(SolverBatchPlayer(solver))
+    assert abs(evaluation.value - solver.value(6, 0)) < 1e-6
+    assert evaluation.unseen == {}
+    scores = play_batch(SolverBatchPlayer(solver), 200000, seed=0)
+    assert abs(scores.mean() - evaluation.value) < 3 * scores.std() / np.sqrt(
+        len(scores)
+    )
+
+
+def test_bellman(solver):
+    # the value of rolling is the expected best of writing down or rolling on
+    for num_dices, score in [(6, 0), (3, 300), (1, 650), (5, 2000)]:
+        value = 0.0
+        for code, prob in ROLLS[num_dices]:
+            if not VALID[code]:
+                continue
+            keep, finish = solver.decide(code, score)
+            assert keep in KEEPS[code]
+            new_score = score + SCORES[keep]
+            cont = solver.value(solver.left(code, keep), new_score)
+            value += prob * (new_score if finish else cont)
+            assert finish == (new_score >= cont)
+        assert abs(value - solver.value(num_dices, score)) < 1e-6
+
+
+def test_decide(solver):
+    bust = next(code for code in DICES if len(DICES[code]) == 6 and not VALID[code])
+    with pytest.raises(ValueError):
+        solver.decide(bust, 0)
+    assert solver.value(6, solver.CAP + 50) == solver.CAP + 50
+    # keeping all dices rolls all of them again
+    one = next(code for code in DICES if DICES[code] == (1,))
+    assert solver.left(one, one) == solver.NUM_DICES
+    assert solver.left(one * 2, one) == 1
@@ -0,0 +1,80 @@
+import pytest
+from tenk.ai.single import SingleAi, SingleAiPlayer
+from tenk.game import play
+from tenk.rng import DiceStream
+
+S1 = "15_0"
+S2 = "123466_150"
+
+
+def traced_ai(lam):
+    ai = SingleAi(0.5, 0.9, 0.0)
+    ai.setTraces(lam)
+    ai.rng = DiceStream(0)
+    ai.Q = {S1: {"001": 100.0, "10": 20.0}, S2: {"10": 200.0, "00": 50.0}}
+    return ai
+
+
+def episode(ai):
+    # keep 1 and 5 (150), then keep the 1 and finish (250)
+    ai.processGameState([1, 5], 0)
+    assert ai.keep == [0, 1] and not ai.finish
+    ai.processGameState([1, 2, 3, 4, 6, 6], 150)
+    assert ai.keep == [0] and ai.finish
+    ai.processFinalGameState(250)
+
+
+def test_watkins_update():
+    ai = traced_ai(0.8)
+    ai.trackVisits()
+    episode(ai)
+    # step: td 150 + 0.9 * 200 - 100 = 230, S1 += 0.5 * 230
+    # final: td 250 - 200 = 50, S2 += 0.5 * 50, S1 += 0.5 * 50 * 0.9 * 0.8
+    assert ai.Q[S1]["001"] == pytest.approx(100 + 115 + 18)
+    assert ai.Q[S2]["10"] == pytest.approx(200 + 25)
+    assert ai.Q[S1]["10"] == 20.0 and ai.Q[S2]["00"] == 50.0
+    assert ai.visits == {S1: {"001": 2}, S2: {"10": 1}}
+
+
+def test_one_step():
+    ai = traced_ai(0.0)
+    episode(ai)
+    assert ai.Q[S1]["001"] == pytest.approx(100 + 115)
+    assert ai.Q[S2]["10"] == pytest.approx(200 + 25)
+
+
+def test_cut():
+    ai = traced_ai(0.8)
+    ai.processGameState([1, 5], 0)
+    ai.state, ai.lastAction = S2, "00"  # exploratory, valued below "10"
+    ai.extendTrace()
+    assert ai.trace == [(S2, "00")]
+    ai.Q[S2]["00"] = 200.0  # ties are greedy
+    ai.state, ai.lastAction = S2, "00"
+    ai.extendTrace()
+    assert ai.trace == [(S2, "00"), (S2, "00")]
+
+
+class TracedOneStep(SingleAi):
+    """One-step Q-learning through the trace updates (lambda 0)."""
+
+    def updateReward(self, terminal=False):
+        self.updateTraces(terminal)
+
+    def processGameState(self, dices, score, args=None):
+        super().processGameState(dices, score, args)
+        self.extendTrace()
+
+
+def test_lambda_zero():
+    Q = []
+    for ai in (SingleAi(0.05, 0.6, 0.1), TracedOneStep(0.05, 0.6, 0.1)):
+        player = SingleAiPlayer(
+            ai, exit=2000, progress=float("inf"), dice=DiceStream(0)
+        )
+        play(player)
+        # without the initial pseudo states, not learned by traces
+        Q.append({s: r for s, r in ai.Q.items() if r and None not in r})
+    assert Q[0].keys() == Q[1].keys()
+    for state, rewards in Q[0].items():
+        assert rewards == pytest.approx(Q[1][state])